@@ -1,16 +1,246 @@
 import os
 import json
-import requests
+import math
+import time
+from functools import partial
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+
+import llm_cache
+import ollama_client
+from audio import audio_path_for, get_audio, load_audio
+import embedding_index
+from ranker import rank_regions
+from config import (
+    EMBED_MODEL, LLM_KEEP_ALIVE, ANALYSIS_MAP_REDUCE_SECONDS, ANALYSIS_WINDOW_SECONDS, ANALYSIS_WINDOW_OVERLAP,
+    ANALYSIS_MAP_PARALLEL, ANALYSIS_REDUCE_CANDIDATES, PRERANK_MIN_SECONDS,
+)
 from vision_analyzer import analyze_video_content
+from word_index import WordIndex
 
 load_dotenv()
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_MODEL = "llama3.2"
 
+# Max seconds a clip edge may move when snapping to a word/sentence boundary
+SNAP_MAX_SHIFT = 2.0
+
+
+def call_llm(prompt: str, num_predict: int = 1024, temperature: float = 0.3, use_cache: bool = True,
+             cache_if: Callable[[dict], bool] = None) -> dict:
+    """
+    Run a text prompt through Ollama, going through the response cache.
+
+    Prompts should put large static context (transcript, visual notes)
+    first and the user request last: Ollama keeps the model loaded for
+    LLM_KEEP_ALIVE and reuses its KV cache for a matching prompt prefix,
+    so a new request on the same video only evaluates the changed tail.
+
+    The answer is streamed in JSON mode and the connection is closed as
+    soon as the top-level object is complete. It is only cached when its
+    JSON parses and passes cache_if (default: any non-empty object), so
+    a bad generation is retried next time instead of replayed.
+
+    Returns:
+        Dict with "text", "cached" and "timings" (time to first token,
+        tokens/sec, and prompt-eval vs. eval timings when Ollama sent them)
+    """
+    options = {"temperature": temperature, "num_predict": num_predict}
+    key = llm_cache.make_key(OLLAMA_MODEL, prompt, options)
+
+    if use_cache:
+        try:
+            cached = llm_cache.get(key)
+        except Exception as e:
+            print(f"[Analyzer] LLM cache unavailable ({e})")
+            cached = None
+        if cached is not None:
+            print(f"[Analyzer] LLM response cache hit")
+            return {"text": cached, "cached": True, "timings": {}}
+
+    # Stream the answer (JSON mode) and hang up as soon as the object closes
+    result = ollama_client.stream_generate(
+        {
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "format": "json",
+            "keep_alive": LLM_KEEP_ALIVE,
+            "options": options,
+        },
+        timeout=180,
+        stop_on_json=True
+    )
+
+    timings = llm_timings(result)
+    ttft = f"{timings['ttft_ms']:.0f}ms" if timings["ttft_ms"] is not None else "n/a"
+    print(f"[Analyzer] LLM: TTFT {ttft}, {timings['output_tokens']} tok at {timings['tokens_per_sec']:.1f} tok/s, "
+          f"wall {timings['wall_ms']:.0f}ms" + (" (stopped at closing brace)" if result["stopped_early"] else ""))
+    if timings["prompt_eval_ms"]:
+        print(f"[Analyzer] LLM: prompt eval {timings['prompt_tokens']} tok in {timings['prompt_eval_ms']:.0f}ms, "
+              f"generation {timings['eval_ms']:.0f}ms, load {timings['load_ms']:.0f}ms")
+
+    text = result["text"]
+    parsed = extract_json(text) if use_cache and text else {}
+    if parsed and (cache_if is None or cache_if(parsed)):
+        try:
+            llm_cache.put(key, text)
+        except Exception as e:
+            print(f"[Analyzer] Could not update LLM cache ({e})")
+
+    return {"text": text, "cached": False, "timings": timings}
+
+
+def _list_check(key: str, allow_empty: bool = False) -> Callable[[dict], bool]:
+    """cache_if check: parsed[key] is a list, non-empty unless allow_empty."""
+    return lambda parsed: isinstance(parsed.get(key), list) and (allow_empty or len(parsed[key]) > 0)
+
+
+def llm_timings(result: dict) -> dict:
+    """
+    Per-call metrics from an ollama_client.stream_generate() result.
+
+    Prompt-eval / eval durations (ns -> ms) only arrive in Ollama's final
+    chunk, so they are 0 when the stream was cut at the closing brace.
+    """
+    final = result.get("final", {})
+    return {
+        "ttft_ms": result.get("ttft_ms"),
+        "tokens_per_sec": result.get("tokens_per_sec", 0.0),
+        "wall_ms": result.get("wall_ms", 0.0),
+        "prompt_tokens": final.get("prompt_eval_count", 0),
+        "prompt_eval_ms": final.get("prompt_eval_duration", 0) / 1e6,
+        "output_tokens": result.get("tokens", 0),
+        "eval_ms": final.get("eval_duration", 0) / 1e6,
+        "load_ms": final.get("load_duration", 0) / 1e6,
+    }
+
+
+def format_segment(seg: dict) -> str:
+    """One timestamped transcript line for the LLM prompt."""
+    return f"[{seg['start']:.1f}s - {seg['end']:.1f}s] {seg['text']}"
+
+
+def build_timestamped_transcript(transcript: dict) -> str:
+    """
+    Timestamped transcript text for the LLM prompt.
+
+    Uses transcript["timestamped_text"] when the caller already built it
+    incrementally while transcription was streaming.
+    """
+    if transcript.get("timestamped_text"):
+        return transcript["timestamped_text"]
+    return "\n".join(format_segment(seg) for seg in transcript["segments"])
+
+
+def prerank(transcript: dict, prompt: str, vision_result: dict = None, video_path: str = None) -> list:
+    """
+    Most promising regions from the local heuristic pre-ranker (see ranker.py).
+
+    Uses the audio already extracted for transcription when it exists, and
+    embedding similarity to the prompt when an embedding model is set and
+    the regions shape the LLM input (see needs_prerank), so short videos
+    don't load a third model next to the vision and text ones.
+    Returns [] if ranking fails, callers then fall back to the full transcript.
+    """
+    audio = None
+    try:
+        content_hash = transcript.get("content_hash")
+        if content_hash and os.path.exists(audio_path_for(content_hash)):
+            audio = load_audio(audio_path_for(content_hash))
+        elif video_path:
+            audio = get_audio(video_path, content_hash)
+    except Exception as e:
+        print(f"[Analyzer] Audio unavailable for pre-ranking ({e})")
+
+    relevance = None
+    if prompt and EMBED_MODEL and needs_prerank(transcript.get("duration", 300)):
+        try:
+            relevance = retrieve_relevance(transcript, prompt)
+        except Exception as e:
+            print(f"[Analyzer] Embedding retrieval unavailable ({e})")
+
+    try:
+        started = time.perf_counter()
+        regions = rank_regions(transcript, prompt, audio, vision_result, relevance)
+    except Exception as e:
+        print(f"[Analyzer] Pre-ranking failed ({e})")
+        return []
+
+    print(f"[Analyzer] Pre-ranked {len(regions)} regions in {(time.perf_counter() - started) * 1000:.0f}ms: "
+          + ", ".join(f"{r['start']:.0f}-{r['end']:.0f}s" for r in regions))
+    return regions
+
+
+def needs_prerank(duration: float) -> bool:
+    """
+    Whether the pre-ranked regions shape the LLM input: the region
+    transcript (longer than PRERANK_MIN_SECONDS) or the map-reduce windows.
+    """
+    return duration > PRERANK_MIN_SECONDS or duration > ANALYSIS_MAP_REDUCE_SECONDS
+
+
+def plan_regions(transcript: dict, prompt: str, vision_result: dict = None, video_path: str = None):
+    """
+    Pre-ranked regions up front when they shape the LLM input, else a
+    zero-argument function computing them on demand.
+
+    Short videos send the whole transcript, so regions only seed the
+    default clips if the LLM answer is unusable. Deferring them skips an
+    audio decode per job and keeps the prompt independent of the request,
+    so Ollama can reuse the cached prefix for new prompts on the same video.
+    """
+    if needs_prerank(transcript.get("duration", 300)):
+        return prerank(transcript, prompt, vision_result, video_path)
+    return partial(prerank, transcript, prompt, vision_result, video_path)
+
+
+def retrieve_relevance(transcript: dict, prompt: str):
+    """
+    Per-second embedding similarity of the prompt to the transcript.
+
+    The passage index is cached with the transcript, so only the prompt
+    is embedded for a video seen before. Returns None for an empty transcript.
+    """
+    index = embedding_index.get_index(transcript)
+    if index is None:
+        return None
+    scores = embedding_index.similarities(index, prompt)
+    for passage in embedding_index.top_passages(index, scores, 3):
+        print(f"[Analyzer] Retrieved [{passage['start']:.0f}s - {passage['end']:.0f}s] "
+              f"({passage['score']:.2f}) {passage['text'][:80]}")
+    n = max(1, int(math.ceil(transcript.get("duration") or 0)))  # same grid as ranker.interest_curve
+    return embedding_index.relevance_curve(index, scores, n)
+
+
+def build_region_transcript(transcript: dict, regions: list) -> str:
+    """Timestamped transcript restricted to the pre-ranked regions, one block per region."""
+    blocks = []
+    for region in regions:
+        lines = [format_segment(seg) for seg in transcript.get("segments", [])
+                 if seg["end"] > region["start"] and seg["start"] < region["end"]]
+        if lines:
+            blocks.append(f"--- Candidate region {region['start']:.0f}s - {region['end']:.0f}s ---\n" + "\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def select_transcript(transcript: dict, regions: list) -> str:
+    """
+    Transcript text for a single-prompt analysis: only the pre-ranked
+    regions for videos longer than PRERANK_MIN_SECONDS, else all of it.
+    """
+    duration = transcript.get("duration", 300)
+    if regions and duration > PRERANK_MIN_SECONDS:
+        text = build_region_transcript(transcript, regions)
+        if text:
+            full = build_timestamped_transcript(transcript)
+            print(f"[Analyzer] Sending {len(text)} of {len(full)} transcript chars (pre-ranked regions)")
+            return text
+    return build_timestamped_transcript(transcript)
+
 
-def analyze_with_vision(video_path: str, transcript: dict, prompt: str, num_frames: int = 8) -> list:
+def analyze_with_vision(video_path: str, transcript: dict, prompt: str, num_frames: int = 8,
+                        vision_result: dict = None) -> list:
     """
     Analyze video using BOTH transcript AND visual content for better clip selection.
 
@@ -19,6 +249,8 @@ def analyze_with_vision(video_path: str, transcript: dict, prompt: str, num_fram
         transcript: Dict with 'segments' and 'full_text' from transcriber
         prompt: User's prompt describing what clips to find
         num_frames: Number of frames to analyze visually
+        vision_result: Precomputed analyze_video_content() result; when given,
+                       the visual analysis step is skipped
 
     Returns:
         List of clip suggestions with start/end times
@@ -28,18 +260,20 @@ def analyze_with_vision(video_path: str, transcript: dict, prompt: str, num_fram
     print(f"[Analyzer] Starting combined audio+vision analysis...")
     print(f"[Analyzer] Video duration: {duration:.1f}s")
 
-    # Step 1: Get visual analysis
-    print(f"\n[Analyzer] === VISUAL ANALYSIS ===")
-    vision_result = analyze_video_content(video_path, num_frames, prompt)
+    # Step 1: Get visual analysis (unless the pipeline already ran it)
+    if vision_result is None:
+        print(f"\n[Analyzer] === VISUAL ANALYSIS ===")
+        vision_result = analyze_video_content(video_path, num_frames, prompt)
 
-    # Step 2: Prepare transcript with timestamps
-    timestamped_text = []
-    for seg in transcript["segments"]:
-        start_sec = seg["start"]
-        end_sec = seg["end"]
-        timestamped_text.append(f"[{start_sec:.1f}s - {end_sec:.1f}s] {seg['text']}")
+    # Cheap local pre-ranking narrows what the LLM has to read
+    regions = plan_regions(transcript, prompt, vision_result, video_path)
+
+    # Long videos: score windows in parallel, then reduce
+    if duration > ANALYSIS_MAP_REDUCE_SECONDS:
+        return analyze_map_reduce(transcript, prompt, vision_result, regions)
 
-    transcript_with_times = "\n".join(timestamped_text)
+    # Step 2: Prepare transcript with timestamps
+    transcript_with_times = select_transcript(transcript, regions)
 
     # Step 3: Prepare visual summary
     visual_descriptions = []
@@ -50,16 +284,20 @@ def analyze_with_vision(video_path: str, transcript: dict, prompt: str, num_fram
     visual_summary = "\n\n".join(visual_descriptions)
     overall_summary = vision_result.get("summary", "")
 
+    # Scene cuts from the vision pre-pass give the LLM natural clip edges
+    scene_cuts = vision_result.get("scene_cuts", [])
+    if scene_cuts:
+        visual_summary += "\n\nSCENE CUTS AT: " + ", ".join(f"{t:.1f}s" for t in scene_cuts[:30])
+
     # Step 4: Combined analysis prompt
     print(f"\n[Analyzer] === COMBINED ANALYSIS ===")
     print(f"[Analyzer] Sending to Ollama ({OLLAMA_MODEL})...")
 
-    full_prompt = f"""You are a video clip extraction expert. Analyze BOTH the audio transcript AND visual descriptions to find the best viral moments.
+    # Static video context first, the user's request last (prompt prefix reuse)
+    full_prompt = f"""You are a video clip extraction expert. Analyze BOTH the audio transcript AND visual descriptions to find the best viral moments for the user's request given at the end.
 
 VIDEO DURATION: {duration:.1f} seconds total
 
-USER REQUEST: {prompt}
-
 === AUDIO TRANSCRIPT ===
 {transcript_with_times}
 
@@ -84,30 +322,15 @@ RESPOND WITH ONLY THIS JSON FORMAT:
 {{"clips": [
   {{"title": "Short catchy title", "start": 45.0, "end": 75.0, "reason": "Why this works (visual + audio)"}},
   {{"title": "Another title", "start": 120.0, "end": 150.0, "reason": "Why this moment stands out"}}
-]}}"""
+]}}
 
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.3,
-                "num_predict": 1024,
-            }
-        },
-        timeout=180
-    )
+USER REQUEST: {prompt}"""
 
-    if response.status_code != 200:
-        raise Exception(f"Ollama error: {response.text}")
-
-    result_text = response.json().get("response", "")
+    result_text = call_llm(full_prompt, cache_if=_list_check("clips"))["text"]
     print(f"[Analyzer] Raw response: {result_text[:300]}...")
 
     # Parse and validate clips
-    clips = parse_and_validate_clips(result_text, duration, transcript)
+    clips = parse_and_validate_clips(result_text, duration, transcript, regions)
 
     print(f"[Analyzer] Found {len(clips)} potential clips:")
     for i, clip in enumerate(clips, 1):
@@ -116,24 +339,258 @@ RESPOND WITH ONLY THIS JSON FORMAT:
     return clips
 
 
-def parse_and_validate_clips(result_text: str, duration: float, transcript: dict) -> list:
+def build_windows(duration: float, window: float = ANALYSIS_WINDOW_SECONDS,
+                  overlap: float = ANALYSIS_WINDOW_OVERLAP) -> list:
+    """Overlapping (start, end) windows covering the whole video."""
+    step = max(1.0, window - overlap)
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+    return windows
+
+
+def score_window(window: tuple, transcript: dict, prompt: str, duration: float,
+                 vision_result: dict = None) -> list:
     """
-    Parse LLM response and validate clip timestamps.
+    Map step: ask the LLM for scored clip candidates inside one window.
+
+    Only the window's transcript lines, frame descriptions and scene cuts
+    go into the prompt, so its size stays constant however long the video is.
+
+    Returns:
+        Candidate dicts {title, start, end, reason, score}
     """
-    clips = []
+    start, end = window
+    lines = [format_segment(seg) for seg in transcript.get("segments", [])
+             if seg["end"] > start and seg["start"] < end]
+    visuals = []
+    scene_cuts = []
+    if vision_result:
+        visuals = [f"[{fa['timestamp']:.1f}s] {fa['description'][:300]}"
+                   for fa in vision_result.get("frame_analyses", [])
+                   if fa.get("description") and start <= fa["timestamp"] < end]
+        scene_cuts = [t for t in vision_result.get("scene_cuts", []) if start <= t < end]
+    if not lines and not visuals:
+        return []
+
+    visual_section = "\n\n".join(visuals) or "(no frames sampled in this part)"
+    if scene_cuts:
+        visual_section += "\n\nSCENE CUTS AT: " + ", ".join(f"{t:.1f}s" for t in scene_cuts)
+
+    window_prompt = f"""You are a video clip extraction expert. Below is the part of a {duration:.1f}s video from {start:.1f}s to {end:.1f}s. Find the best short clip moments INSIDE this part for the user's request given at the end.
+
+=== AUDIO TRANSCRIPT ({start:.1f}s - {end:.1f}s) ===
+{chr(10).join(lines)}
+
+=== VISUAL ANALYSIS (what's happening on screen) ===
+{visual_section}
+
+INSTRUCTIONS:
+1. Suggest up to 3 moments (15-45 seconds each) that lie within {start:.1f}s - {end:.1f}s
+2. Give each a "score" from 1 to 10 for how well it fits the request and how engaging it is
+3. The "start" and "end" values must be numbers in SECONDS (video time, as in the transcript)
+4. Return an empty list if nothing in this part fits
+
+RESPOND WITH ONLY THIS JSON FORMAT:
+{{"clips": [
+  {{"title": "Short catchy title", "start": {start + 10:.1f}, "end": {start + 40:.1f}, "reason": "Why this works", "score": 7}}
+]}}
+
+USER REQUEST: {prompt}"""
+
+    # An empty list is a valid answer for a window
+    result = call_llm(window_prompt, num_predict=400, cache_if=_list_check("clips", allow_empty=True))
+    clips = extract_json(result["text"]).get("clips", [])
+    candidates = []
+    for clip in clips if isinstance(clips, list) else []:
+        try:
+            c_start = float(clip.get("start"))
+            c_end = float(clip.get("end"))
+            score = float(clip.get("score", 5))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        # Drop answers that ignore the window (slack for edge rounding)
+        if c_end <= c_start or c_start < start - 5 or c_end > end + 5:
+            continue
+        candidates.append({
+            "title": str(clip.get("title", "Interesting Moment")),
+            "start": c_start,
+            "end": c_end,
+            "reason": str(clip.get("reason", "Engaging content")),
+            "score": score,
+        })
+    return candidates
+
+
+def _overlap(a: dict, b: dict) -> float:
+    return max(0.0, min(a["end"], b["end"]) - max(a["start"], b["start"]))
+
+
+def merge_candidates(candidates: list, limit: int = ANALYSIS_REDUCE_CANDIDATES) -> list:
+    """
+    Best-scoring candidates, dropping any that mostly overlap a better one
+    (the same moment is usually found by both windows that contain it).
+    """
+    kept = []
+    for cand in sorted(candidates, key=lambda c: c["score"], reverse=True):
+        length = cand["end"] - cand["start"]
+        if all(_overlap(cand, k) < 0.5 * min(length, k["end"] - k["start"]) for k in kept):
+            kept.append(cand)
+        if len(kept) >= limit:
+            break
+    return kept
+
+
+def _pick_greedy(candidates: list, count: int = 5) -> list:
+    """Highest-scoring non-overlapping candidates."""
+    chosen = []
+    for cand in sorted(candidates, key=lambda c: c["score"], reverse=True):
+        if all(_overlap(cand, k) == 0 for k in chosen):
+            chosen.append(cand)
+        if len(chosen) >= count:
+            break
+    return chosen
+
+
+def reduce_candidates(candidates: list, prompt: str, duration: float) -> list:
+    """
+    Reduce step: one short LLM call picks the final clips from the
+    candidates by id, so timestamps always come from the map step.
+    """
+    listing = "\n".join(
+        f"{i}. [{c['start']:.1f}s - {c['end']:.1f}s] (score {c['score']:.0f}) {c['title']}: {c['reason']}"
+        for i, c in enumerate(candidates, 1)
+    )
+    reduce_prompt = f"""You are a video clip extraction expert. These candidate clips were found across a {duration:.1f}s video. Pick the final clips for the user's request given at the end.
+
+CANDIDATES:
+{listing}
+
+INSTRUCTIONS:
+1. Pick 3-5 candidates by number, best first
+2. Picked clips must not overlap
+3. You may improve the title
+
+RESPOND WITH ONLY THIS JSON FORMAT:
+{{"picks": [{{"id": 1, "title": "Short catchy title"}}]}}
+
+USER REQUEST: {prompt}"""
+
+    result = call_llm(reduce_prompt, num_predict=300, cache_if=_list_check("picks"))
+    picks = extract_json(result["text"]).get("picks", [])
+    chosen = []
+    for pick in picks if isinstance(picks, list) else []:
+        try:
+            idx = int(pick.get("id"))
+        except (TypeError, ValueError, AttributeError):
+            continue
+        if not 1 <= idx <= len(candidates):
+            continue
+        cand = candidates[idx - 1]
+        if any(_overlap(cand, k) > 0 for k in chosen):
+            continue
+        chosen.append({**cand, "title": pick.get("title") or cand["title"]})
+
+    if not chosen:
+        print("[Analyzer] Reduce pass picked nothing usable, taking top-scoring candidates")
+        chosen = _pick_greedy(candidates)
+    return chosen[:5]
+
+
+def analyze_map_reduce(transcript: dict, prompt: str, vision_result: dict = None, regions: list = None) -> list:
+    """
+    Windowed map-reduce analysis for long videos.
+
+    Overlapping transcript windows (with their frame descriptions) are
+    scored in parallel, then a short reduce pass picks the final
+    non-overlapping clips from the top candidates. Prompt size per call is
+    bounded by the window length instead of the video length. With
+    pre-ranked regions, only windows overlapping one of them are scored.
+
+    Returns:
+        List of validated clips, same shape as analyze_transcript()
+    """
+    duration = transcript.get("duration", 300)
+    windows = build_windows(duration)
+    if regions:
+        ranked = [w for w in windows if any(w[0] < r["end"] and r["start"] < w[1] for r in regions)]
+        print(f"[Analyzer] Pre-ranker kept {len(ranked)} of {len(windows)} windows")
+        windows = ranked or windows
+    workers = max(1, min(ANALYSIS_MAP_PARALLEL, len(windows)))
+    print(f"[Analyzer] Map-reduce over {len(windows)} windows of {ANALYSIS_WINDOW_SECONDS:.0f}s ({workers} in flight)")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="map") as pool:
+        futures = [pool.submit(score_window, w, transcript, prompt, duration, vision_result) for w in windows]
+
+    candidates = []
+    for (start, end), future in zip(windows, futures):
+        try:
+            found = future.result()
+        except Exception as e:
+            print(f"[Analyzer] Window {start:.0f}-{end:.0f}s failed: {e}")
+            continue
+        print(f"[Analyzer] Window {start:.0f}-{end:.0f}s: {len(found)} candidates")
+        candidates.extend(found)
+
+    candidates = merge_candidates(candidates)
+    chosen = []
+    if candidates:
+        try:
+            chosen = reduce_candidates(candidates, prompt, duration)
+        except Exception as e:
+            print(f"[Analyzer] Reduce pass failed ({e}), taking top-scoring candidates")
+            chosen = _pick_greedy(candidates)
+
+    clips = validate_clips(chosen, duration, transcript, regions)
+
+    print(f"[Analyzer] Found {len(clips)} potential clips:")
+    for i, clip in enumerate(clips, 1):
+        print(f"  {i}. [{clip['start']:.1f}s - {clip['end']:.1f}s] {clip['title']}")
+
+    return clips
+
+
+def extract_json(result_text: str) -> dict:
+    """Outermost {...} object in an LLM response, or {} if there is none / it doesn't parse."""
     try:
         json_start = result_text.find("{")
         json_end = result_text.rfind("}") + 1
         if json_start != -1 and json_end > json_start:
-            json_str = result_text[json_start:json_end]
-            result = json.loads(json_str)
-            clips = result.get("clips", [])
-        else:
-            print("[Analyzer] No JSON found in response")
-            clips = []
+            result = json.loads(result_text[json_start:json_end])
+            return result if isinstance(result, dict) else {}
+        print("[Analyzer] No JSON found in response")
     except json.JSONDecodeError as e:
         print(f"[Analyzer] JSON parse error: {e}")
+    return {}
+
+
+def parse_and_validate_clips(result_text: str, duration: float, transcript: dict, regions=None) -> list:
+    """
+    Parse LLM response and validate clip timestamps.
+
+    When the transcript carries word timestamps, clip edges are snapped to
+    the nearest sentence/word boundary so cuts don't land mid-word.
+    """
+    clips = extract_json(result_text).get("clips", [])
+    if not isinstance(clips, list):
         clips = []
+    return validate_clips(clips, duration, transcript, regions)
+
+
+def validate_clips(clips: list, duration: float, transcript: dict, regions=None) -> list:
+    """
+    Clamp, snap and normalise raw {title, start, end, reason} clips (see
+    parse_and_validate_clips). Falls back to create_default_clips, seeded
+    with the pre-ranked regions when given, if nothing valid remains.
+    regions may be a plan_regions() function, called only for the fallback.
+    """
+    words = transcript.get("words")
+    word_index = WordIndex.from_dict(words) if words else None
 
     # Validate clips
     validated_clips = []
@@ -159,6 +616,13 @@ def parse_and_validate_clips(result_text: str, duration: float, transcript: dict
             elif clip_duration > 60:
                 end = start + 45
 
+            # Snap edges to word/sentence boundaries (O(log n) lookups)
+            if word_index is not None and len(word_index):
+                snapped_start = word_index.snap_start(start, SNAP_MAX_SHIFT)
+                snapped_end = min(word_index.snap_end(end, SNAP_MAX_SHIFT), duration)
+                if snapped_end - snapped_start >= 10:
+                    start, end = snapped_start, snapped_end
+
             validated_clips.append({
                 "title": clip.get("title", "Interesting Moment")[:50],
                 "start": round(start, 1),
@@ -173,7 +637,9 @@ def parse_and_validate_clips(result_text: str, duration: float, transcript: dict
     # If no valid clips, create smart defaults
     if not validated_clips:
         print("[Analyzer] No valid clips from LLM, creating defaults")
-        validated_clips = create_default_clips(transcript)
+        if callable(regions):
+            regions = regions()
+        validated_clips = create_default_clips(transcript, regions)
 
     # Sort by start time
     validated_clips.sort(key=lambda x: x["start"])
@@ -195,20 +661,20 @@ def analyze_transcript(transcript: dict, prompt: str) -> list:
     """
     duration = transcript.get("duration", 300)
 
-    # Build transcript with timestamps
-    timestamped_text = []
-    for seg in transcript["segments"]:
-        start_sec = seg["start"]
-        end_sec = seg["end"]
-        timestamped_text.append(f"[{start_sec:.1f}s - {end_sec:.1f}s] {seg['text']}")
+    # Cheap local pre-ranking narrows what the LLM has to read
+    regions = plan_regions(transcript, prompt)
 
-    transcript_with_times = "\n".join(timestamped_text)
+    # Long videos: score windows in parallel, then reduce
+    if duration > ANALYSIS_MAP_REDUCE_SECONDS:
+        return analyze_map_reduce(transcript, prompt, regions=regions)
 
-    full_prompt = f"""You are a video clip extraction assistant. Find the best moments for short viral clips.
+    # Build transcript with timestamps
+    transcript_with_times = select_transcript(transcript, regions)
 
-VIDEO DURATION: {duration:.1f} seconds total
+    # Static video context first, the user's request last (prompt prefix reuse)
+    full_prompt = f"""You are a video clip extraction assistant. Find the best moments for short viral clips for the user's request given at the end.
 
-USER REQUEST: {prompt}
+VIDEO DURATION: {duration:.1f} seconds total
 
 TRANSCRIPT (with timestamps in seconds):
 {transcript_with_times}
@@ -225,33 +691,18 @@ RESPOND WITH ONLY THIS JSON FORMAT:
 {{"clips": [
   {{"title": "Short catchy title", "start": 45.0, "end": 75.0, "reason": "Brief reason why this is engaging"}},
   {{"title": "Another title", "start": 120.0, "end": 150.0, "reason": "Why this moment stands out"}}
-]}}"""
+]}}
+
+USER REQUEST: {prompt}"""
 
     print(f"[Analyzer] Sending to Ollama ({OLLAMA_MODEL})...")
     print(f"[Analyzer] Video duration: {duration:.1f}s")
 
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.3,
-                "num_predict": 1024,
-            }
-        },
-        timeout=180
-    )
-
-    if response.status_code != 200:
-        raise Exception(f"Ollama error: {response.text}")
-
-    result_text = response.json().get("response", "")
+    result_text = call_llm(full_prompt, cache_if=_list_check("clips"))["text"]
     print(f"[Analyzer] Raw response: {result_text[:300]}...")
 
     # Use shared parsing function
-    clips = parse_and_validate_clips(result_text, duration, transcript)
+    clips = parse_and_validate_clips(result_text, duration, transcript, regions)
 
     print(f"[Analyzer] Found {len(clips)} potential clips:")
     for i, clip in enumerate(clips, 1):
@@ -260,14 +711,30 @@ RESPOND WITH ONLY THIS JSON FORMAT:
     return clips
 
 
-def create_default_clips(transcript: dict) -> list:
-    """Create default clips based on transcript segments - spread across video."""
+def create_default_clips(transcript: dict, regions: list = None) -> list:
+    """
+    Create default clips - around the pre-ranker's best regions when
+    available, else from transcript segments spread across the video.
+    """
     duration = transcript.get("duration", 300)
     segments = transcript.get("segments", [])
 
     clips = []
 
-    if segments and len(segments) >= 3:
+    if regions:
+        # Highest-scoring regions, each clip starting a little before its peak second
+        best = sorted(regions, key=lambda r: r["score"], reverse=True)[:3]
+        for i, region in enumerate(sorted(best, key=lambda r: r["start"])):
+            start = max(0, min(region["peak"] - 10, duration - 30))
+            end = min(start + 30, duration)
+            clips.append({
+                "title": f"Highlight {i + 1}",
+                "start": round(start, 1),
+                "end": round(end, 1),
+                "duration": round(end - start, 1),
+                "reason": "High-interest moment (speech, audio and scene signals)"
+            })
+    elif segments and len(segments) >= 3:
         # Pick segments from beginning, middle, and end
         indices = [
             len(segments) // 6,           # Early
@@ -0,0 +1,81 @@
+"""
+Audio extraction - decodes only the audio track, once per media file, to
+16 kHz mono float32 PCM that faster-whisper (and any audio-energy
+analysis) can read straight from a memory map.
+"""
+
+import os
+import subprocess
+import numpy as np
+
+from config import DOWNLOAD_CACHE_DIR
+from media import FFMPEG_PATH
+from transcript_cache import hash_file
+
+SAMPLE_RATE = 16000  # What Whisper expects
+
+
+def audio_path_for(content_hash: str) -> str:
+    """Location of the extracted PCM for a media file with this content hash."""
+    return os.path.join(DOWNLOAD_CACHE_DIR, f"{content_hash}.f32")
+
+
+def extract_audio(video_path: str, content_hash: str = None) -> str:
+    """
+    Decode the audio track of a media file to raw 16 kHz mono float32 PCM.
+
+    Video streams are dropped before decoding (-vn), so only the audio is
+    decoded. The result is stored alongside the download cache keyed by
+    content hash, so each video is decoded at most once.
+
+    Args:
+        video_path: Path to the media file
+        content_hash: Precomputed hash_file(video_path), if already known
+
+    Returns:
+        Path to the .f32 PCM file
+    """
+    content_hash = content_hash or hash_file(video_path)
+    audio_path = audio_path_for(content_hash)
+    if os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+        os.utime(audio_path)  # Keep it warm for the cache's LRU eviction
+        return audio_path
+
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{audio_path}.{os.getpid()}.tmp"
+
+    print(f"[Audio] Extracting audio: {video_path}")
+    cmd = [
+        FFMPEG_PATH,
+        "-y",
+        "-i", video_path,
+        "-vn",  # Skip video streams entirely
+        "-ac", "1",  # Mono
+        "-ar", str(SAMPLE_RATE),  # 16 kHz
+        "-f", "f32le",  # Raw little-endian float32
+        tmp_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise Exception(f"FFmpeg audio extraction failed: {result.stderr}")
+
+    # Atomic publish so concurrent jobs never see a half-written file
+    os.replace(tmp_path, audio_path)
+    print(f"[Audio] Extracted {os.path.getsize(audio_path) / 4 / SAMPLE_RATE:.1f}s of audio")
+    return audio_path
+
+
+def load_audio(audio_path: str) -> np.ndarray:
+    """Memory-map an extracted .f32 file as a read-only float32 array."""
+    if os.path.getsize(audio_path) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(audio_path, dtype=np.float32, mode="r")
+
+
+def get_audio(video_path: str, content_hash: str = None) -> np.ndarray:
+    """Extract (if needed) and memory-map the audio of a media file."""
+    return load_audio(extract_audio(video_path, content_hash))
@@ -1,36 +1,103 @@
 import os
 import subprocess
-from config import DOWNLOAD_DIR
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    DOWNLOAD_DIR, FFMPEG_THREADS, CLIP_WORKERS,
+    CLIP_STREAM_COPY, CLIP_SMART_CUT, KEYFRAME_TOLERANCE,
+    CLIP_BATCH, CLIP_BATCH_MAX, CLIP_BATCH_MAX_GAP,
+)
+from media import FFMPEG_PATH, probe_keyframes, next_keyframe, nearest_keyframe, probe_codecs, probe_streams
 
-FFMPEG_PATH = r"C:\Users\Subash\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"
 CLIPS_DIR = os.path.join(DOWNLOAD_DIR, "clips")
 
+# ffprobe H.264 profile names our libx264 head re-encode can reproduce
+X264_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
 
-def create_clip(video_path: str, job_id: str, clip_index: int, start: float, end: float, title: str = None) -> dict:
+# Stream parameters the re-encoded head must share with the copied tail
+# for the "-c copy" join to play back cleanly (the MP4 timescale is set on
+# the final remux, the MPEG-TS parts always use 1/90000)
+SMART_CUT_MATCH = {
+    "video": ("codec_name", "profile", "level", "pix_fmt", "width", "height"),
+    "audio": ("codec_name", "profile", "sample_rate", "channels"),
+}
+
+
+def smart_cut_params(streams: dict) -> dict:
     """
-    Extract a clip from video using FFmpeg.
+    Encoder settings that make a libx264/aac head match the source streams,
+    or None if the source can't be matched (smart cut is then skipped).
+    """
+    video = streams.get("video")
+    audio = streams.get("audio")
+    if not video or video.get("codec_name") != "h264" or video.get("pix_fmt") != "yuv420p":
+        return None
+    if video.get("profile") not in X264_PROFILES or not video.get("level"):
+        return None
+    try:
+        timescale = int(str(video.get("time_base", "")).split("/")[1])
+    except (IndexError, ValueError):
+        return None
+    if audio and (audio.get("codec_name") != "aac" or audio.get("profile") != "LC"
+                  or not audio.get("sample_rate") or not audio.get("channels")):
+        return None
+
+    level = int(video["level"])
+    return {
+        "profile": X264_PROFILES[video["profile"]],
+        "level": f"{level // 10}.{level % 10}",
+        "timescale": timescale,
+        "sample_rate": int(audio["sample_rate"]) if audio else None,
+        "channels": int(audio["channels"]) if audio else None,
+    }
 
-    Args:
-        video_path: Path to source video
-        job_id: Job ID for naming
-        clip_index: Clip number (1, 2, 3...)
-        start: Start time in seconds
-        end: End time in seconds
-        title: Optional title for the clip
+
+def plan_cut(video_path: str, start: float, end: float) -> tuple:
+    """
+    Decide how to cut [start, end) from the source.
 
     Returns:
-        Dict with clip file path and metadata
+        (mode, start, keyframe) where mode is one of:
+          "copy"      - start snapped to a keyframe, whole clip stream-copied
+          "smart"     - re-encode [start, keyframe), stream-copy the rest
+          "reencode"  - full re-encode (no usable keyframe / copy disabled)
     """
-    os.makedirs(CLIPS_DIR, exist_ok=True)
+    if not CLIP_STREAM_COPY:
+        return "reencode", start, None
 
-    duration = end - start
-    output_filename = f"{job_id}_clip_{clip_index}.mp4"
-    output_path = os.path.join(CLIPS_DIR, output_filename)
+    try:
+        keyframes = probe_keyframes(video_path)
+    except Exception as e:
+        print(f"[Clipper] Keyframe probe failed ({e}), re-encoding")
+        return "reencode", start, None
 
-    print(f"[Clipper] Creating clip {clip_index}: {start:.1f}s - {end:.1f}s ({duration:.1f}s)")
+    nearest = nearest_keyframe(keyframes, start)
+    if nearest is not None and abs(nearest - start) <= KEYFRAME_TOLERANCE and nearest < end:
+        return "copy", nearest, nearest
 
-    # FFmpeg command for precise cutting with re-encoding
-    cmd = [
+    if CLIP_SMART_CUT:
+        kf = next_keyframe(keyframes, start)
+        if kf is not None and kf < end - 1.0:
+            try:
+                streams = probe_streams(video_path)
+            except Exception as e:
+                print(f"[Clipper] Stream probe failed ({e}), re-encoding")
+                return "reencode", start, None
+            if smart_cut_params(streams) is not None:
+                return "smart", start, kf
+
+    return "reencode", start, None
+
+
+def _run_ffmpeg(cmd: list):
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"[Clipper] FFmpeg error: {result.stderr}")
+        raise Exception(f"FFmpeg failed: {result.stderr}")
+
+
+def _encode_cmd(video_path: str, start: float, duration: float, output_path: str) -> list:
+    """FFmpeg command for precise cutting with re-encoding."""
+    return [
         FFMPEG_PATH,
         "-y",  # Overwrite output
         "-ss", str(start),  # Start time (before input for fast seek)
@@ -39,63 +106,397 @@ def create_clip(video_path: str, job_id: str, clip_index: int, start: float, end
         "-c:v", "libx264",  # Video codec
         "-preset", "fast",  # Encoding speed
         "-crf", "23",  # Quality (lower = better, 18-28 is good)
+        "-threads", str(FFMPEG_THREADS),  # Encoder threads (several encodes share the box)
         "-c:a", "aac",  # Audio codec
         "-b:a", "128k",  # Audio bitrate
         "-movflags", "+faststart",  # Web optimization
         output_path
     ]
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
 
-    if result.returncode != 0:
-        print(f"[Clipper] FFmpeg error: {result.stderr}")
-        raise Exception(f"FFmpeg failed: {result.stderr}")
+def _copy_cmd(video_path: str, start: float, duration: float, output_path: str) -> list:
+    """FFmpeg command for a lossless remux starting on a keyframe."""
+    return [
+        FFMPEG_PATH,
+        "-y",
+        "-ss", str(start),  # Keyframe time, so the copy starts cleanly
+        "-i", video_path,
+        "-t", str(duration),
+        "-c", "copy",  # No decode/encode at all
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        output_path
+    ]
 
-    # Get file size
-    file_size = os.path.getsize(output_path)
 
-    print(f"[Clipper] Created: {output_filename} ({file_size / 1024 / 1024:.1f} MB)")
+def _head_encode_cmd(video_path: str, start: float, duration: float, output_path: str, params: dict) -> list:
+    """Re-encode command for a smart-cut head (MPEG-TS), matching the source's stream parameters."""
+    cmd = [
+        FFMPEG_PATH,
+        "-y",
+        "-ss", str(start),
+        "-i", video_path,
+        "-t", str(duration),
+        "-c:v", "libx264",
+        "-preset", "fast",
+        "-crf", "18",  # The head is short, keep it close to the copied tail
+        "-profile:v", params["profile"],
+        "-level:v", params["level"],
+        "-pix_fmt", "yuv420p",
+        "-threads", str(FFMPEG_THREADS),
+    ]
+    if params["sample_rate"]:
+        cmd += ["-c:a", "aac", "-b:a", "128k", "-ar", str(params["sample_rate"]), "-ac", str(params["channels"])]
+    else:
+        cmd += ["-an"]
+    return cmd + ["-bsf:v", "h264_mp4toannexb", "-f", "mpegts", output_path]
+
+
+def _tail_copy_cmd(video_path: str, start: float, duration: float, output_path: str) -> list:
+    """Stream-copy command for a smart-cut tail (MPEG-TS, SPS/PPS in-band)."""
+    return [
+        FFMPEG_PATH,
+        "-y",
+        "-ss", str(start),
+        "-i", video_path,
+        "-t", str(duration),
+        "-c", "copy",
+        "-bsf:v", "h264_mp4toannexb",
+        "-f", "mpegts",
+        output_path
+    ]
+
+
+def _join_cmd(list_path: str, output_path: str, params: dict) -> list:
+    """Concat MPEG-TS parts back into an MP4 without re-encoding."""
+    return [
+        FFMPEG_PATH,
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        "-bsf:a", "aac_adtstoasc",
+        "-video_track_timescale", str(params["timescale"]),
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def _check_head_matches(head_path: str, source: dict):
+    """Raise if the re-encoded head's stream parameters differ from the source's."""
+    head = probe_streams(head_path, use_cache=False)
+    for kind, fields in SMART_CUT_MATCH.items():
+        if kind not in source:
+            continue
+        for field in fields:
+            got, want = head.get(kind, {}).get(field), source[kind].get(field)
+            if field == "profile" and kind == "video":
+                got, want = X264_PROFILES.get(got), X264_PROFILES.get(want)
+            if got != want:
+                raise Exception(f"head {kind} {field} {got!r} != source {want!r}")
+
+
+def _check_decodes(path: str, duration: float):
+    """Raise if the first duration seconds of path don't decode without errors."""
+    result = subprocess.run([FFMPEG_PATH, "-v", "error", "-i", path, "-t", str(duration), "-f", "null", "-"],
+                            capture_output=True, text=True)
+    if result.returncode != 0 or result.stderr.strip():
+        raise Exception(f"joined clip doesn't decode cleanly: {result.stderr.strip()[:500]}")
+
+
+def _smart_cut(video_path: str, start: float, keyframe: float, end: float, output_path: str):
+    """
+    Re-encode only the GOP head up to the first keyframe, copy the rest, then concat.
+
+    The head is encoded with the source's profile, level, pixel format and
+    audio layout, and checked against the source before the join. Both
+    parts go through MPEG-TS so each carries its own SPS/PPS in-band (the
+    head's x264 parameter sets never match the source's), and the joined
+    file is decoded across the seam. Any failure raises so the caller falls
+    back to a full re-encode.
+    """
+    source = probe_streams(video_path)
+    params = smart_cut_params(source)
+    if params is None:
+        raise Exception("source streams can't be matched by the head re-encode")
+
+    base = os.path.splitext(output_path)[0]
+    head_path = f"{base}.head.ts"
+    tail_path = f"{base}.tail.ts"
+    list_path = f"{base}.concat.txt"
+
+    try:
+        _run_ffmpeg(_head_encode_cmd(video_path, start, keyframe - start, head_path, params))
+        _check_head_matches(head_path, source)
+        _run_ffmpeg(_tail_copy_cmd(video_path, keyframe, end - keyframe, tail_path))
+
+        with open(list_path, "w") as f:
+            for part in (head_path, tail_path):
+                f.write(f"file '{os.path.abspath(part)}'\n")
+
+        _run_ffmpeg(_join_cmd(list_path, output_path, params))
+        _check_decodes(output_path, keyframe - start + 2.0)
+    finally:
+        for path in (head_path, tail_path, list_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def create_clip(video_path: str, job_id: str, clip_index: int, start: float, end: float, title: str = None,
+                plan: tuple = None) -> dict:
+    """
+    Extract a clip from video using FFmpeg.
+
+    Cuts starting on (or near) a keyframe are stream-copied; others are
+    smart-cut or fully re-encoded, see plan_cut.
 
+    Args:
+        video_path: Path to source video
+        job_id: Job ID for naming
+        clip_index: Clip number (1, 2, 3...)
+        start: Start time in seconds
+        end: End time in seconds
+        title: Optional title for the clip
+        plan: Precomputed plan_cut() result, if the caller already has one
+
+    Returns:
+        Dict with clip file path and metadata
+    """
+    os.makedirs(CLIPS_DIR, exist_ok=True)
+
+    output_filename = f"{job_id}_clip_{clip_index}.mp4"
+    output_path = os.path.join(CLIPS_DIR, output_filename)
+
+    mode, start, keyframe = plan or plan_cut(video_path, start, end)
+    duration = end - start
+
+    print(f"[Clipper] Creating clip {clip_index} ({mode}): {start:.1f}s - {end:.1f}s ({duration:.1f}s)")
+
+    if mode == "copy":
+        _run_ffmpeg(_copy_cmd(video_path, start, duration, output_path))
+    elif mode == "smart":
+        try:
+            _smart_cut(video_path, start, keyframe, end, output_path)
+        except Exception as e:
+            print(f"[Clipper] Smart cut failed ({e}), re-encoding clip {clip_index}")
+            mode = "reencode"
+            _run_ffmpeg(_encode_cmd(video_path, start, duration, output_path))
+    else:
+        _run_ffmpeg(_encode_cmd(video_path, start, duration, output_path))
+
+    return _clip_result(clip_index, output_path, start, end, title, mode)
+
+
+def _clip_result(clip_index: int, output_path: str, start: float, end: float, title: str, mode: str) -> dict:
+    file_size = os.path.getsize(output_path)
+    print(f"[Clipper] Created: {os.path.basename(output_path)} ({file_size / 1024 / 1024:.1f} MB)")
     return {
+        "index": clip_index,
         "file_path": output_path,
-        "filename": output_filename,
-        "start": float(start),  # Ensure native Python float for DB
+        "filename": os.path.basename(output_path),
+        "start": float(start),
         "end": float(end),
-        "duration": float(duration),
+        "duration": float(end - start),
         "title": title,
         "size_bytes": file_size,
+        "mode": mode,
     }
 
 
+def create_clips_batch(video_path: str, job_id: str, batch: list) -> list:
+    """
+    Render several re-encoded clips from ONE FFmpeg decode pass.
+
+    The source is decoded once over [min start, max end) and fanned out
+    with split/trim (video) and asplit/atrim (audio) into one output per clip.
+
+    Args:
+        video_path: Path to source video
+        job_id: Job ID for naming
+        batch: List of (clip_index, start, end, title)
+
+    Returns:
+        List of created clip info, in batch order
+    """
+    os.makedirs(CLIPS_DIR, exist_ok=True)
+
+    span_start = min(start for _, start, _, _ in batch)
+    span_end = max(end for _, _, end, _ in batch)
+    has_audio = "audio" in probe_codecs(video_path)
+    n = len(batch)
+
+    # The batch holds one pool slot, so its encoders share that slot's
+    # FFMPEG_THREADS instead of each taking a full share
+    threads = max(1, FFMPEG_THREADS // n)
+
+    print(f"[Clipper] Batch-rendering clips {[i for i, _, _, _ in batch]} "
+          f"from one decode of {span_start:.1f}s - {span_end:.1f}s")
+
+    # Trim offsets are relative to span_start because of the input seek; the
+    # input -t bounds the decode itself (as an output option it would only
+    # limit the first output)
+    graph = [f"[0:v]split={n}" + "".join(f"[v{k}]" for k in range(n))]
+    if has_audio:
+        graph.append(f"[0:a]asplit={n}" + "".join(f"[a{k}]" for k in range(n)))
+    for k, (_, start, end, _) in enumerate(batch):
+        rel_start, rel_end = start - span_start, end - span_start
+        graph.append(f"[v{k}]trim=start={rel_start}:end={rel_end},setpts=PTS-STARTPTS[ov{k}]")
+        if has_audio:
+            graph.append(f"[a{k}]atrim=start={rel_start}:end={rel_end},asetpts=PTS-STARTPTS[oa{k}]")
+
+    cmd = [
+        FFMPEG_PATH,
+        "-y",
+        "-ss", str(span_start),
+        "-t", str(span_end - span_start),
+        "-i", video_path,
+        "-filter_complex", ";".join(graph),
+    ]
+
+    output_paths = []
+    for k, (clip_index, _, _, _) in enumerate(batch):
+        output_path = os.path.join(CLIPS_DIR, f"{job_id}_clip_{clip_index}.mp4")
+        output_paths.append(output_path)
+        cmd += ["-map", f"[ov{k}]"]
+        if has_audio:
+            cmd += ["-map", f"[oa{k}]", "-c:a", "aac", "-b:a", "128k"]
+        cmd += [
+            "-c:v", "libx264",
+            "-preset", "fast",
+            "-crf", "23",
+            "-threads", str(threads),
+            "-movflags", "+faststart",
+            output_path
+        ]
+
+    _run_ffmpeg(cmd)
+
+    return [
+        _clip_result(clip_index, output_path, start, end, title, "batch")
+        for (clip_index, start, end, title), output_path in zip(batch, output_paths)
+    ]
+
+
+def group_batches(clips: list) -> list:
+    """
+    Group (clip_index, start, end, title) tuples into single-decode batches.
+
+    Clips are clustered by start time; a cluster is cut when the gap to the
+    next clip exceeds CLIP_BATCH_MAX_GAP (decoding the gap would cost more
+    than a fresh seek) or the cluster reaches CLIP_BATCH_MAX outputs.
+    """
+    batches = []
+    current = []
+    current_end = None
+    for clip in sorted(clips, key=lambda c: c[1]):
+        if current and (clip[1] - current_end > CLIP_BATCH_MAX_GAP or len(current) >= CLIP_BATCH_MAX):
+            batches.append(current)
+            current = []
+        current.append(clip)
+        current_end = clip[2] if len(current) == 1 else max(current_end, clip[2])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _render_batch(video_path: str, job_id: str, batch: list) -> list:
+    """Render a batch, falling back to per-clip processes if the graph fails."""
+    try:
+        return create_clips_batch(video_path, job_id, batch)
+    except Exception as e:
+        print(f"[Clipper] Batch render failed ({e}), falling back to per-clip encodes")
+
+    results = []
+    for clip_index, start, end, title in batch:
+        try:
+            results.append(create_clip(video_path, job_id, clip_index, start, end, title,
+                                       plan=("reencode", start, None)))
+        except Exception as e:
+            print(f"[Clipper] Failed to create clip {clip_index}: {e}")
+    return results
+
+
+def get_clip_workers(num_clips: int) -> int:
+    """Number of FFmpeg encodes to run at once, sized from the CPU count."""
+    if CLIP_WORKERS > 0:
+        workers = CLIP_WORKERS
+    else:
+        workers = (os.cpu_count() or 1) // max(1, FFMPEG_THREADS)
+    return max(1, min(workers, num_clips))
+
+
 def create_clips(video_path: str, job_id: str, clips_data: list) -> list:
     """
     Create multiple clips from a video.
 
+    Clips are encoded in parallel on a bounded pool; nearby clips that need
+    a full re-encode share a single decode pass (create_clips_batch). A
+    failed clip is logged and skipped without affecting the others.
+
     Args:
         video_path: Path to source video
         job_id: Job ID
         clips_data: List of clip dicts with start, end, title
 
     Returns:
-        List of created clip info
+        List of created clip info, in clip-index order
     """
-    created_clips = []
+    if not clips_data:
+        return []
 
+    # Stream-copy / smart-cut clips run on their own; full re-encodes that
+    # sit close together are grouped so they share one decode pass
+    singles = []
+    reencodes = []
     for i, clip in enumerate(clips_data, 1):
-        try:
-            result = create_clip(
+        plan = plan_cut(video_path, clip["start"], clip["end"])
+        if CLIP_BATCH and plan[0] == "reencode":
+            reencodes.append((i, clip["start"], clip["end"], clip.get("title")))
+        else:
+            singles.append((i, clip, plan))
+
+    batches = []
+    for batch in group_batches(reencodes):
+        if len(batch) > 1:
+            batches.append(batch)
+        else:
+            i, start, end, title = batch[0]
+            singles.append((i, {"start": start, "end": end, "title": title}, ("reencode", start, None)))
+
+    workers = get_clip_workers(len(singles) + len(batches))
+    print(f"[Clipper] Rendering {len(clips_data)} clips ({len(batches)} batched decodes) "
+          f"with {workers} parallel encodes")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        single_futures = {
+            i: pool.submit(
+                create_clip,
                 video_path=video_path,
                 job_id=job_id,
                 clip_index=i,
                 start=clip["start"],
                 end=clip["end"],
-                title=clip.get("title")
+                title=clip.get("title"),
+                plan=plan
             )
-            created_clips.append(result)
+            for i, clip, plan in singles
+        }
+        batch_futures = [pool.submit(_render_batch, video_path, job_id, batch) for batch in batches]
+
+    results = {}
+    for i, future in single_futures.items():
+        try:
+            results[i] = future.result()
         except Exception as e:
             print(f"[Clipper] Failed to create clip {i}: {e}")
+    for future in batch_futures:
+        for result in future.result():
+            results[result["index"]] = result
 
-    return created_clips
+    return [results[i] for i in sorted(results)]
 
 
 if __name__ == "__main__":
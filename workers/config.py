@@ -8,3 +8,142 @@ DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", "./downloads")
 
 # Queue names
 CLIP_QUEUE = "clip-processing"
+
+# Clipping: threads per FFmpeg encode, and how many encodes run at once
+# (0 = derive from CPU count / threads per encode)
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "4"))
+CLIP_WORKERS = int(os.getenv("CLIP_WORKERS", "0"))
+
+# Cut planning: stream-copy cuts that start within KEYFRAME_TOLERANCE seconds
+# of a keyframe; smart-cut (re-encode only up to the first keyframe) otherwise
+CLIP_STREAM_COPY = os.getenv("CLIP_STREAM_COPY", "1") == "1"
+CLIP_SMART_CUT = os.getenv("CLIP_SMART_CUT", "1") == "1"
+KEYFRAME_TOLERANCE = float(os.getenv("KEYFRAME_TOLERANCE", "0.5"))
+
+# Batch clipping: re-encoded clips whose gaps are at most CLIP_BATCH_MAX_GAP
+# seconds share one FFmpeg decode pass (at most CLIP_BATCH_MAX outputs each)
+CLIP_BATCH = os.getenv("CLIP_BATCH", "1") == "1"
+CLIP_BATCH_MAX = int(os.getenv("CLIP_BATCH_MAX", "6"))
+CLIP_BATCH_MAX_GAP = float(os.getenv("CLIP_BATCH_MAX_GAP", "30"))
+
+# Worker concurrency: jobs processed at once, and resource slots shared by
+# those jobs (download = network, cpu = FFmpeg/Whisper, ollama = LLM calls,
+# gpu = video generation)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+DOWNLOAD_SLOTS = int(os.getenv("DOWNLOAD_SLOTS", "2"))
+CPU_SLOTS = int(os.getenv("CPU_SLOTS", "1"))
+OLLAMA_SLOTS = int(os.getenv("OLLAMA_SLOTS", "1"))
+GPU_SLOTS = int(os.getenv("GPU_SLOTS", "1"))
+OCCUPANCY_REPORT_SECONDS = int(os.getenv("OCCUPANCY_REPORT_SECONDS", "30"))
+
+# Postgres connection pool (shared by all job threads in a worker)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+
+# Progress reporting: minimum gap between progress writes for one job, and
+# the Redis pub/sub channel the API listens on for live updates
+PROGRESS_MIN_INTERVAL_MS = int(os.getenv("PROGRESS_MIN_INTERVAL_MS", "1000"))
+PROGRESS_CHANNEL = os.getenv("PROGRESS_CHANNEL", "clipsmith:job-progress")
+
+# Download cache: source videos are stored once per (video ID, format) and
+# linked into each job; least recently used files are evicted past the limit
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join(DOWNLOAD_DIR, "cache"))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Transcript cache (SQLite, zlib-compressed JSON) keyed by media content hash
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join(DOWNLOAD_DIR, "transcripts.sqlite3"))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+
+# Chunked CPU transcription: audio is split at quiet points into chunks of
+# at least TRANSCRIBE_CHUNK_SECONDS and transcribed by a process pool, each
+# process with its own model using TRANSCRIBE_CPU_THREADS threads
+# (TRANSCRIBE_WORKERS 0 = CPU count / threads per process, 1 = disabled)
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "0"))
+TRANSCRIBE_CPU_THREADS = int(os.getenv("TRANSCRIBE_CPU_THREADS", "4"))
+TRANSCRIBE_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "60"))
+
+# Models loaded and warmed up at worker startup (comma separated: whisper, svd);
+# the worker starts taking jobs once they are ready or MODEL_READY_TIMEOUT passes
+PRELOAD_MODELS = [m.strip() for m in os.getenv("PRELOAD_MODELS", "whisper").split(",") if m.strip()]
+MODEL_READY_TIMEOUT = float(os.getenv("MODEL_READY_TIMEOUT", "600"))
+
+# Ollama: generate endpoint, and how many requests the server runs in
+# parallel (match the server's OLLAMA_NUM_PARALLEL)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+VISION_MAX_IN_FLIGHT = int(os.getenv("VISION_MAX_IN_FLIGHT", str(OLLAMA_NUM_PARALLEL)))
+
+
+def _model_map(value: str) -> dict:
+    """Parse "model=value,model=value" settings."""
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {model.strip(): setting.strip() for model, setting in pairs}
+
+
+# Ollama servers to balance across (comma separated base URLs, default: the
+# host of OLLAMA_URL). Requests per model per worker process are capped at
+# OLLAMA_MODEL_LIMITS (default OLLAMA_NUM_PARALLEL per server), and each
+# model is kept loaded for OLLAMA_KEEP_ALIVE_MODELS / OLLAMA_KEEP_ALIVE so
+# llava and llama3.2 aren't unloaded between the vision and text phases
+# (the server needs OLLAMA_MAX_LOADED_MODELS >= 2 to hold both)
+OLLAMA_URLS = [u.strip().rstrip("/") for u in os.getenv("OLLAMA_URLS", OLLAMA_URL.rsplit("/api/", 1)[0]).split(",") if u.strip()]
+OLLAMA_MODEL_LIMITS = {m: int(n) for m, n in _model_map(os.getenv("OLLAMA_MODEL_LIMITS", "")).items()}
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_KEEP_ALIVE_MODELS = _model_map(os.getenv("OLLAMA_KEEP_ALIVE_MODELS", ""))
+# Retries on 5xx / connect timeouts / connection errors, with jittered
+# exponential backoff (read timeouts are not retried)
+OLLAMA_RETRIES = int(os.getenv("OLLAMA_RETRIES", "3"))
+OLLAMA_RETRY_BASE_SECONDS = float(os.getenv("OLLAMA_RETRY_BASE_SECONDS", "0.5"))
+
+# Vision mode: "frame" = one LLaVA call per frame, "batch" = one call per
+# contact sheet of VISION_BATCH_SIZE frames with a compact JSON answer
+VISION_MODE = os.getenv("VISION_MODE", "frame")
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "4"))
+
+# Frame selection: "scene" spends the frame budget per detected scene using a
+# low-resolution pre-pass at SCENE_SAMPLE_FPS; "uniform" samples evenly
+VISION_FRAME_SELECTION = os.getenv("VISION_FRAME_SELECTION", "scene")
+SCENE_SAMPLE_FPS = float(os.getenv("SCENE_SAMPLE_FPS", "2"))
+SCENE_THRESHOLD = float(os.getenv("SCENE_THRESHOLD", "0.3"))
+
+# Vision dedup: frames within VISION_DEDUP_DISTANCE bits (dHash Hamming
+# distance) of an already described frame reuse its description; descriptions
+# are also cached persistently by frame hash + vision model
+VISION_DEDUP_DISTANCE = int(os.getenv("VISION_DEDUP_DISTANCE", "6"))
+VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", os.path.join(DOWNLOAD_DIR, "vision_cache.sqlite3"))
+VISION_CACHE_MAX_ROWS = int(os.getenv("VISION_CACHE_MAX_ROWS", "200000"))
+
+# Text LLM calls: how long Ollama keeps the model (and its prompt cache)
+# loaded between calls, and the persistent response cache
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(DOWNLOAD_DIR, "llm_cache.sqlite3"))
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "20000"))
+
+# Longest video accepted for download. Videos longer than
+# ANALYSIS_MAP_REDUCE_SECONDS (keep it below MAX_DURATION_SECONDS) are
+# analyzed in overlapping transcript windows (scored in parallel) plus a
+# short reduce pass instead of one huge prompt
+MAX_DURATION_SECONDS = int(os.getenv("MAX_DURATION_SECONDS", "600"))
+ANALYSIS_MAP_REDUCE_SECONDS = float(os.getenv("ANALYSIS_MAP_REDUCE_SECONDS", "300"))
+ANALYSIS_WINDOW_SECONDS = float(os.getenv("ANALYSIS_WINDOW_SECONDS", "240"))
+ANALYSIS_WINDOW_OVERLAP = float(os.getenv("ANALYSIS_WINDOW_OVERLAP", "45"))
+ANALYSIS_MAP_PARALLEL = int(os.getenv("ANALYSIS_MAP_PARALLEL", str(OLLAMA_NUM_PARALLEL)))
+ANALYSIS_REDUCE_CANDIDATES = int(os.getenv("ANALYSIS_REDUCE_CANDIDATES", "12"))
+
+# Heuristic pre-ranker: only the PRERANK_TOP_K most promising
+# PRERANK_REGION_SECONDS regions of videos longer than PRERANK_MIN_SECONDS
+# are sent to the LLM
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "6"))
+PRERANK_REGION_SECONDS = int(os.getenv("PRERANK_REGION_SECONDS", "60"))
+PRERANK_MIN_SECONDS = float(os.getenv("PRERANK_MIN_SECONDS", "240"))
+
+# Semantic retrieval over transcript passages (Ollama embeddings endpoint),
+# opt-in: set EMBED_MODEL (e.g. "nomic-embed-text", pulled on the server) to
+# enable. It is a third model next to the vision and text ones, so raise the
+# server's OLLAMA_MAX_LOADED_MODELS to 3 or they evict each other
+EMBED_MODEL = os.getenv("EMBED_MODEL", "")
+EMBED_PASSAGE_SECONDS = float(os.getenv("EMBED_PASSAGE_SECONDS", "20"))
+# Persistent passage embeddings (SQLite, float16 vectors) keyed by media
+# content hash + embedding model + passage texts
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(DOWNLOAD_DIR, "embeddings.sqlite3"))
+EMBED_CACHE_MAX_BYTES = int(os.getenv("EMBED_CACHE_MAX_BYTES", str(256 * 1024 ** 2)))
@@ -1,24 +1,66 @@
 import os
 import uuid
+import threading
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool
+from psycopg2.extras import RealDictCursor, execute_values
 from dotenv import load_dotenv
 from urllib.parse import urlparse
+from config import DB_POOL_MIN, DB_POOL_MAX
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Process-wide pool, created on first use. ThreadedConnectionPool raises
+# when exhausted, so the semaphore makes callers wait for a free connection.
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
 
 def get_connection():
     """Create a database connection."""
     return psycopg2.connect(DATABASE_URL)
 
 
+def get_pool() -> pool.ThreadedConnectionPool:
+    """Lazily create the process-wide connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL)
+                print(f"[DB] Connection pool ready ({DB_POOL_MIN}-{DB_POOL_MAX} connections)")
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrow a connection from the pool for one transaction.
+
+    Commits on success, rolls back on error, and discards the connection
+    instead of returning it if it was closed underneath us.
+    """
+    db_pool = get_pool()
+    with _pool_slots:
+        conn = db_pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            db_pool.putconn(conn, close=bool(conn.closed))
+
+
 def update_job_status(job_id: str, status: str, error_message: str = None):
     """Update job status in the database."""
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
             if error_message:
                 cur.execute(
@@ -30,69 +72,98 @@ def update_job_status(job_id: str, status: str, error_message: str = None):
                     """UPDATE jobs SET status = %s, "updatedAt" = NOW() WHERE id = %s""",
                     (status, job_id)
                 )
-        conn.commit()
-        print(f"[DB] Updated job {job_id} status to {status}")
-    finally:
-        conn.close()
+    print(f"[DB] Updated job {job_id} status to {status}")
 
 
 def update_job_progress(job_id: str, progress: int):
     """Update job progress percentage (0-100)."""
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """UPDATE jobs SET progress = %s, "updatedAt" = NOW() WHERE id = %s""",
                 (progress, job_id)
             )
-        conn.commit()
-    finally:
-        conn.close()
+
+
+def update_job(job_id: str, status: str = None, progress: int = None, error_message: str = None):
+    """Update any of status / progress / error message in a single UPDATE."""
+    assignments = []
+    params = []
+    if status is not None:
+        assignments.append("status = %s")
+        params.append(status)
+    if progress is not None:
+        assignments.append("progress = %s")
+        params.append(progress)
+    if error_message:
+        assignments.append('"errorMessage" = %s')
+        params.append(error_message)
+    if not assignments:
+        return
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""UPDATE jobs SET {", ".join(assignments)}, "updatedAt" = NOW() WHERE id = %s""",
+                (*params, job_id)
+            )
+    if status is not None:
+        print(f"[DB] Updated job {job_id} status to {status}")
 
 
 def save_clip(job_id: str, title: str, start_time: float, end_time: float, duration: float, url: str = None) -> str:
     """Save a clip to the database."""
     clip_id = str(uuid.uuid4())
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """INSERT INTO clips (id, "jobId", title, "startTime", "endTime", duration, url, "createdAt")
                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())""",
                 (clip_id, job_id, title, start_time, end_time, duration, url)
             )
-        conn.commit()
-        print(f"[DB] Saved clip {clip_id}: {title}")
-        return clip_id
-    finally:
-        conn.close()
+    print(f"[DB] Saved clip {clip_id}: {title}")
+    return clip_id
 
 
 def save_clips(job_id: str, clips: list) -> list:
-    """Save multiple clips to the database."""
-    saved_clips = []
-    for clip in clips:
-        clip_id = save_clip(
-            job_id=job_id,
-            title=clip.get("title"),
-            start_time=clip.get("start"),
-            end_time=clip.get("end"),
-            duration=clip.get("duration"),
-            url=clip.get("url")
+    """Save multiple clips to the database in one multi-row INSERT."""
+    if not clips:
+        return []
+
+    saved_clips = [{**clip, "id": str(uuid.uuid4())} for clip in clips]
+    rows = [
+        (
+            clip["id"],
+            job_id,
+            clip.get("title"),
+            clip.get("start"),
+            clip.get("end"),
+            clip.get("duration"),
+            clip.get("url"),
         )
-        saved_clips.append({**clip, "id": clip_id})
+        for clip in saved_clips
+    ]
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """INSERT INTO clips (id, "jobId", title, "startTime", "endTime", duration, url, "createdAt")
+                   VALUES %s""",
+                rows,
+                template="(%s, %s, %s, %s, %s, %s, %s, NOW())"
+            )
+
+    print(f"[DB] Saved {len(saved_clips)} clips for job {job_id}")
     return saved_clips
 
 
 def get_job(job_id: str) -> dict:
     """Get a job by ID."""
-    conn = get_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
             return cur.fetchone()
-    finally:
-        conn.close()
 
 
 if __name__ == "__main__":
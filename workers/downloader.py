@@ -1,72 +1,57 @@
 import os
+import re
+import time
+import shutil
 import subprocess
+import threading
+from contextlib import contextmanager
 import yt_dlp
-from config import DOWNLOAD_DIR
-from database import update_job_progress
-
-# Maximum video duration in seconds (10 minutes = 600 seconds)
-MAX_DURATION_SECONDS = 600
+from config import DOWNLOAD_DIR, DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_BYTES, MAX_DURATION_SECONDS
+from progress import ProgressReporter
+from transcript_cache import hash_file
 
 # FFmpeg paths (installed via winget)
 FFMPEG_DIR = r"C:\Users\Subash\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin"
 FFMPEG_PATH = os.path.join(FFMPEG_DIR, "ffmpeg.exe")
 
+# yt-dlp format selector; part of the cache key
+DOWNLOAD_FORMAT = 'b'  # 'b' = best single file with both video and audio
 
-# Global variable for job_id in progress hook
-_current_job_id = None
-
-
-def _progress_hook(d):
-    """yt-dlp progress hook to report download progress."""
-    global _current_job_id
-    if d['status'] == 'downloading' and _current_job_id:
-        # Calculate progress (download phase is 0-25% of total job)
-        total = d.get('total_bytes') or d.get('total_bytes_estimate')
-        downloaded = d.get('downloaded_bytes', 0)
-        if total:
-            download_pct = (downloaded / total) * 100
-            # Download is 0-25% of the total progress
-            overall_progress = int(download_pct * 0.25)
-            update_job_progress(_current_job_id, overall_progress)
-            print(f"[Downloader] Progress: {download_pct:.0f}%", end='\r')
-    elif d['status'] == 'finished':
-        print(f"\n[Downloader] Download complete, processing...")
-        if _current_job_id:
-            update_job_progress(_current_job_id, 25)
+# The lock holder touches its lock file every CACHE_LOCK_HEARTBEAT_SECONDS;
+# a lock file not touched for CACHE_LOCK_STALE_SECONDS belongs to a dead process
+CACHE_LOCK_HEARTBEAT_SECONDS = 15
+CACHE_LOCK_STALE_SECONDS = 90
 
+# In-process locks per cache key (concurrent jobs in one worker)
+_key_locks = {}
+_key_locks_guard = threading.Lock()
 
-def download_video(youtube_url: str, job_id: str) -> dict:
-    """
-    Download video from YouTube using yt-dlp.
-    Returns dict with file path and metadata.
-    """
-    global _current_job_id
-    _current_job_id = job_id  # Set for progress hook
-
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-    # First, check video duration without downloading
-    check_opts = {
-        'quiet': True,
-        'ffmpeg_location': FFMPEG_DIR,
-    }
-    with yt_dlp.YoutubeDL(check_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=False)
-        duration = info.get("duration", 0)
+def _make_progress_hook(reporter: ProgressReporter):
+    """Build a yt-dlp progress hook that reports download progress for one job."""
+    def _progress_hook(d):
+        if d['status'] == 'downloading':
+            # Calculate progress (download phase is 0-25% of total job)
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            downloaded = d.get('downloaded_bytes', 0)
+            if total:
+                download_pct = (downloaded / total) * 100
+                # Download is 0-25% of the total progress
+                overall_progress = int(download_pct * 0.25)
+                reporter.update(progress=overall_progress)  # Deduped + rate-limited
+                print(f"[Downloader] Progress: {download_pct:.0f}%", end='\r')
+        elif d['status'] == 'finished':
+            print(f"\n[Downloader] Download complete, processing...")
+            reporter.update(progress=25)
+            reporter.flush()
 
-        if duration > MAX_DURATION_SECONDS:
-            raise ValueError(
-                f"Video too long: {duration}s. Maximum allowed: {MAX_DURATION_SECONDS}s ({MAX_DURATION_SECONDS//60} minutes). "
-                "This limit prevents excessive API costs."
-            )
+    return _progress_hook
 
-    output_template = os.path.join(DOWNLOAD_DIR, f"{job_id}.%(ext)s")
-    final_output = os.path.join(DOWNLOAD_DIR, f"{job_id}.mp4")
 
-    ydl_opts = {
+def _base_opts(reporter: ProgressReporter = None) -> dict:
+    opts = {
         # Most permissive format - no restrictions, just get something
-        'format': 'b',  # 'b' = best single file with both video and audio
-        'outtmpl': output_template,
+        'format': DOWNLOAD_FORMAT,
         'ffmpeg_location': FFMPEG_DIR,
         'quiet': False,
         'no_warnings': False,
@@ -81,51 +66,278 @@ def download_video(youtube_url: str, job_id: str) -> dict:
         }],
         # Use Android client which has fewer restrictions
         'extractor_args': {'youtube': {'player_client': ['android']}},
-        # Progress hook for reporting download progress
-        'progress_hooks': [_progress_hook],
     }
+    if reporter is not None:
+        # Progress hook for reporting download progress
+        opts['progress_hooks'] = [_make_progress_hook(reporter)]
+    return opts
 
-    print(f"[Downloader] Starting download: {youtube_url}")
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=True)
+def cache_key(info: dict) -> str:
+    """Canonical cache key: extractor + video ID + format selector."""
+    raw = f"{info.get('extractor_key') or 'generic'}_{info['id']}_{DOWNLOAD_FORMAT}"
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', raw)
 
-        # Find the downloaded file
-        file_path = None
-        for ext in ['mp4', 'webm', 'mkv']:
-            check_path = os.path.join(DOWNLOAD_DIR, f"{job_id}.{ext}")
-            if os.path.exists(check_path) and os.path.getsize(check_path) > 0:
-                file_path = check_path
+
+@contextmanager
+def _cache_lock(key: str):
+    """
+    Exclusive lock on one cache entry.
+
+    A threading lock serializes jobs inside this worker; a lock file
+    (O_EXCL) serializes workers sharing DOWNLOAD_DIR. The holder keeps the
+    lock file's mtime fresh, so a crashed worker's lock is taken over
+    within CACHE_LOCK_STALE_SECONDS even while a long download holds
+    another.
+    """
+    with _key_locks_guard:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+
+    lock_path = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.lock")
+    with key_lock:
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
                 break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > CACHE_LOCK_STALE_SECONDS:
+                        print(f"[Downloader] Removing stale lock {lock_path}")
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(1)
+
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(CACHE_LOCK_HEARTBEAT_SECONDS):
+                try:
+                    os.utime(lock_path)
+                except OSError:
+                    pass
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            yield
+        finally:
+            stop.set()
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+
+def _cached_file(key: str) -> str:
+    path = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.mp4")
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return path
+    return None
+
+
+def _link_into_job(cached_path: str, job_path: str):
+    """
+    Expose a cached file at the job path: hardlink, else copy.
+
+    Never a symlink: eviction may delete the cached file while the job
+    still reads it, which a hardlink or copy survives.
+    """
+    if os.path.lexists(job_path):
+        os.remove(job_path)
+    try:
+        os.link(cached_path, job_path)
+        return
+    except OSError:
+        pass
+    shutil.copy2(cached_path, job_path)
+
+
+def content_hash_for(cached_path: str) -> str:
+    """
+    Content hash of a cached video (as used for its extracted audio),
+    computed once and kept in a sidecar file next to it.
+    """
+    sidecar = f"{cached_path}.sha256"
+    try:
+        with open(sidecar) as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    content_hash = hash_file(cached_path)
+    with open(sidecar, "w") as f:
+        f.write(content_hash)
+    return content_hash
+
+
+def _lock_is_live(key: str) -> bool:
+    lock_path = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.lock")
+    try:
+        return time.time() - os.path.getmtime(lock_path) <= CACHE_LOCK_STALE_SECONDS
+    except OSError:
+        return False
 
-        if not file_path:
-            raise Exception(f"Downloaded file not found in {DOWNLOAD_DIR}")
-
-        # Convert to mp4 if not already
-        if not file_path.endswith('.mp4'):
-            print(f"[Downloader] Converting {file_path} to mp4...")
-            convert_cmd = [
-                FFMPEG_PATH, '-y', '-i', file_path,
-                '-c:v', 'copy', '-c:a', 'aac',
-                final_output
-            ]
-            subprocess.run(convert_cmd, capture_output=True)
-            if os.path.exists(final_output) and os.path.getsize(final_output) > 0:
-                os.remove(file_path)
-                file_path = final_output
-
-        file_size = os.path.getsize(file_path)
-        if file_size == 0:
-            raise Exception("The downloaded file is empty")
-
-        print(f"[Downloader] File saved: {file_path} ({file_size / 1024 / 1024:.1f} MB)")
-
-        return {
-            "file_path": file_path,
-            "title": info.get("title"),
-            "duration": info.get("duration"),
-            "thumbnail": info.get("thumbnail"),
-        }
+
+def evict_cache(keep: str = None):
+    """
+    Delete least recently used cache files until under DOWNLOAD_CACHE_MAX_BYTES.
+
+    Covers downloaded videos and the audio PCM extracted from them. Videos
+    in use are skipped (keep, a live lock file, or a job hardlink, i.e. a
+    link count above 1), and so is the audio extracted from them, which
+    running jobs may have memory-mapped.
+    """
+    entries = []
+    protected_audio = set()
+    for name in os.listdir(DOWNLOAD_CACHE_DIR):
+        if not name.endswith((".mp4", ".f32")):
+            continue
+        path = os.path.join(DOWNLOAD_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stem = name.rsplit(".", 1)[0]
+        in_use = name.endswith(".mp4") and (stem == keep or stat.st_nlink > 1 or _lock_is_live(stem))
+        if in_use:
+            try:
+                with open(f"{path}.sha256") as f:
+                    protected_audio.add(f"{f.read().strip()}.f32")
+            except OSError:
+                pass
+        entries.append((stat.st_mtime, stat.st_size, path, in_use))
+
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, in_use in sorted(entries):
+        if total <= DOWNLOAD_CACHE_MAX_BYTES:
+            break
+        if in_use or os.path.basename(path) in protected_audio:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+            print(f"[Downloader] Evicted {os.path.basename(path)} ({size / 1024 / 1024:.1f} MB)")
+        except OSError:
+            continue
+        try:
+            os.remove(f"{path}.sha256")
+        except OSError:
+            pass
+
+
+def release_job_video(job_id: str):
+    """Remove a finished job's link to its source video, so eviction can reclaim it."""
+    job_path = os.path.join(DOWNLOAD_DIR, f"{job_id}.mp4")
+    try:
+        os.remove(job_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"[Downloader] Could not remove {job_path}: {e}")
+
+
+def _download_to_cache(info: dict, key: str, reporter: ProgressReporter) -> str:
+    """Download an already-extracted video into the cache and return its path."""
+    opts = _base_opts(reporter)
+    opts['outtmpl'] = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.%(ext)s")
+
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        # Reuse the metadata we already have instead of extracting again
+        ydl.process_ie_result(info, download=True)
+
+    final_output = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.mp4")
+
+    # Find the downloaded file
+    file_path = None
+    for ext in ['mp4', 'webm', 'mkv']:
+        check_path = os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.{ext}")
+        if os.path.exists(check_path) and os.path.getsize(check_path) > 0:
+            file_path = check_path
+            break
+
+    if not file_path:
+        raise Exception(f"Downloaded file not found in {DOWNLOAD_CACHE_DIR}")
+
+    # Convert to mp4 if not already
+    if not file_path.endswith('.mp4'):
+        print(f"[Downloader] Converting {file_path} to mp4...")
+        convert_cmd = [
+            FFMPEG_PATH, '-y', '-i', file_path,
+            '-c:v', 'copy', '-c:a', 'aac',
+            final_output
+        ]
+        subprocess.run(convert_cmd, capture_output=True)
+        if os.path.exists(final_output) and os.path.getsize(final_output) > 0:
+            os.remove(file_path)
+            file_path = final_output
+        else:
+            raise Exception(f"Could not convert {file_path} to mp4")
+
+    if os.path.getsize(file_path) == 0:
+        raise Exception("The downloaded file is empty")
+
+    return file_path
+
+
+def download_video(youtube_url: str, job_id: str, reporter: ProgressReporter = None) -> dict:
+    """
+    Download video from YouTube using yt-dlp.
+
+    Videos are cached by extractor + video ID + format, so the same video
+    submitted by several jobs is downloaded once; the cached file is linked
+    into DOWNLOAD_DIR/{job_id}.mp4. Metadata is extracted once and reused
+    for both the duration check and the download.
+
+    Returns dict with file path and metadata.
+    """
+    reporter = reporter or ProgressReporter(job_id)
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+
+    # Extract metadata once, without downloading
+    extract_opts = _base_opts()
+    extract_opts['quiet'] = True
+    with yt_dlp.YoutubeDL(extract_opts) as ydl:
+        info = ydl.extract_info(youtube_url, download=False)
+
+    duration = info.get("duration", 0) or 0
+    if duration > MAX_DURATION_SECONDS:
+        raise ValueError(
+            f"Video too long: {duration}s. Maximum allowed: {MAX_DURATION_SECONDS}s ({MAX_DURATION_SECONDS//60} minutes). "
+            "This limit prevents excessive API costs."
+        )
+
+    key = cache_key(info)
+    job_path = os.path.join(DOWNLOAD_DIR, f"{job_id}.mp4")
+
+    # Concurrent jobs for the same video wait here and share one download
+    with _cache_lock(key):
+        cached_path = _cached_file(key)
+        if cached_path:
+            print(f"[Downloader] Cache hit: {key}")
+            os.utime(cached_path)  # Mark as recently used
+            reporter.update(progress=25)
+        else:
+            print(f"[Downloader] Starting download: {youtube_url}")
+            cached_path = _download_to_cache(info, key, reporter)
+            content_hash_for(cached_path)  # Lets eviction protect this video's audio
+            evict_cache(keep=key)
+
+        _link_into_job(cached_path, job_path)
+
+    file_size = os.path.getsize(job_path)
+    print(f"[Downloader] File saved: {job_path} ({file_size / 1024 / 1024:.1f} MB)")
+
+    return {
+        "file_path": job_path,
+        "title": info.get("title"),
+        "duration": info.get("duration"),
+        "thumbnail": info.get("thumbnail"),
+        "video_id": info.get("id"),
+        "cache_key": key,
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+"""
+Persistent embedding cache.
+
+Passage embeddings are keyed by the media content hash, the embedding
+model and a hash of the passage texts, so a new prompt on a known video
+costs a single query embedding. Each row is a length-prefixed
+zlib-compressed JSON header (passages, dim) followed by the raw float16
+vectors. Least recently used rows are evicted once the stored size
+exceeds EMBED_CACHE_MAX_BYTES.
+"""
+
+import json
+import zlib
+import struct
+import hashlib
+from typing import List, Optional
+
+import numpy as np
+
+from config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_BYTES
+from sqlite_cache import SqliteCache
+
+_cache = SqliteCache(EMBED_CACHE_PATH, "embeddings", max_bytes=EMBED_CACHE_MAX_BYTES, label="EmbeddingCache")
+
+
+def make_key(content_hash: str, model: str, passages: List[dict]) -> str:
+    """Cache key from content hash + embedding model + passage texts."""
+    texts_sig = hashlib.sha256(json.dumps([p["text"] for p in passages]).encode("utf-8")).hexdigest()[:16]
+    return f"{content_hash}:{model}:{texts_sig}"
+
+
+def get(key: str) -> Optional[dict]:
+    """Cached {"passages", "vectors" (float32, n x dim)} for key, or None."""
+    data = _cache.get(key)
+    if data is None:
+        return None
+    (header_len,) = struct.unpack_from("<I", data)
+    header = json.loads(zlib.decompress(data[4:4 + header_len]))
+    raw = np.frombuffer(data[4 + header_len:], dtype=np.float16)
+    return {"passages": header["passages"], "vectors": raw.reshape(-1, header["dim"]).astype(np.float32)}
+
+
+def put(key: str, passages: List[dict], vectors: np.ndarray):
+    """Store an index (vectors as float16) and evict old entries if over the size limit."""
+    header = zlib.compress(json.dumps({"passages": passages, "dim": int(vectors.shape[1])}).encode("utf-8"), 6)
+    _cache.put(key, struct.pack("<I", len(header)) + header + vectors.astype(np.float16).tobytes())
+
+
+def stats() -> dict:
+    """Hit/miss/write/eviction counters for this process."""
+    return _cache.stats()
@@ -0,0 +1,93 @@
+"""
+Embedding index - semantic search from a user prompt to transcript passages.
+
+Consecutive segments are grouped into passages of up to
+EMBED_PASSAGE_SECONDS and embedded with an Ollama embedding model. Vectors
+are L2-normalised, so a search is one matrix-vector product (cosine
+similarity). Indexes are persisted in the embedding cache, so a new
+prompt on a known video costs a single query embedding.
+"""
+
+import time
+from typing import List, Optional
+
+import numpy as np
+
+import ollama_client
+import embedding_cache
+from config import EMBED_MODEL, EMBED_PASSAGE_SECONDS
+
+
+def build_passages(segments: List[dict], max_seconds: float = EMBED_PASSAGE_SECONDS) -> List[dict]:
+    """Group consecutive segments into {start, end, text} passages of up to max_seconds."""
+    passages = []
+    current = None
+    for seg in segments:
+        if current is not None and seg["end"] - current["start"] <= max_seconds:
+            current["end"] = seg["end"]
+            current["text"] += " " + seg["text"]
+        else:
+            current = {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            passages.append(current)
+    return passages
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def get_index(transcript: dict, model: str = EMBED_MODEL) -> Optional[dict]:
+    """
+    Load or build the embedding index for a transcript.
+
+    Returns:
+        {"passages": [...], "vectors": float32 array (n, dim), unit length},
+        or None when there is nothing to index
+    """
+    passages = build_passages(transcript.get("segments", []))
+    if not passages:
+        return None
+
+    content_hash = transcript.get("content_hash")
+    key = embedding_cache.make_key(content_hash, model, passages) if content_hash else None
+    if key:
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    vectors = _normalise(np.asarray(ollama_client.embed([p["text"] for p in passages], model), dtype=np.float32))
+    print(f"[Embeddings] Embedded {len(passages)} passages with {model} in {time.perf_counter() - started:.1f}s")
+
+    if key:
+        # float16 halves the stored size; plenty of precision for cosine ranking
+        embedding_cache.put(key, passages, vectors)
+    return {"passages": passages, "vectors": vectors}
+
+
+def similarities(index: dict, query: str, model: str = EMBED_MODEL) -> np.ndarray:
+    """Cosine similarity of query to every passage in the index."""
+    q = _normalise(np.asarray(ollama_client.embed([query], model)[0], dtype=np.float32))
+    return index["vectors"] @ q
+
+
+def search(index: dict, query: str, top_k: int = 5, model: str = EMBED_MODEL) -> List[dict]:
+    """Top-k passages for query, best first, each with its "score"."""
+    return top_passages(index, similarities(index, query, model), top_k)
+
+
+def top_passages(index: dict, scores: np.ndarray, top_k: int = 5) -> List[dict]:
+    """Top-k passages for precomputed similarities(), best first."""
+    best = np.argsort(-scores)[:top_k]
+    return [{**index["passages"][i], "score": round(float(scores[i]), 4)} for i in best]
+
+
+def relevance_curve(index: dict, scores: np.ndarray, n: int) -> np.ndarray:
+    """Per-second relevance from similarities() (each second takes its passage's score)."""
+    curve = np.zeros(n)
+    for passage, score in zip(index["passages"], scores):
+        first = max(0, min(n - 1, int(passage["start"])))
+        last = max(first + 1, min(n, int(np.ceil(passage["end"]))))
+        curve[first:last] = np.maximum(curve[first:last], score)
+    return curve
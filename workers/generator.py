@@ -4,12 +4,14 @@ Generates new videos based on style reference + prompt modifications
 """
 import os
 import gc
+import threading
 import torch
 import cv2
 import numpy as np
 from PIL import Image
 from typing import List, Optional
 from config import DOWNLOAD_DIR
+import models
 
 # Output directory for generated videos
 GENERATED_DIR = os.path.join(DOWNLOAD_DIR, "generated")
@@ -18,8 +20,9 @@ GENERATED_DIR = os.path.join(DOWNLOAD_DIR, "generated")
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 DTYPE = torch.float16 if DEVICE == "cuda" else torch.float32
 
-# Global model (lazy loaded)
+# Global model (lazy loaded, or preloaded at worker startup via models.py)
 _svd_pipeline = None
+_svd_lock = threading.Lock()
 
 
 def clear_gpu_memory():
@@ -34,32 +37,37 @@ def get_svd_pipeline():
     """Lazy load SVD pipeline with memory optimizations for 6GB VRAM."""
     global _svd_pipeline
 
-    if _svd_pipeline is None:
-        print("[Generator] Loading SVD pipeline (this may take a while on first run)...")
+    with _svd_lock:
+        if _svd_pipeline is None:
+            print("[Generator] Loading SVD pipeline (this may take a while on first run)...")
 
-        from diffusers import StableVideoDiffusionPipeline
+            from diffusers import StableVideoDiffusionPipeline
 
-        # Load with memory optimizations
-        _svd_pipeline = StableVideoDiffusionPipeline.from_pretrained(
-            "stabilityai/stable-video-diffusion-img2vid",
-            torch_dtype=DTYPE,
-            variant="fp16" if DTYPE == torch.float16 else None,
-        )
+            # Load with memory optimizations
+            _svd_pipeline = StableVideoDiffusionPipeline.from_pretrained(
+                "stabilityai/stable-video-diffusion-img2vid",
+                torch_dtype=DTYPE,
+                variant="fp16" if DTYPE == torch.float16 else None,
+            )
 
-        # Memory optimizations for 6GB VRAM
-        _svd_pipeline.enable_model_cpu_offload()  # Moves models to CPU when not in use
+            # Memory optimizations for 6GB VRAM
+            _svd_pipeline.enable_model_cpu_offload()  # Moves models to CPU when not in use
 
-        # Try to enable VAE optimizations if available
-        if hasattr(_svd_pipeline, 'enable_vae_slicing'):
-            _svd_pipeline.enable_vae_slicing()
-        if hasattr(_svd_pipeline, 'enable_vae_tiling'):
-            _svd_pipeline.enable_vae_tiling()
+            # Try to enable VAE optimizations if available
+            if hasattr(_svd_pipeline, 'enable_vae_slicing'):
+                _svd_pipeline.enable_vae_slicing()
+            if hasattr(_svd_pipeline, 'enable_vae_tiling'):
+                _svd_pipeline.enable_vae_tiling()
 
-        print(f"[Generator] SVD loaded on {DEVICE}")
+            print(f"[Generator] SVD loaded on {DEVICE}")
 
     return _svd_pipeline
 
 
+# No warmup inference: a single SVD pass costs as much as a real job
+models.register("svd", get_svd_pipeline)
+
+
 def extract_frames(video_path: str, num_frames: int = 14, target_size: tuple = (576, 320)) -> List[Image.Image]:
     """
     Extract frames from video for analysis/reference.
@@ -0,0 +1,37 @@
+"""
+Persistent LLM response cache.
+
+Responses are keyed by a hash of model + prompt + options, so re-running
+the same analysis (same video, same request) skips the LLM entirely.
+Least recently used rows are evicted past LLM_CACHE_MAX_ROWS.
+"""
+
+import json
+import hashlib
+
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_ROWS
+from sqlite_cache import SqliteCache
+
+_cache = SqliteCache(LLM_CACHE_PATH, "llm_responses", max_rows=LLM_CACHE_MAX_ROWS, label="LLMCache")
+
+
+def make_key(model: str, prompt: str, options: dict) -> str:
+    """Cache key for one request."""
+    payload = json.dumps({"model": model, "prompt": prompt, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get(key: str):
+    """Cached response text for key, or None."""
+    data = _cache.get(key)
+    return data.decode("utf-8") if data is not None else None
+
+
+def put(key: str, response: str):
+    """Store a response and evict old rows if over the limit."""
+    _cache.put(key, response.encode("utf-8"))
+
+
+def stats() -> dict:
+    """Hit/miss/write counters for this process."""
+    return _cache.stats()
@@ -0,0 +1,130 @@
+"""
+Media probing helpers shared by the workers (ffprobe wrappers + caches).
+"""
+
+import os
+import json
+import bisect
+import subprocess
+import threading
+from typing import List, Dict
+
+FFMPEG_PATH = r"C:\Users\Subash\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"
+FFPROBE_PATH = FFMPEG_PATH.replace("ffmpeg.exe", "ffprobe.exe")
+
+# Probe results per source file, keyed by (path, size, mtime)
+_keyframe_cache = {}
+_codec_cache = {}
+_keyframe_lock = threading.Lock()
+
+
+def _file_key(video_path: str) -> tuple:
+    stat = os.stat(video_path)
+    return (os.path.abspath(video_path), stat.st_size, stat.st_mtime)
+
+
+def probe_keyframes(video_path: str) -> List[float]:
+    """
+    List keyframe timestamps (seconds) of the first video stream.
+
+    Reads packet flags only (no decoding), and caches the result per
+    source file so repeated cuts of the same video probe it once.
+    """
+    key = _file_key(video_path)
+    with _keyframe_lock:
+        if key in _keyframe_cache:
+            return _keyframe_cache[key]
+
+    cmd = [
+        FFPROBE_PATH,
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=print_section=0",
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed: {result.stderr}")
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) >= 2 and "K" in parts[1]:
+            try:
+                keyframes.append(float(parts[0]))
+            except ValueError:
+                continue
+    keyframes.sort()
+
+    print(f"[Media] {len(keyframes)} keyframes in {os.path.basename(video_path)}")
+
+    with _keyframe_lock:
+        _keyframe_cache[key] = keyframes
+    return keyframes
+
+
+def next_keyframe(keyframes: List[float], t: float) -> float:
+    """First keyframe at or after t, or None."""
+    i = bisect.bisect_left(keyframes, t)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def nearest_keyframe(keyframes: List[float], t: float) -> float:
+    """Keyframe closest to t, or None."""
+    if not keyframes:
+        return None
+    i = bisect.bisect_left(keyframes, t)
+    candidates = keyframes[max(0, i - 1):i + 1]
+    return min(candidates, key=lambda k: abs(k - t))
+
+
+def probe_streams(video_path: str, use_cache: bool = True) -> Dict[str, dict]:
+    """
+    Parameters of the first video and audio streams.
+
+    Returns:
+        {"video": {...}, "audio": {...}} with ffprobe's codec_name, profile,
+        level, pix_fmt, width, height, time_base, sample_rate and channels
+        (whichever apply); a missing stream type is left out
+
+    Raises:
+        Exception if ffprobe fails (failures are not cached)
+    """
+    key = _file_key(video_path)
+    if use_cache:
+        with _keyframe_lock:
+            if key in _codec_cache:
+                return _codec_cache[key]
+
+    cmd = [
+        FFPROBE_PATH,
+        "-v", "error",
+        "-show_entries",
+        "stream=codec_type,codec_name,profile,level,pix_fmt,width,height,time_base,sample_rate,channels",
+        "-of", "json",
+        video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed: {result.stderr}")
+    try:
+        parsed = json.loads(result.stdout or "{}")
+    except json.JSONDecodeError as e:
+        raise Exception(f"ffprobe returned invalid JSON: {e}")
+
+    streams = {}
+    for stream in parsed.get("streams", []):
+        codec_type = stream.pop("codec_type", None)
+        if codec_type in ("video", "audio"):
+            streams.setdefault(codec_type, stream)
+
+    if use_cache:
+        with _keyframe_lock:
+            _codec_cache[key] = streams
+    return streams
+
+
+def probe_codecs(video_path: str) -> Dict[str, str]:
+    """Return {"video": codec_name, "audio": codec_name} for the first streams."""
+    return {kind: stream.get("codec_name") for kind, stream in probe_streams(video_path).items()}
@@ -0,0 +1,103 @@
+"""
+Model registry - preloads and warms up models at worker startup so the
+first job doesn't pay model load latency.
+
+Modules register a loader (and optional warmup) under a name; the worker
+preloads the configured names in a background thread and waits for
+readiness before it starts taking jobs.
+"""
+
+import time
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+_registry = {}
+_lock = threading.Lock()
+
+
+def register(name: str, loader: Callable, warmup: Callable = None):
+    """Register a model loader and an optional warmup(model) callable."""
+    with _lock:
+        _registry[name] = {
+            "loader": loader,
+            "warmup": warmup,
+            "state": "registered",
+            "error": None,
+            "seconds": None,
+            "ready": threading.Event(),
+        }
+
+
+@lru_cache(maxsize=1)
+def cuda_available() -> bool:
+    """Probe for a usable CUDA device once per process."""
+    try:
+        import ctranslate2
+        available = ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        available = False
+    print(f"[Models] CUDA {'available' if available else 'not available'}")
+    return available
+
+
+def _load(name: str):
+    entry = _registry[name]
+    entry["state"] = "loading"
+    started = time.perf_counter()
+    try:
+        model = entry["loader"]()
+        if entry["warmup"] is not None:
+            entry["state"] = "warming"
+            entry["warmup"](model)
+        entry["state"] = "ready"
+        entry["seconds"] = round(time.perf_counter() - started, 1)
+        print(f"[Models] {name} ready in {entry['seconds']}s")
+    except Exception as e:
+        entry["state"] = "failed"
+        entry["error"] = str(e)
+        print(f"[Models] {name} failed to preload: {e} (will load lazily)")
+    finally:
+        entry["ready"].set()
+
+
+def preload(names: List[str]) -> threading.Thread:
+    """Load + warm up the named models in a background thread."""
+    unknown = [n for n in names if n not in _registry]
+    if unknown:
+        print(f"[Models] Unknown models in preload list: {unknown}")
+    names = [n for n in names if n in _registry]
+
+    def run():
+        for name in names:
+            _load(name)
+
+    print(f"[Models] Preloading: {', '.join(names) or 'nothing'}")
+    thread = threading.Thread(target=run, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_ready(names: List[str], timeout: float = None) -> bool:
+    """Block until every named model finished preloading (ready or failed)."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for name in names:
+        if name not in _registry:
+            continue
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not _registry[name]["ready"].wait(remaining):
+            return False
+    return True
+
+
+def is_ready(name: str) -> bool:
+    entry = _registry.get(name)
+    return entry is not None and entry["state"] == "ready"
+
+
+def status() -> Dict[str, Dict]:
+    """{name: {state, seconds, error}} for every registered model."""
+    return {
+        name: {"state": e["state"], "seconds": e["seconds"], "error": e["error"]}
+        for name, e in _registry.items()
+    }
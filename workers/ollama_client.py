@@ -0,0 +1,326 @@
+"""
+Shared Ollama HTTP client used by every worker thread.
+
+- One pooled keep-alive session instead of a new connection per request
+- Load balancing over OLLAMA_URLS (fewest in-flight requests, preferring a
+  server that already has the model loaded)
+- A semaphore per model, so concurrent jobs queue here instead of piling
+  onto the server
+- Default keep_alive per model, so models aren't evicted between phases
+- Retries with jittered exponential backoff on 5xx, connect timeouts and
+  connection errors (on another server when there is one)
+"""
+
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    OLLAMA_URLS, OLLAMA_NUM_PARALLEL, OLLAMA_MODEL_LIMITS, OLLAMA_KEEP_ALIVE, OLLAMA_KEEP_ALIVE_MODELS,
+    OLLAMA_RETRIES, OLLAMA_RETRY_BASE_SECONDS,
+)
+
+# Seconds a server is skipped after a connection error / connect timeout
+ENDPOINT_COOLDOWN_SECONDS = 10.0
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _Endpoint:
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.down_until = 0.0
+        self.models = set()  # Models this server answered for recently (likely loaded)
+
+
+_endpoints = [_Endpoint(url) for url in OLLAMA_URLS]
+_endpoint_lock = threading.Lock()
+_round_robin = 0
+
+_model_semaphores = {}
+_semaphore_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Process-wide session with a connection pool sized for parallel requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max(1, len(_endpoints)),
+                                  pool_maxsize=max(4, OLLAMA_NUM_PARALLEL * 2))
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+    return _session
+
+
+def _model_semaphore(model: str) -> threading.BoundedSemaphore:
+    with _semaphore_lock:
+        if model not in _model_semaphores:
+            limit = OLLAMA_MODEL_LIMITS.get(model, OLLAMA_NUM_PARALLEL * len(_endpoints))
+            _model_semaphores[model] = threading.BoundedSemaphore(max(1, limit))
+        return _model_semaphores[model]
+
+
+def _pick_endpoint(model: str) -> _Endpoint:
+    """Least-loaded healthy server, preferring one that has the model loaded."""
+    global _round_robin
+    now = time.monotonic()
+    with _endpoint_lock:
+        healthy = [e for e in _endpoints if e.down_until <= now] or _endpoints
+        _round_robin += 1
+        n = len(healthy)
+        endpoint = min(
+            enumerate(healthy),
+            key=lambda item: (item[1].in_flight, model not in item[1].models, (item[0] - _round_robin) % n)
+        )[1]
+        endpoint.in_flight += 1
+        return endpoint
+
+
+def _release(endpoint: _Endpoint, model: str = None, ok: bool = None):
+    with _endpoint_lock:
+        endpoint.in_flight -= 1
+        if ok is True:
+            if model:
+                endpoint.models.add(model)
+            endpoint.down_until = 0.0
+        elif ok is False:
+            endpoint.down_until = time.monotonic() + ENDPOINT_COOLDOWN_SECONDS
+            endpoint.models.clear()
+
+
+def _backoff(attempt: int):
+    time.sleep(OLLAMA_RETRY_BASE_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _with_keep_alive(payload: dict) -> dict:
+    if "keep_alive" in payload or not payload.get("model"):
+        return payload
+    return {**payload, "keep_alive": OLLAMA_KEEP_ALIVE_MODELS.get(payload["model"], OLLAMA_KEEP_ALIVE)}
+
+
+@contextmanager
+def _call(path: str, payload: dict, timeout: float, stream: bool = False):
+    """
+    POST payload to path on the best server and yield the response.
+
+    Holds the model's semaphore and the server's in-flight count until the
+    block exits. 5xx answers, connect timeouts and connection errors are
+    retried with jittered backoff (sleeping without the semaphore, so one
+    failing server doesn't stall other callers of the model); after the
+    last attempt a 5xx response is yielded as-is and a connection error is
+    raised. Read timeouts and other errors are raised at once and don't
+    mark the server down.
+    """
+    model = payload.get("model", "")
+    payload = _with_keep_alive(payload)
+    semaphore = _model_semaphore(model)
+    attempt = 0
+    while True:
+        semaphore.acquire()
+        endpoint = _pick_endpoint(model)
+        try:
+            response = get_session().post(endpoint.url + path, json=payload, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.ConnectTimeout) as e:
+            # Never reached the server: cool it down and try again
+            _release(endpoint, ok=False)
+            semaphore.release()
+            if attempt >= OLLAMA_RETRIES:
+                raise
+            print(f"[Ollama] {endpoint.url} failed ({type(e).__name__}), retrying")
+            _backoff(attempt)
+            attempt += 1
+            continue
+        except Exception:
+            # Read timeout (the server took the request but is slow; re-sending
+            # would repeat the whole generation) or a request error: no retry
+            _release(endpoint)
+            semaphore.release()
+            raise
+
+        if response.status_code >= 500 and attempt < OLLAMA_RETRIES:
+            print(f"[Ollama] {endpoint.url} returned {response.status_code}, retrying")
+            response.close()
+            _release(endpoint)
+            semaphore.release()
+            _backoff(attempt)
+            attempt += 1
+            continue
+        break
+
+    try:
+        yield response
+    finally:
+        if stream:
+            response.close()
+        _release(endpoint, model if response.status_code == 200 else None, ok=response.status_code < 500)
+        semaphore.release()
+
+
+def generate(payload: dict, timeout: float) -> requests.Response:
+    """
+    POST a /api/generate request through the shared client.
+
+    The response is returned as-is (callers check status_code); the
+    wall-clock time, including any retries, is attached as
+    response.elapsed_seconds.
+    """
+    started = time.perf_counter()
+    with _call("/api/generate", payload, timeout) as response:
+        response.elapsed_seconds = time.perf_counter() - started
+        return response
+
+
+def status() -> list:
+    """Per-server in-flight counts, health and recently used models."""
+    now = time.monotonic()
+    with _endpoint_lock:
+        return [
+            {"url": e.url, "in_flight": e.in_flight, "healthy": e.down_until <= now, "models": sorted(e.models)}
+            for e in _endpoints
+        ]
+
+
+class JsonObjectTracker:
+    """
+    Incrementally tracks a JSON object in streamed text.
+
+    feed() returns True once the first top-level {...} has closed, taking
+    strings and escapes into account, so a caller can stop generation
+    without waiting for the model to run out its token budget.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.start = -1
+        self.end = -1
+        self.in_string = False
+        self.escaped = False
+        self.pos = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.end != -1
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if self.closed:
+                break
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth > 0:
+                self.in_string = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.end = self.pos + 1
+            self.pos += 1
+        return self.closed
+
+
+def stream_generate(payload: dict, timeout: float, stop_on_json: bool = False) -> dict:
+    """
+    Stream a /api/generate request through the shared client and consume
+    the NDJSON chunks. Only connecting is retried, never a half-read stream.
+
+    Args:
+        payload: Request body ("stream" is forced on)
+        timeout: Connect / between-chunks timeout in seconds
+        stop_on_json: Close the stream as soon as the first JSON object in
+                      the output is complete (Ollama aborts generation when
+                      the client disconnects)
+
+    Returns:
+        Dict with "text", "final" (the done chunk, {} if stopped early),
+        "stopped_early", "ttft_ms", "tokens", "tokens_per_sec" and "wall_ms"
+
+    Raises:
+        Exception on a non-200 response or an in-stream error
+    """
+    started = time.perf_counter()
+    parts = []
+    final = {}
+    tokens = 0
+    first_token_at = None
+    stopped_early = False
+    tracker = JsonObjectTracker() if stop_on_json else None
+
+    with _call("/api/generate", {**payload, "stream": True}, timeout, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(f"Ollama error: {response.text}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise Exception(f"Ollama error: {chunk['error']}")
+
+            piece = chunk.get("response", "")
+            if piece:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                tokens += 1
+                parts.append(piece)
+
+            if chunk.get("done"):
+                final = chunk
+                break
+            if tracker is not None and piece and tracker.feed(piece):
+                stopped_early = True
+                break
+
+    finished = time.perf_counter()
+    text = "".join(parts)
+    if tracker is not None and tracker.closed:
+        text = text[tracker.start:tracker.end]
+
+    if final.get("eval_duration"):
+        tokens = final.get("eval_count", tokens)
+        tokens_per_sec = tokens / (final["eval_duration"] / 1e9)
+    elif first_token_at is not None and finished > first_token_at:
+        tokens_per_sec = tokens / (finished - first_token_at)
+    else:
+        tokens_per_sec = 0.0
+
+    return {
+        "text": text,
+        "final": final,
+        "stopped_early": stopped_early,
+        "ttft_ms": (first_token_at - started) * 1000 if first_token_at is not None else None,
+        "tokens": tokens,
+        "tokens_per_sec": tokens_per_sec,
+        "wall_ms": (finished - started) * 1000,
+    }
+
+
+def embed(texts: list, model: str, timeout: float = 120, batch_size: int = 64) -> list:
+    """
+    Embed texts with Ollama's /api/embed endpoint through the shared client.
+
+    Returns:
+        One vector (list of floats) per text, in order
+    """
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        with _call("/api/embed", {"model": model, "input": texts[i:i + batch_size]}, timeout) as response:
+            if response.status_code != 200:
+                raise Exception(f"Ollama embed error: {response.text}")
+            vectors.extend(response.json()["embeddings"])
+    return vectors
@@ -0,0 +1,63 @@
+"""
+Stage DAG executor - runs job stages as soon as their dependencies finish,
+so independent stages (e.g. transcription and vision) overlap.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Tuple
+
+
+def run_stages(stages: Dict[str, Tuple[Callable, List[str]]], max_workers: int = None) -> Dict:
+    """
+    Run a DAG of stages.
+
+    Args:
+        stages: {name: (fn, [dependency names])}. Each fn is called with its
+                dependencies' results as keyword arguments.
+        max_workers: Max stages running at once (default: number of stages)
+
+    Returns:
+        Dict of {name: result} for every stage
+
+    Raises:
+        The first exception raised by any stage. Stages already running are
+        allowed to finish, nothing new is started.
+    """
+    for name, (_, deps) in stages.items():
+        missing = [d for d in deps if d not in stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+
+    results = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as pool:
+        while pending or running:
+            # Start every stage whose dependencies are all done
+            for name in [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]:
+                fn, deps = pending.pop(name)
+                kwargs = {d: results[d] for d in deps}
+                running[pool.submit(_timed, name, fn, kwargs)] = name
+
+            if not running:
+                raise ValueError(f"Stage graph has a cycle: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    pending.clear()
+                    raise error
+                results[name] = future.result()
+
+    return results
+
+
+def _timed(name: str, fn: Callable, kwargs: dict):
+    started = time.perf_counter()
+    result = fn(**kwargs)
+    print(f"[Pipeline] Stage '{name}' finished in {time.perf_counter() - started:.1f}s")
+    return result
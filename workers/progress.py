@@ -0,0 +1,102 @@
+"""
+Per-job progress reporter.
+
+Coalesces status/progress updates into single UPDATEs, drops unchanged
+values, rate-limits progress writes, and mirrors every write to Redis
+pub/sub so the API can push updates without polling the jobs table.
+"""
+
+import json
+import time
+import threading
+
+from config import PROGRESS_MIN_INTERVAL_MS, PROGRESS_CHANNEL
+from database import update_job
+
+
+class ProgressReporter:
+    """
+    Progress reporter for one job.
+
+    Status changes (stage transitions) and failures are written
+    immediately together with any pending progress. Progress-only
+    updates are written at most once per PROGRESS_MIN_INTERVAL_MS; a
+    trailing flush makes sure the latest value still lands.
+    """
+
+    def __init__(self, job_id: str, publisher=None, min_interval_ms: int = PROGRESS_MIN_INTERVAL_MS):
+        self.job_id = job_id
+        self.publisher = publisher  # Redis client, optional
+        self.min_interval = min_interval_ms / 1000.0
+
+        self._lock = threading.Lock()
+        self._written = {"status": None, "progress": None}
+        self._pending = {}
+        self._last_write = 0.0
+        self._timer = None
+
+    def update(self, status: str = None, progress: int = None):
+        """Report a new status and/or progress (0-100)."""
+        with self._lock:
+            if status is not None and status != self._written["status"]:
+                self._pending["status"] = status
+            if progress is not None:
+                progress = int(progress)
+                if progress != self._written["progress"]:
+                    self._pending["progress"] = progress
+                else:
+                    self._pending.pop("progress", None)
+
+            if not self._pending:
+                return
+
+            wait_for = self._last_write + self.min_interval - time.monotonic()
+            if "status" in self._pending or wait_for <= 0:
+                self._write_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(wait_for, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write any pending update now."""
+        with self._lock:
+            if self._pending:
+                self._write_locked()
+
+    def fail(self, error_message: str):
+        """Mark the job FAILED with an error message."""
+        with self._lock:
+            self._pending["status"] = "FAILED"
+            self._write_locked(error_message=error_message)
+
+    def complete(self):
+        """Mark the job COMPLETED at 100%."""
+        self.update(status="COMPLETED", progress=100)
+
+    def _write_locked(self, error_message: str = None):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        update = self._pending
+        self._pending = {}
+        update_job(self.job_id, error_message=error_message, **update)
+        self._written.update(update)
+        self._last_write = time.monotonic()
+
+        self._publish(error_message)
+
+    def _publish(self, error_message: str = None):
+        if self.publisher is None:
+            return
+        try:
+            self.publisher.publish(PROGRESS_CHANNEL, json.dumps({
+                "jobId": self.job_id,
+                "status": self._written["status"],
+                "progress": self._written["progress"],
+                "errorMessage": error_message,
+                "timestamp": time.time(),
+            }))
+        except Exception as e:
+            print(f"[Progress] Publish failed for job {self.job_id}: {e}")
@@ -0,0 +1,221 @@
+"""
+Heuristic pre-ranker - cheap per-second interest scores from the
+transcript, the audio track and the vision scene pre-pass, computed with
+NumPy so the LLM only has to look at the most promising regions.
+
+Signals (each z-scored, then weighted):
+  speech_rate - words per second
+  loudness    - RMS level in dB
+  reaction    - loud seconds with no words (laughter, applause, music hits)
+  keywords    - TF-IDF of the user prompt's terms in the segment being spoken
+  scenes      - scene-change density from the vision pre-pass
+  relevance   - embedding similarity of the prompt to what is being said
+                (embedding_index.relevance_curve), when available
+"""
+
+import re
+import math
+from typing import List, Dict
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+from word_index import WordIndex
+from config import PRERANK_TOP_K, PRERANK_REGION_SECONDS
+
+SIGNAL_WEIGHTS = {
+    "speech_rate": 0.8,
+    "loudness": 1.0,
+    "reaction": 0.8,
+    "keywords": 1.5,
+    "scenes": 0.7,
+    "relevance": 2.0,
+}
+
+# Seconds of moving-average smoothing applied to the combined score
+SMOOTH_SECONDS = 5
+
+# Audio is reduced to RMS in blocks of this many seconds (bounded memory)
+RMS_BLOCK_SECONDS = 600
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "clip", "clips", "do", "find",
+    "for", "from", "get", "give", "have", "i", "in", "is", "it", "me", "moment", "moments", "my",
+    "of", "on", "or", "part", "parts", "show", "so", "that", "the", "their", "they", "this", "to",
+    "video", "want", "was", "were", "what", "when", "where", "which", "who", "with", "you", "your",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    std = x.std()
+    if std < 1e-9:
+        return np.zeros_like(x)
+    return (x - x.mean()) / std
+
+
+def _word_arrays(transcript: dict):
+    """(starts, ends) of every word, falling back to segment spans."""
+    words = transcript.get("words")
+    if words:
+        index = WordIndex.from_dict(words)
+        if len(index):
+            return np.asarray(index.starts), np.asarray(index.ends)
+    segments = transcript.get("segments", [])
+    starts, ends = [], []
+    for seg in segments:
+        n = max(1, len(seg["text"].split()))
+        step = (seg["end"] - seg["start"]) / n
+        starts.extend(seg["start"] + step * i for i in range(n))
+        ends.extend(seg["start"] + step * (i + 1) for i in range(n))
+    return np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+
+
+def speech_rate(starts: np.ndarray, n: int) -> np.ndarray:
+    """Words starting in each second."""
+    if not len(starts):
+        return np.zeros(n)
+    return np.bincount(np.clip(starts.astype(int), 0, n - 1), minlength=n).astype(np.float64)
+
+
+def speech_mask(starts: np.ndarray, ends: np.ndarray, n: int) -> np.ndarray:
+    """1.0 for every second touched by a word, else 0.0."""
+    coverage = np.zeros(n + 1)
+    if len(starts):
+        first = np.clip(starts.astype(int), 0, n - 1)
+        last = np.clip(ends.astype(int), 0, n - 1)
+        np.add.at(coverage, first, 1)
+        np.add.at(coverage, last + 1, -1)
+    return (np.cumsum(coverage)[:n] > 0).astype(np.float64)
+
+
+def loudness(audio: np.ndarray, n: int) -> np.ndarray:
+    """RMS level per second in dB (silence ~ -120)."""
+    rms = np.zeros(n)
+    usable = min(n, len(audio) // SAMPLE_RATE)
+    for block in range(0, usable, RMS_BLOCK_SECONDS):
+        stop = min(usable, block + RMS_BLOCK_SECONDS)
+        samples = np.asarray(audio[block * SAMPLE_RATE:stop * SAMPLE_RATE], dtype=np.float32)
+        rms[block:stop] = np.sqrt(np.mean(np.square(samples.reshape(stop - block, SAMPLE_RATE)), axis=1))
+    return 20 * np.log10(rms + 1e-6)
+
+
+def keyword_scores(segments: List[dict], prompt: str, n: int) -> np.ndarray:
+    """
+    TF-IDF of the prompt's terms per segment (segments are the documents),
+    spread over the seconds each segment covers.
+    """
+    scores = np.zeros(n)
+    terms = set(_tokens(prompt))
+    if not terms or not segments:
+        return scores
+
+    docs = [_tokens(seg["text"]) for seg in segments]
+    df = {t: sum(1 for doc in docs if t in doc) for t in terms}
+    idf = {t: math.log((len(docs) + 1) / (df[t] + 1)) + 1 for t in terms}
+
+    for seg, doc in zip(segments, docs):
+        if not doc:
+            continue
+        value = sum(doc.count(t) * idf[t] for t in terms if df[t]) / math.sqrt(len(doc))
+        if value:
+            first = max(0, min(n - 1, int(seg["start"])))
+            last = max(first + 1, min(n, int(math.ceil(seg["end"]))))
+            scores[first:last] = np.maximum(scores[first:last], value)
+    return scores
+
+
+def scene_density(scene_scores: List[dict], n: int) -> np.ndarray:
+    """Sum of scene-change scores per second."""
+    density = np.zeros(n)
+    if scene_scores:
+        times = np.array([s["timestamp"] for s in scene_scores])
+        values = np.array([s["score"] for s in scene_scores])
+        np.add.at(density, np.clip(times.astype(int), 0, n - 1), values)
+    return density
+
+
+def interest_curve(transcript: dict, prompt: str = "", audio: np.ndarray = None,
+                   vision_result: dict = None, relevance: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """
+    Per-second interest score for a video.
+
+    Args:
+        transcript: Transcript dict (segments, words, duration)
+        prompt: User's prompt, for keyword relevance
+        audio: 16 kHz mono samples (audio.load_audio), optional
+        vision_result: analyze_video_content() result, optional (scene_scores)
+        relevance: Per-second prompt similarity, optional
+
+    Returns:
+        Dict of the raw per-second signals plus "score", the smoothed
+        weighted sum of their z-scores
+    """
+    n = max(1, int(math.ceil(transcript.get("duration") or 0)))
+    starts, ends = _word_arrays(transcript)
+
+    signals = {
+        "speech_rate": speech_rate(starts, n),
+        "keywords": keyword_scores(transcript.get("segments", []), prompt, n),
+    }
+    if audio is not None and len(audio):
+        level = loudness(audio, n)
+        signals["loudness"] = level
+        signals["reaction"] = np.maximum(level - np.median(level), 0) * (1.0 - speech_mask(starts, ends, n))
+    if vision_result and vision_result.get("scene_scores"):
+        signals["scenes"] = scene_density(vision_result["scene_scores"], n)
+    if relevance is not None and len(relevance) == n:
+        signals["relevance"] = relevance
+
+    score = np.zeros(n)
+    for name, values in signals.items():
+        score += SIGNAL_WEIGHTS[name] * _zscore(values)
+
+    kernel = np.ones(min(SMOOTH_SECONDS, n)) / min(SMOOTH_SECONDS, n)
+    signals["score"] = np.convolve(score, kernel, mode="same")
+    return signals
+
+
+def top_regions(score: np.ndarray, top_k: int = PRERANK_TOP_K,
+                region_seconds: int = PRERANK_REGION_SECONDS) -> List[dict]:
+    """
+    The top_k non-overlapping region_seconds windows with the highest total
+    score, ordered by start time.
+
+    Returns:
+        List of {start, end, score, peak} (peak = best second in the region)
+    """
+    n = len(score)
+    length = max(1, min(region_seconds, n))
+    totals = np.convolve(score, np.ones(length), mode="valid")  # totals[i] = sum(score[i:i+length])
+    available = np.ones(len(totals), dtype=bool)
+
+    regions = []
+    for _ in range(top_k):
+        if not available.any():
+            break
+        i = int(np.argmax(np.where(available, totals, -np.inf)))
+        peak = i + int(np.argmax(score[i:i + length]))
+        regions.append({
+            "start": float(i),
+            "end": float(i + length),
+            "score": round(float(totals[i]) / length, 3),
+            "peak": float(peak),
+        })
+        available[max(0, i - length + 1):i + length] = False
+
+    regions.sort(key=lambda r: r["start"])
+    return regions
+
+
+def rank_regions(transcript: dict, prompt: str = "", audio: np.ndarray = None, vision_result: dict = None,
+                 relevance: np.ndarray = None, top_k: int = PRERANK_TOP_K,
+                 region_seconds: int = PRERANK_REGION_SECONDS) -> List[dict]:
+    """interest_curve() + top_regions() in one call."""
+    curve = interest_curve(transcript, prompt, audio, vision_result, relevance)
+    return top_regions(curve["score"], top_k, region_seconds)
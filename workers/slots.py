@@ -0,0 +1,72 @@
+"""
+Resource slots shared by concurrently running jobs.
+
+Each job stage holds the slot for the resource it saturates, so e.g. a
+download for one job can overlap transcription for another while two
+jobs never fight over the GPU.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from config import DOWNLOAD_SLOTS, CPU_SLOTS, OLLAMA_SLOTS, GPU_SLOTS
+
+SLOT_CAPACITY = {
+    "download": DOWNLOAD_SLOTS,
+    "cpu": CPU_SLOTS,
+    "ollama": OLLAMA_SLOTS,
+    "gpu": GPU_SLOTS,
+}
+
+_semaphores = {kind: threading.BoundedSemaphore(max(1, n)) for kind, n in SLOT_CAPACITY.items()}
+_in_use = {kind: 0 for kind in SLOT_CAPACITY}
+_waiting = {kind: 0 for kind in SLOT_CAPACITY}
+_lock = threading.Lock()
+
+
+@contextmanager
+def slot(kind: str):
+    """Hold one slot of the given kind for the duration of the block."""
+    semaphore = _semaphores[kind]
+
+    with _lock:
+        _waiting[kind] += 1
+    try:
+        semaphore.acquire()
+    finally:
+        with _lock:
+            _waiting[kind] -= 1
+
+    with _lock:
+        _in_use[kind] += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _in_use[kind] -= 1
+        semaphore.release()
+
+
+def occupancy() -> Dict[str, Dict[str, int]]:
+    """Snapshot of {kind: {in_use, waiting, capacity}}."""
+    with _lock:
+        return {
+            kind: {
+                "in_use": _in_use[kind],
+                "waiting": _waiting[kind],
+                "capacity": max(1, SLOT_CAPACITY[kind]),
+            }
+            for kind in SLOT_CAPACITY
+        }
+
+
+def format_occupancy() -> str:
+    """One-line occupancy summary, e.g. 'cpu 1/2 (+1 waiting) | gpu 0/1'."""
+    parts = []
+    for kind, o in occupancy().items():
+        part = f"{kind} {o['in_use']}/{o['capacity']}"
+        if o["waiting"]:
+            part += f" (+{o['waiting']} waiting)"
+        parts.append(part)
+    return " | ".join(parts)
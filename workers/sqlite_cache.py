@@ -0,0 +1,136 @@
+"""
+SQLite-backed LRU cache shared by the persistent caches (transcripts,
+frame descriptions, LLM responses, embeddings).
+
+Each cache is one table of (key, data BLOB, size, created_at,
+last_access) rows. Least recently used rows are evicted once the table
+exceeds max_bytes of stored data and/or max_rows rows. Several tables
+may live in one database file.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+# SQLite's default limit on bound parameters per statement is 999
+_MAX_PARAMS = 900
+
+
+class SqliteCache:
+    """One LRU key -> bytes table in a SQLite database."""
+
+    def __init__(self, path: str, table: str, max_bytes: int = None, max_rows: int = None, label: str = "Cache"):
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.label = label
+        self._schema_ready = False
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._stats_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                        key TEXT PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )"""
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_access ON {self.table}(last_access)")
+            conn.commit()
+            self._schema_ready = True
+        return conn
+
+    def _count(self, name: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored bytes for key, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """{key: bytes} for every key present; refreshes their LRU position."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        conn = self._connect()
+        try:
+            for i in range(0, len(keys), _MAX_PARAMS):
+                batch = keys[i:i + _MAX_PARAMS]
+                rows = conn.execute(
+                    f"SELECT key, data FROM {self.table} WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                conn.executemany(f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+                conn.commit()
+        finally:
+            conn.close()
+
+        self._count("hits", len(found))
+        self._count("misses", len(keys) - len(found))
+        return found
+
+    def put(self, key: str, data: bytes):
+        """Store one value and evict old rows if over the limits."""
+        self.put_many({key: data})
+
+    def put_many(self, items: Dict[str, bytes]):
+        """Store several values in one transaction and evict old rows if over the limits."""
+        if not items:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                f"""INSERT OR REPLACE INTO {self.table} (key, data, size, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)""",
+                [(key, data, len(data), now, now) for key, data in items.items()]
+            )
+            conn.commit()
+            self._count("writes", len(items))
+            self._evict(conn)
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection):
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        over_rows = self.max_rows is not None and count > self.max_rows
+        over_bytes = self.max_bytes is not None and total > self.max_bytes
+        if not (over_rows or over_bytes):
+            return
+
+        doomed = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access").fetchall():
+            rows_ok = self.max_rows is None or count <= self.max_rows
+            bytes_ok = self.max_bytes is None or total <= self.max_bytes
+            if rows_ok and bytes_ok:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", doomed)
+        conn.commit()
+        self._count("evictions", len(doomed))
+        print(f"[{self.label}] Evicted {len(doomed)} entries")
+
+    def stats(self) -> dict:
+        """Hit/miss/write/eviction counters for this process, plus hit_rate."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = snapshot["hits"] / lookups if lookups else 0.0
+        return snapshot
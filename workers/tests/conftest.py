@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Import worker modules from workers/, with caches and downloads in a scratch dir
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DOWNLOAD_DIR", tempfile.mkdtemp(prefix="clipsmith-tests-"))
@@ -0,0 +1,151 @@
+import analyzer
+from config import ANALYSIS_MAP_REDUCE_SECONDS, MAX_DURATION_SECONDS
+
+
+def _transcript(duration: float) -> dict:
+    segments = [
+        {"start": float(t), "end": float(t + 10), "text": f"Sentence number {t // 10}."}
+        for t in range(0, int(duration), 10)
+    ]
+    return {"duration": duration, "segments": segments, "words": None}
+
+
+def test_map_reduce_threshold_below_download_cap():
+    assert ANALYSIS_MAP_REDUCE_SECONDS < MAX_DURATION_SECONDS
+
+
+def test_long_transcript_takes_map_reduce_branch(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, num_predict=1024, **kwargs):
+        prompts.append(prompt)
+        if "CANDIDATES:" in prompt:
+            return {"text": '{"picks": [{"id": 1, "title": "Picked"}]}', "cached": False, "timings": {}}
+        return {"text": '{"clips": [{"title": "Window clip", "start": 200.0, "end": 230.0, '
+                        '"reason": "good", "score": 8}]}', "cached": False, "timings": {}}
+
+    monkeypatch.setattr(analyzer, "call_llm", fake_llm)
+    monkeypatch.setattr(analyzer, "prerank", lambda *args, **kwargs: [])
+
+    duration = MAX_DURATION_SECONDS - 10
+    assert duration > ANALYSIS_MAP_REDUCE_SECONDS
+    clips = analyzer.analyze_transcript(_transcript(duration), "find the best part")
+
+    windows = analyzer.build_windows(duration)
+    assert len(windows) > 1
+    # One map call per window plus the reduce call
+    assert len(prompts) == len(windows) + 1
+    assert "CANDIDATES:" in prompts[-1]
+    assert [c["title"] for c in clips] == ["Picked"]
+    assert clips[0]["start"] == 200.0
+
+
+def test_short_transcript_uses_single_prompt(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, num_predict=1024, **kwargs):
+        prompts.append(prompt)
+        return {"text": '{"clips": [{"title": "One", "start": 20.0, "end": 50.0, "reason": "r"}]}',
+                "cached": False, "timings": {}}
+
+    monkeypatch.setattr(analyzer, "call_llm", fake_llm)
+    monkeypatch.setattr(analyzer, "prerank", lambda *args, **kwargs: [])
+
+    clips = analyzer.analyze_transcript(_transcript(120.0), "find the best part")
+
+    assert len(prompts) == 1
+    assert clips[0]["title"] == "One"
+
+
+def _fake_stream(text):
+    def stream_generate(payload, timeout, stop_on_json=False):
+        return {"text": text, "final": {}, "stopped_early": True, "ttft_ms": 1.0,
+                "tokens": 3, "tokens_per_sec": 10.0, "wall_ms": 5.0}
+    return stream_generate
+
+
+def test_call_llm_does_not_cache_unparseable_output(monkeypatch):
+    monkeypatch.setattr(analyzer.ollama_client, "stream_generate", _fake_stream('{"clips": [oops'))
+    prompt = "unparseable output prompt"
+    analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))
+
+    monkeypatch.setattr(analyzer.ollama_client, "stream_generate", _fake_stream('{"clips": [{"start": 1}]}'))
+    result = analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))
+    assert result["cached"] is False
+
+
+def test_call_llm_does_not_cache_missing_clips(monkeypatch):
+    monkeypatch.setattr(analyzer.ollama_client, "stream_generate", _fake_stream('{"clips": []}'))
+    prompt = "empty clips prompt"
+    analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))
+    assert analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))["cached"] is False
+
+
+def test_call_llm_caches_valid_output(monkeypatch):
+    monkeypatch.setattr(analyzer.ollama_client, "stream_generate", _fake_stream('{"clips": [{"start": 1}]}'))
+    prompt = "valid output prompt"
+    analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))
+    result = analyzer.call_llm(prompt, cache_if=analyzer._list_check("clips"))
+    assert result["cached"] is True
+    assert result["text"] == '{"clips": [{"start": 1}]}'
+
+
+def test_extract_json_finds_outermost_object():
+    text = 'Sure! Here you go:\n{"clips": [{"start": 1, "end": 2}]}\nHope that helps.'
+    assert analyzer.extract_json(text) == {"clips": [{"start": 1, "end": 2}]}
+
+
+def test_extract_json_returns_empty_on_garbage():
+    assert analyzer.extract_json("no json here") == {}
+    assert analyzer.extract_json('{"clips": [') == {}
+    assert analyzer.extract_json("[1, 2]") == {}
+
+
+def test_merge_candidates_drops_overlapping_lower_scores():
+    candidates = [
+        {"start": 0.0, "end": 30.0, "score": 6},
+        {"start": 5.0, "end": 35.0, "score": 9},   # same moment, found by another window
+        {"start": 28.0, "end": 58.0, "score": 7},  # touches the best one but mostly new
+        {"start": 100.0, "end": 130.0, "score": 5},
+    ]
+
+    kept = analyzer.merge_candidates(candidates, limit=10)
+
+    assert [c["score"] for c in kept] == [9, 7, 5]
+    assert len(analyzer.merge_candidates(candidates, limit=2)) == 2
+
+
+def test_short_video_preranks_only_for_the_fallback(monkeypatch):
+    calls = []
+    region = {"start": 60.0, "end": 90.0, "score": 2.0, "peak": 70.0}
+    monkeypatch.setattr(analyzer, "prerank", lambda *args, **kwargs: calls.append(args) or [region])
+    answers = iter(['{"clips": [{"title": "One", "start": 20.0, "end": 50.0, "reason": "r"}]}', '{"clips": []}'])
+    monkeypatch.setattr(analyzer, "call_llm", lambda prompt, **kwargs: {"text": next(answers)})
+
+    duration = analyzer.PRERANK_MIN_SECONDS - 20
+    assert analyzer.analyze_transcript(_transcript(duration), "first")[0]["title"] == "One"
+    assert calls == []
+
+    clips = analyzer.analyze_transcript(_transcript(duration), "second")
+    assert len(calls) == 1
+    assert clips[0]["start"] == 60.0  # default clip seeded from the region's peak
+
+
+def test_long_video_preranks_up_front(monkeypatch):
+    calls = []
+    monkeypatch.setattr(analyzer, "prerank", lambda *args, **kwargs: calls.append(args) or [])
+    monkeypatch.setattr(analyzer, "call_llm", lambda prompt, **kwargs: {"text": '{"clips": []}'})
+
+    analyzer.analyze_transcript(_transcript(analyzer.PRERANK_MIN_SECONDS + 20), "find it")
+    assert len(calls) == 1
+
+
+def test_embedding_retrieval_skipped_for_short_videos(monkeypatch):
+    retrieved = []
+    monkeypatch.setattr(analyzer, "EMBED_MODEL", "embed")
+    monkeypatch.setattr(analyzer, "retrieve_relevance", lambda transcript, prompt: retrieved.append(prompt))
+    monkeypatch.setattr(analyzer, "rank_regions", lambda *args: [])
+
+    analyzer.prerank(_transcript(analyzer.PRERANK_MIN_SECONDS - 20), "short")
+    analyzer.prerank(_transcript(analyzer.PRERANK_MIN_SECONDS + 20), "long")
+    assert retrieved == ["long"]
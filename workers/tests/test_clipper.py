@@ -0,0 +1,144 @@
+import shutil
+import subprocess
+
+import pytest
+
+import clipper
+import media
+
+H264_SOURCE = {
+    "video": {"codec_name": "h264", "profile": "High", "level": 40, "pix_fmt": "yuv420p",
+              "width": 1280, "height": 720, "time_base": "1/15360"},
+    "audio": {"codec_name": "aac", "profile": "LC", "sample_rate": "44100", "channels": 2},
+}
+
+
+@pytest.fixture
+def source(monkeypatch):
+    """Pretend the source has keyframes every 2s and matchable H.264/AAC streams."""
+    monkeypatch.setattr(clipper, "probe_keyframes", lambda path: [0.0, 2.0, 4.0, 6.0, 8.0, 10.0])
+    monkeypatch.setattr(clipper, "probe_streams", lambda path: H264_SOURCE)
+    monkeypatch.setattr(clipper, "CLIP_STREAM_COPY", True)
+    monkeypatch.setattr(clipper, "CLIP_SMART_CUT", True)
+    monkeypatch.setattr(clipper, "KEYFRAME_TOLERANCE", 0.25)
+
+
+def test_plan_cut_copies_near_keyframe(source):
+    assert clipper.plan_cut("v.mp4", 4.1, 9.0) == ("copy", 4.0, 4.0)
+
+
+def test_plan_cut_smart_cuts_between_keyframes(source):
+    assert clipper.plan_cut("v.mp4", 3.0, 9.0) == ("smart", 3.0, 4.0)
+
+
+def test_plan_cut_reencodes_when_streams_unmatched(source, monkeypatch):
+    monkeypatch.setattr(clipper, "probe_streams", lambda path: {**H264_SOURCE, "video": {
+        **H264_SOURCE["video"], "pix_fmt": "yuv420p10le"}})
+    assert clipper.plan_cut("v.mp4", 3.0, 9.0) == ("reencode", 3.0, None)
+
+
+def test_plan_cut_reencodes_without_copy(source, monkeypatch):
+    monkeypatch.setattr(clipper, "CLIP_STREAM_COPY", False)
+    assert clipper.plan_cut("v.mp4", 4.0, 9.0) == ("reencode", 4.0, None)
+
+
+def test_smart_cut_params_follow_source():
+    params = clipper.smart_cut_params(H264_SOURCE)
+    assert params == {"profile": "high", "level": "4.0", "timescale": 15360, "sample_rate": 44100, "channels": 2}
+
+    cmd = clipper._head_encode_cmd("v.mp4", 3.0, 1.0, "head.ts", params)
+    for flag, value in [("-profile:v", "high"), ("-level:v", "4.0"), ("-pix_fmt", "yuv420p"),
+                        ("-ar", "44100"), ("-ac", "2"), ("-bsf:v", "h264_mp4toannexb"), ("-f", "mpegts")]:
+        assert cmd[cmd.index(flag) + 1] == value
+
+    cmd = clipper._join_cmd("parts.txt", "out.mp4", params)
+    assert cmd[cmd.index("-video_track_timescale") + 1] == "15360"
+
+
+def test_smart_cut_params_reject_unmatchable_audio():
+    streams = {**H264_SOURCE, "audio": {"codec_name": "opus", "sample_rate": "48000", "channels": 2}}
+    assert clipper.smart_cut_params(streams) is None
+
+
+def test_head_mismatch_raises(monkeypatch):
+    head = {**H264_SOURCE, "audio": {**H264_SOURCE["audio"], "sample_rate": "48000"}}
+    monkeypatch.setattr(clipper, "probe_streams", lambda path, use_cache=True: head)
+    with pytest.raises(Exception, match="sample_rate"):
+        clipper._check_head_matches("head.mp4", H264_SOURCE)
+
+
+def test_batch_bounds_the_input_read(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(clipper, "CLIPS_DIR", str(tmp_path))
+    monkeypatch.setattr(clipper, "probe_codecs", lambda path: H264_SOURCE)
+    monkeypatch.setattr(clipper, "_run_ffmpeg", commands.append)
+    monkeypatch.setattr(clipper, "_clip_result", lambda *args: args[0])
+
+    clipper.create_clips_batch("v.mp4", "job", [(0, 10.0, 20.0, "a"), (1, 25.0, 40.0, "b")])
+
+    cmd = commands[0]
+    assert cmd.index("-t") < cmd.index("-i")
+    assert cmd[cmd.index("-ss") + 1] == "10.0"
+    assert cmd[cmd.index("-t") + 1] == "30.0"
+
+
+def test_batch_encoders_share_one_thread_budget(monkeypatch, tmp_path):
+    commands = []
+    monkeypatch.setattr(clipper, "CLIPS_DIR", str(tmp_path))
+    monkeypatch.setattr(clipper, "FFMPEG_THREADS", 4)
+    monkeypatch.setattr(clipper, "probe_codecs", lambda path: H264_SOURCE)
+    monkeypatch.setattr(clipper, "_run_ffmpeg", commands.append)
+    monkeypatch.setattr(clipper, "_clip_result", lambda *args: args[0])
+
+    clipper.create_clips_batch("v.mp4", "job", [(0, 10.0, 20.0, "a"), (1, 25.0, 40.0, "b")])
+
+    cmd = commands[0]
+    assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-threads"] == ["2", "2"]
+
+
+def test_group_batches_splits_on_gap_and_size(monkeypatch):
+    monkeypatch.setattr(clipper, "CLIP_BATCH_MAX_GAP", 30)
+    monkeypatch.setattr(clipper, "CLIP_BATCH_MAX", 2)
+    clips = [(2, 50.0, 70.0, "c"), (0, 0.0, 20.0, "a"), (1, 10.0, 40.0, "b"), (3, 200.0, 230.0, "d")]
+
+    batches = clipper.group_batches(clips)
+
+    assert [[c[0] for c in batch] for batch in batches] == [[0, 1], [2], [3]]
+
+
+FFMPEG = shutil.which("ffmpeg")
+FFPROBE = shutil.which("ffprobe")
+
+
+@pytest.mark.skipif(not (FFMPEG and FFPROBE), reason="needs ffmpeg and ffprobe on PATH")
+def test_smart_cut_join_decodes_cleanly(monkeypatch, tmp_path):
+    monkeypatch.setattr(clipper, "FFMPEG_PATH", FFMPEG)
+    monkeypatch.setattr(media, "FFPROBE_PATH", FFPROBE)
+
+    # 2s GOPs and encoder settings a "fast" libx264 head won't reproduce,
+    # so head and tail carry different SPS/PPS
+    source = str(tmp_path / "source.mp4")
+    subprocess.run([
+        FFMPEG, "-v", "error",
+        "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", "8", "-pix_fmt", "yuv420p",
+        "-c:v", "libx264", "-profile:v", "main", "-preset", "veryslow", "-x264-params", "keyint=50:min-keyint=50:scenecut=0:cabac=0:ref=6",
+        "-c:a", "aac", "-ac", "2",
+        source,
+    ], check=True)
+    output = str(tmp_path / "clip.mp4")
+
+    clipper._smart_cut(source, 1.0, 2.0, 6.0, output)
+
+    decode = subprocess.run([FFMPEG, "-v", "error", "-i", output, "-f", "null", "-"], capture_output=True, text=True)
+    assert decode.returncode == 0 and decode.stderr == ""
+    assert media.probe_streams(output)["video"]["time_base"] == media.probe_streams(source)["video"]["time_base"]
+    # The copied tail decodes to exactly the source's frames (1s head = 25 frames)
+    assert _frame_hashes(output)[25:125] == _frame_hashes(source)[50:150]
+
+
+def _frame_hashes(path: str) -> list:
+    result = subprocess.run([FFMPEG, "-v", "error", "-i", path, "-map", "0:v", "-f", "framemd5", "-"],
+                            capture_output=True, text=True, check=True)
+    return [line.rsplit(",", 1)[1].strip() for line in result.stdout.splitlines() if not line.startswith("#")]
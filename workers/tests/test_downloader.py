@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import downloader
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache_dir, job_dir = tmp_path / "cache", tmp_path / "jobs"
+    cache_dir.mkdir()
+    job_dir.mkdir()
+    monkeypatch.setattr(downloader, "DOWNLOAD_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(downloader, "DOWNLOAD_DIR", str(job_dir))
+    monkeypatch.setattr(downloader, "DOWNLOAD_CACHE_MAX_BYTES", 0)
+    return cache_dir, job_dir
+
+
+def _write(path, age):
+    path.write_bytes(b"x" * 10)
+    stamp = os.path.getmtime(path) - age
+    os.utime(path, (stamp, stamp))
+
+
+def test_evict_cache_skips_in_use_videos_and_their_audio(cache):
+    cache_dir, job_dir = cache
+    for key, age in [("linked", 400), ("locked", 300), ("idle", 200)]:
+        _write(cache_dir / f"{key}.mp4", age)
+        (cache_dir / f"{key}.mp4.sha256").write_text(f"hash-{key}")
+        _write(cache_dir / f"hash-{key}.f32", age)
+    os.link(cache_dir / "linked.mp4", job_dir / "job-1.mp4")
+    (cache_dir / "locked.lock").write_text("123")
+
+    downloader.evict_cache()
+
+    assert sorted(os.listdir(cache_dir)) == [
+        "hash-linked.f32", "hash-locked.f32",
+        "linked.mp4", "linked.mp4.sha256", "locked.lock", "locked.mp4", "locked.mp4.sha256",
+    ]
+
+
+def test_release_job_video_makes_the_video_evictable(cache):
+    cache_dir, job_dir = cache
+    _write(cache_dir / "video.mp4", 100)
+    os.link(cache_dir / "video.mp4", job_dir / "job-1.mp4")
+
+    downloader.evict_cache()
+    assert (cache_dir / "video.mp4").exists()
+
+    downloader.release_job_video("job-1")
+    downloader.release_job_video("job-1")  # already gone is fine
+    downloader.evict_cache()
+    assert not (cache_dir / "video.mp4").exists()
@@ -0,0 +1,32 @@
+import numpy as np
+
+import embedding_cache
+import embedding_index
+
+
+SEGMENTS = [
+    {"start": 0.0, "end": 8.0, "text": "hello"},
+    {"start": 8.0, "end": 15.0, "text": "there"},
+    {"start": 15.0, "end": 30.0, "text": "goodbye"},
+]
+
+
+def test_index_is_cached_in_its_own_table(monkeypatch, tmp_path):
+    cache = embedding_cache.SqliteCache(str(tmp_path / "embeddings.sqlite3"), "embeddings", label="EmbeddingCache")
+    monkeypatch.setattr(embedding_cache, "_cache", cache)
+    calls = []
+
+    def fake_embed(texts, model):
+        calls.append(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    monkeypatch.setattr(embedding_index.ollama_client, "embed", fake_embed)
+    transcript = {"content_hash": "abc", "segments": SEGMENTS}
+
+    built = embedding_index.get_index(transcript, model="embed")
+    cached = embedding_index.get_index(transcript, model="embed")
+
+    assert len(calls) == 1
+    assert [p["text"] for p in cached["passages"]] == ["hello there", "goodbye"]
+    assert cached["vectors"].dtype == np.float32
+    assert np.allclose(cached["vectors"], built["vectors"], atol=1e-3)
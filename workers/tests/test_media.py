@@ -0,0 +1,22 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import media
+
+
+def test_probe_streams_failure_is_raised_and_not_cached(monkeypatch, tmp_path):
+    video = tmp_path / "v.mp4"
+    video.write_bytes(b"x")
+    ok = json.dumps({"streams": [{"codec_type": "video", "codec_name": "h264"}]})
+    results = iter([
+        SimpleNamespace(returncode=1, stdout="", stderr="temporarily unavailable"),
+        SimpleNamespace(returncode=0, stdout=ok, stderr=""),
+    ])
+    monkeypatch.setattr(media.subprocess, "run", lambda cmd, **kwargs: next(results))
+
+    with pytest.raises(Exception, match="ffprobe failed"):
+        media.probe_streams(str(video))
+    assert media.probe_streams(str(video)) == {"video": {"codec_name": "h264"}}
+    assert media.probe_streams(str(video)) == {"video": {"codec_name": "h264"}}  # cached now
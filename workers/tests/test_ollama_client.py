@@ -0,0 +1,109 @@
+import time
+
+import pytest
+import requests
+
+import ollama_client
+
+
+class FakeSession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def endpoints(monkeypatch):
+    servers = [ollama_client._Endpoint("http://a"), ollama_client._Endpoint("http://b")]
+    monkeypatch.setattr(ollama_client, "_endpoints", servers)
+    monkeypatch.setattr(ollama_client, "_backoff", lambda attempt: None)
+    return servers
+
+
+def test_pick_endpoint_prefers_least_loaded_then_loaded_model(endpoints):
+    a, b = endpoints
+    a.in_flight = 1
+    assert ollama_client._pick_endpoint("llama3.2") is b
+
+    a.in_flight = b.in_flight = 0
+    a.models.add("llama3.2")
+    assert ollama_client._pick_endpoint("llama3.2") is a
+
+
+def test_pick_endpoint_skips_servers_in_cooldown(endpoints):
+    a, b = endpoints
+    a.down_until = time.monotonic() + 60
+    assert ollama_client._pick_endpoint("llama3.2") is b
+
+
+def test_read_timeout_is_not_retried_or_cooled_down(endpoints, monkeypatch):
+    session = FakeSession(requests.ReadTimeout("slow"))
+    monkeypatch.setattr(ollama_client, "get_session", lambda: session)
+    endpoints[0].models.add("llama3.2")
+    endpoints[1].models.add("llama3.2")
+
+    with pytest.raises(requests.ReadTimeout):
+        with ollama_client._call("/api/generate", {"model": "llama3.2"}, timeout=1):
+            pass
+
+    assert session.calls == 1
+    assert all(e.in_flight == 0 and e.down_until == 0.0 and e.models == {"llama3.2"} for e in endpoints)
+
+
+def test_connect_timeout_is_retried_with_cooldown(endpoints, monkeypatch):
+    session = FakeSession(requests.ConnectTimeout("unreachable"))
+    monkeypatch.setattr(ollama_client, "get_session", lambda: session)
+
+    with pytest.raises(requests.ConnectTimeout):
+        with ollama_client._call("/api/generate", {"model": "llama3.2"}, timeout=1):
+            pass
+
+    assert session.calls == ollama_client.OLLAMA_RETRIES + 1
+    assert all(e.in_flight == 0 and e.down_until > time.monotonic() for e in endpoints)
+
+
+def test_json_tracker_closes_across_chunks():
+    tracker = ollama_client.JsonObjectTracker()
+    text = 'Here: {"clips": [{"title": "a", "n": {"x": 1}}'
+    assert not tracker.feed(text)
+    assert tracker.feed("]} trailing")
+    full = text + "]} trailing"
+    assert full[tracker.start:tracker.end] == '{"clips": [{"title": "a", "n": {"x": 1}}]}'
+
+
+def test_json_tracker_ignores_braces_in_strings():
+    tracker = ollama_client.JsonObjectTracker()
+    assert not tracker.feed('{"reason": "a } brace and \\"quoted {\\" text"')
+    assert tracker.feed("}")
+
+
+def test_other_request_errors_release_the_endpoint(endpoints, monkeypatch):
+    session = FakeSession(requests.exceptions.ChunkedEncodingError("broken"))
+    monkeypatch.setattr(ollama_client, "get_session", lambda: session)
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        with ollama_client._call("/api/generate", {"model": "llama3.2"}, timeout=1):
+            pass
+
+    assert session.calls == 1
+    assert all(e.in_flight == 0 and e.down_until == 0.0 for e in endpoints)
+
+
+def test_backoff_sleeps_without_the_model_semaphore(endpoints, monkeypatch):
+    session = FakeSession(requests.ConnectionError("refused"))
+    monkeypatch.setattr(ollama_client, "get_session", lambda: session)
+    semaphore = ollama_client._model_semaphore("backoff-model")
+    free_during_backoff = []
+    monkeypatch.setattr(ollama_client, "_backoff",
+                        lambda attempt: free_during_backoff.append(semaphore._value == semaphore._initial_value))
+
+    with pytest.raises(requests.ConnectionError):
+        with ollama_client._call("/api/generate", {"model": "backoff-model"}, timeout=1):
+            pass
+
+    assert free_during_backoff and all(free_during_backoff)
+    assert semaphore._value == semaphore._initial_value
@@ -0,0 +1,23 @@
+import numpy as np
+
+import ranker
+
+
+def test_top_regions_picks_non_overlapping_peaks_in_time_order():
+    score = np.zeros(300)
+    score[200:210] = 3.0
+    score[40:50] = 2.0
+    score[60:65] = 1.0  # overlaps the 40s region's window, so not a region of its own
+
+    regions = ranker.top_regions(score, top_k=2, region_seconds=30)
+
+    assert len(regions) == 2
+    first, second = regions
+    assert 40 <= first["peak"] < 50 and 200 <= second["peak"] < 210
+    assert first["end"] <= second["start"]
+    assert all(r["start"] <= r["peak"] < r["end"] == r["start"] + 30 for r in regions)
+
+
+def test_top_regions_short_video_is_one_region():
+    regions = ranker.top_regions(np.ones(10), top_k=3, region_seconds=60)
+    assert regions == [{"start": 0.0, "end": 10.0, "score": 1.0, "peak": 0.0}]
@@ -0,0 +1,37 @@
+from sqlite_cache import SqliteCache
+
+
+def test_get_put_roundtrip(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), "things")
+    cache.put_many({"a": b"1", "b": b"22"})
+    assert cache.get("a") == b"1"
+    assert cache.get_many(["a", "b", "missing"]) == {"a": b"1", "b": b"22"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["writes"]) == (3, 1, 2)
+
+
+def test_evicts_least_recently_used_rows(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), "things", max_rows=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    cache.get("a")  # b is now least recently used
+    cache.put("c", b"3")
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "c": b"3"}
+
+
+def test_evicts_by_size(tmp_path):
+    cache = SqliteCache(str(tmp_path / "c.sqlite3"), "things", max_bytes=10)
+    cache.put("a", b"x" * 6)
+    cache.put("b", b"y" * 6)
+    assert cache.get("a") is None
+    assert cache.get("b") == b"y" * 6
+
+
+def test_tables_share_a_file_independently(tmp_path):
+    path = str(tmp_path / "c.sqlite3")
+    first = SqliteCache(path, "first", max_rows=1)
+    second = SqliteCache(path, "second", max_rows=1)
+    first.put("k", b"1")
+    second.put("k", b"2")
+    assert first.get("k") == b"1"
+    assert second.get("k") == b"2"
@@ -0,0 +1,101 @@
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import numpy as np
+
+import transcriber
+from audio import SAMPLE_RATE
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(len(audio))
+        words = [SimpleNamespace(start=1.0, end=1.5, word=" later")]
+        segments = [SimpleNamespace(start=1.0, end=2.0, text=" later", words=words)]
+        return iter(segments), SimpleNamespace(language="en", language_probability=0.9)
+
+
+def test_broken_chunk_pool_falls_back_to_single_stream(monkeypatch):
+    duration = 4 * transcriber.TRANSCRIBE_CHUNK_SECONDS
+    audio = np.zeros(int(duration * SAMPLE_RATE), dtype=np.float32)
+    model = FakeModel()
+
+    def broken_chunks(audio_path, workers, info):
+        info["language"] = "en"
+        yield {"start": 0.0, "end": 30.0, "text": "first", "words": [(0.0, 0.5, " first")]}
+        raise BrokenProcessPool("worker died")
+
+    reset = []
+    monkeypatch.setattr(transcriber.transcript_cache, "hash_file", lambda path: "hash")
+    monkeypatch.setattr(transcriber.transcript_cache, "get", lambda key: None)
+    monkeypatch.setattr(transcriber.transcript_cache, "put", lambda key, value: None)
+    monkeypatch.setattr(transcriber, "extract_audio", lambda path, content_hash=None: "audio.f32")
+    monkeypatch.setattr(transcriber, "load_audio", lambda path: audio)
+    monkeypatch.setattr(transcriber, "get_model", lambda: model)
+    monkeypatch.setattr(transcriber, "model_device", "cpu")
+    monkeypatch.setattr(transcriber, "get_transcribe_workers", lambda: 4)
+    monkeypatch.setattr(transcriber, "iter_chunked_segments", broken_chunks)
+    monkeypatch.setattr(transcriber, "_reset_chunk_pool", lambda: reset.append(True))
+
+    info = {}
+    segments = list(transcriber.stream_transcript("video.mp4", info))
+
+    assert reset == [True]
+    assert [s["text"] for s in segments] == ["first", "later"]
+    # Resumed from the last chunked segment, with absolute timestamps
+    assert model.calls == [len(audio) - 30 * SAMPLE_RATE]
+    assert segments[1]["start"] == 31.0
+    assert info["words"]["start"] == [0.0, 31.0]
+
+
+def test_find_split_points_cut_in_quiet_gaps():
+    duration = 60
+    audio = np.full(duration * SAMPLE_RATE, 0.5, dtype=np.float32)
+    # Pauses near the ideal boundaries at 20s and 40s
+    for pause in (18, 43):
+        audio[pause * SAMPLE_RATE:(pause + 1) * SAMPLE_RATE] = 0.0
+
+    points = transcriber.find_split_points(audio, 3)
+
+    assert points[0] == 0 and points[-1] == len(audio)
+    assert len(points) == 4
+    assert 18 <= points[1] / SAMPLE_RATE <= 19
+    assert 43 <= points[2] / SAMPLE_RATE <= 44
+
+
+def test_find_split_points_short_audio_is_one_chunk():
+    audio = np.zeros(SAMPLE_RATE // 4, dtype=np.float32)
+    assert transcriber.find_split_points(audio, 4) == [0, len(audio)]
+
+
+class FakeFuture:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+
+def test_chunk_dedup_only_drops_boundary_repeats(monkeypatch):
+    half = 60 * SAMPLE_RATE
+    chunks = {
+        0: [{"start": 0.0, "end": 60.0, "text": "one two three",
+             # "three" overlaps "two" inside the chunk: must be kept
+             "words": [(1.0, 2.0, " one"), (2.0, 3.5, " two"), (3.2, 4.0, " three"), (59.2, 60.4, " edge")]}],
+        half: [{"start": 0.0, "end": 5.0, "text": "edge four",
+                # "edge" repeats the previous chunk's last word across the cut
+                "words": [(0.1, 0.3, " edge"), (0.5, 1.0, " four"), (0.8, 1.2, " five")]}],
+    }
+    monkeypatch.setattr(transcriber, "load_audio", lambda path: np.zeros(2 * half, dtype=np.float32))
+    monkeypatch.setattr(transcriber, "find_split_points", lambda audio, n: [0, half, 2 * half])
+    monkeypatch.setattr(transcriber, "_get_chunk_pool", lambda workers: SimpleNamespace(
+        submit=lambda fn, path, start, end: FakeFuture(
+            {"language": "en", "language_probability": 0.9, "segments": chunks[start]})))
+
+    segments = list(transcriber.iter_chunked_segments("audio.f32", 2, {}))
+
+    words = [w for seg in segments for w in seg["words"]]
+    assert [w[2] for w in words] == [" one", " two", " three", " edge", " four", " five"]
@@ -0,0 +1,82 @@
+import io
+
+import numpy as np
+import pytest
+
+import vision_analyzer
+import vision_cache
+
+
+def _image(seed: int) -> np.ndarray:
+    return (np.random.default_rng(seed).random((72, 128, 3)) * 255).astype(np.uint8)
+
+
+def test_dhash_ignores_small_brightness_changes():
+    image = _image(0)
+    brighter = np.clip(image.astype(int) + 4, 0, 255).astype(np.uint8)
+    assert vision_analyzer.hamming(vision_analyzer.dhash(image), vision_analyzer.dhash(brighter)) <= 2
+
+
+def test_dhash_separates_different_frames():
+    assert vision_analyzer.hamming(vision_analyzer.dhash(_image(0)), vision_analyzer.dhash(_image(1))) > 16
+
+
+def test_dedupe_frames_maps_repeats_to_first_frame():
+    a, b = _image(0), _image(1)
+    frames = [{"index": i, "dhash": vision_analyzer.dhash(img)} for i, img in enumerate([a, b, a.copy(), b])]
+    assert vision_analyzer.dedupe_frames(frames, max_distance=4) == {2: 0, 3: 1}
+
+
+def test_dedupe_frames_disabled_with_negative_distance():
+    frames = [{"index": i, "dhash": 7} for i in range(3)]
+    assert vision_analyzer.dedupe_frames(frames, max_distance=-1) == {}
+
+
+def test_description_cache_is_keyed_by_context():
+    vision_cache.put_many("llava:test", "frame", "find the funny parts", {42: "a cat falls over"})
+    assert vision_cache.get_many("llava:test", "frame", "find the funny parts", [42]) == {42: "a cat falls over"}
+    assert vision_cache.get_many("llava:test", "frame", "find the pricing talk", [42]) == {}
+    assert vision_cache.get_many("llava:test", "batch", "find the funny parts", [42]) == {}
+
+
+def test_analyses_join_frames_by_index_not_timestamp(monkeypatch):
+    # Two different pictures that round to the same timestamp
+    frames = [
+        {"index": i, "frame_idx": i, "timestamp": 1.0, "frame_base64": f"frame-{i}", "image": _image(i)}
+        for i in range(2)
+    ]
+    monkeypatch.setattr(vision_analyzer, "VISION_FRAME_SELECTION", "uniform")
+    monkeypatch.setattr(vision_analyzer, "extract_frames", lambda *args: frames)
+    monkeypatch.setattr(vision_analyzer.vision_cache, "get_many", lambda *args: {})
+    monkeypatch.setattr(vision_analyzer.vision_cache, "put_many", lambda *args: None)
+    monkeypatch.setattr(vision_analyzer, "generate_video_summary", lambda *args, **kwargs: "")
+    monkeypatch.setattr(vision_analyzer, "analyze_frame", lambda image, timestamp, context="": {
+        "timestamp": timestamp, "description": f"saw {image}", "error": None, "seconds": 0.1})
+
+    result = vision_analyzer.analyze_video_content("v.mp4", 2, mode="frame")
+
+    assert [fa["description"] for fa in result["frame_analyses"]] == ["saw frame-0", "saw frame-1"]
+
+
+def test_assign_keyframes_gives_each_sample_its_own():
+    keyframes = [0.0, 2.0, 4.0, 6.0]
+    assert vision_analyzer.assign_keyframes(keyframes, [1.9, 2.1], max_shift=2.0) == [1, 2]
+    assert vision_analyzer.assign_keyframes(keyframes, [1.9, 2.1], max_shift=1.0) is None
+
+
+class FakeProc:
+    def __init__(self, data):
+        self.stdout = io.BytesIO(data)
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        pass
+
+
+def test_keyframe_decode_count_mismatch_raises(monkeypatch):
+    # ffprobe listed 4 keyframes but FFmpeg only outputs 3 frames
+    monkeypatch.setattr(vision_analyzer.subprocess, "Popen", lambda cmd, **kwargs: FakeProc(bytes(3 * 8 * 8 * 3)))
+    with pytest.raises(Exception, match="decoded 3 keyframes"):
+        vision_analyzer._extract_keyframes("v.mp4", [0, 50], 25.0, [0.0, 2.0, 4.0, 6.0], 8, 8, max_shift=1.0)
@@ -0,0 +1,37 @@
+from word_index import WordIndex
+
+WORDS = [
+    (0.0, 0.4, " Hello"), (0.5, 0.9, " there."),
+    (1.5, 1.9, " This"), (2.0, 2.3, " is"), (2.4, 3.0, " great!"),
+    (3.6, 4.0, " And"), (4.1, 4.6, " more"),
+]
+
+
+def test_snap_start_prefers_sentence_start():
+    index = WordIndex.from_words(WORDS)
+    assert index.snap_start(1.7, max_shift=0.5) == 1.5
+
+
+def test_snap_start_falls_back_to_word_start():
+    index = WordIndex.from_words(WORDS)
+    assert index.snap_start(2.2, max_shift=0.5) == 2.0
+    assert index.snap_start(2.35, max_shift=0.1) == 2.4  # between words: next word
+    assert index.snap_start(2.2, max_shift=0.1) == 2.2  # nothing close enough
+
+
+def test_snap_end_prefers_sentence_end():
+    index = WordIndex.from_words(WORDS)
+    assert index.snap_end(2.8, max_shift=0.5) == 3.0
+
+
+def test_snap_end_falls_back_to_word_end():
+    index = WordIndex.from_words(WORDS)
+    assert index.snap_end(2.1, max_shift=0.3) == 2.3
+    assert index.snap_end(1.95, max_shift=0.1) == 1.9  # between words: previous word
+
+
+def test_round_trips_through_dict():
+    index = WordIndex.from_dict(WordIndex.from_words(WORDS).to_dict())
+    assert [index.word(i) for i in range(len(index))] == [w[2] for w in WORDS]
+    assert list(index.sentence_starts) == [0, 2, 5]
+    assert WordIndex.from_words([]).snap_start(1.0, max_shift=1.0) == 1.0
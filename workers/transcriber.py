@@ -1,6 +1,18 @@
 import os
+import threading
+import multiprocessing
+from collections import Counter
+from typing import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 from faster_whisper import WhisperModel
 from dotenv import load_dotenv
+import transcript_cache
+import models
+from word_index import WordIndex
+from audio import SAMPLE_RATE, extract_audio, load_audio
+from config import TRANSCRIBE_WORKERS, TRANSCRIBE_CPU_THREADS, TRANSCRIBE_CHUNK_SECONDS
 
 load_dotenv()
 
@@ -14,73 +26,370 @@ MODEL_SIZE = "small"
 DEVICE = "cuda"  # Will auto-fallback to cpu if cuda unavailable
 COMPUTE_TYPE = "int8"  # int8 is fastest, float16 for GPU, float32 for CPU
 
+# Options passed to WhisperModel.transcribe; part of the transcript cache key
+TRANSCRIBE_OPTIONS = {
+    "word_timestamps": True,
+    "vad_filter": True,  # Voice activity detection for better accuracy
+    "vad_parameters": {"min_silence_duration_ms": 500},
+}
+
+# Bump when the cached transcript layout changes (2 = word index added)
+TRANSCRIPT_FORMAT = 2
+
 model = None
+model_device = None
+_model_lock = threading.Lock()
+
+# Process pool for chunked CPU transcription (created on first use)
+_chunk_pool = None
+_chunk_pool_lock = threading.Lock()
+
+# Model inside each chunk-pool process
+_chunk_model = None
+
+# How far (seconds) around an ideal chunk boundary to look for silence
+SPLIT_SEARCH_SECONDS = 10.0
+SPLIT_WINDOW_SECONDS = 0.5
 
 
 def get_model():
-    """Lazy load the Whisper model."""
-    global model
-    if model is None:
-        print(f"[Transcriber] Loading faster-whisper {MODEL_SIZE} model...")
-        try:
-            # Try CUDA first
-            model = WhisperModel(MODEL_SIZE, device="cuda", compute_type="float16")
-            print(f"[Transcriber] Model loaded on GPU (CUDA)")
-        except Exception as e:
-            print(f"[Transcriber] CUDA not available ({e}), using CPU")
-            model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
-            print(f"[Transcriber] Model loaded on CPU (int8 quantization)")
+    """Lazy load the Whisper model (preloaded at worker startup via models.py)."""
+    global model, model_device
+    with _model_lock:
+        if model is None:
+            print(f"[Transcriber] Loading faster-whisper {MODEL_SIZE} model...")
+            if models.cuda_available():
+                try:
+                    model = WhisperModel(MODEL_SIZE, device="cuda", compute_type="float16")
+                    model_device = "cuda"
+                    print(f"[Transcriber] Model loaded on GPU (CUDA)")
+                except Exception as e:
+                    print(f"[Transcriber] CUDA load failed ({e}), using CPU")
+            if model is None:
+                model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
+                model_device = "cpu"
+                print(f"[Transcriber] Model loaded on CPU (int8 quantization)")
     return model
 
 
-def transcribe_video(video_path: str) -> dict:
+def warmup_model(whisper_model):
+    """Run one tiny inference (and start the chunk pool on multi-core CPU)."""
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    segments_gen, _ = whisper_model.transcribe(silence, beam_size=1, vad_filter=False)
+    list(segments_gen)
+
+    workers = get_transcribe_workers()
+    if model_device == "cpu" and workers > 1:
+        pool = _get_chunk_pool(workers)
+        try:
+            for future in [pool.submit(_warmup_chunk_worker) for _ in range(workers)]:
+                future.result()
+        except BrokenProcessPool as e:
+            print(f"[Transcriber] Chunk pool failed during warmup ({e})")
+            _reset_chunk_pool()
+
+
+def get_transcribe_workers() -> int:
+    """Processes used for chunked CPU transcription (1 = disabled)."""
+    if TRANSCRIBE_WORKERS > 0:
+        return TRANSCRIBE_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, TRANSCRIBE_CPU_THREADS))
+
+
+def _init_chunk_worker(cpu_threads: int):
+    """Load a CPU model once per pool process."""
+    global _chunk_model
+    _chunk_model = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+
+
+def _warmup_chunk_worker():
+    """Runs in a pool process: forces its model load + one tiny inference."""
+    segments_gen, _ = _chunk_model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), beam_size=1, vad_filter=False)
+    list(segments_gen)
+
+
+def _get_chunk_pool(workers: int) -> ProcessPoolExecutor:
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is None:
+            print(f"[Transcriber] Starting {workers} transcription processes "
+                  f"({TRANSCRIBE_CPU_THREADS} threads each)")
+            # Spawn, not fork: the parent holds a loaded CTranslate2 model
+            # (OpenMP state) and runs job threads, which forked children
+            # can deadlock on
+            _chunk_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_chunk_worker,
+                initargs=(TRANSCRIBE_CPU_THREADS,),
+            )
+    return _chunk_pool
+
+
+def _reset_chunk_pool():
+    """Drop a broken chunk pool so the next chunked run starts a fresh one."""
+    global _chunk_pool
+    with _chunk_pool_lock:
+        if _chunk_pool is not None:
+            _chunk_pool.shutdown(wait=False, cancel_futures=True)
+            _chunk_pool = None
+
+
+def _transcribe_chunk(audio_path: str, start_sample: int, end_sample: int) -> dict:
+    """Transcribe audio[start_sample:end_sample] in a pool process (chunk-relative times)."""
+    audio = np.array(load_audio(audio_path)[start_sample:end_sample])
+    segments_gen, info = _chunk_model.transcribe(audio, **TRANSCRIBE_OPTIONS)
+    return {
+        "language": info.language,
+        "language_probability": info.language_probability,
+        "segments": [
+            {
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text.strip(),
+                "words": [(w.start, w.end, w.word) for w in (seg.words or [])],
+            }
+            for seg in segments_gen
+        ],
+    }
+
+
+def find_split_points(audio: np.ndarray, num_chunks: int) -> list:
     """
-    Transcribe video using faster-whisper (CTranslate2 optimized).
-    Returns transcript with word-level timestamps.
+    Pick sample offsets that split audio into num_chunks at quiet points.
+
+    For each ideal (equal-length) boundary, the quietest SPLIT_WINDOW_SECONDS
+    window within SPLIT_SEARCH_SECONDS is chosen, so cuts land in pauses
+    between words rather than mid-word.
     """
-    print(f"[Transcriber] Transcribing: {video_path}")
+    window = int(SPLIT_WINDOW_SECONDS * SAMPLE_RATE)
+    num_windows = len(audio) // window
+    if num_chunks <= 1 or num_windows < 2:
+        return [0, len(audio)]
 
-    whisper_model = get_model()
+    # RMS energy per window, vectorized
+    frames = np.asarray(audio[:num_windows * window], dtype=np.float32).reshape(num_windows, window)
+    energy = np.sqrt(np.mean(frames * frames, axis=1))
 
-    # Transcribe with word timestamps
-    print(f"[Transcriber] Running transcription...")
-    segments_gen, info = whisper_model.transcribe(
-        video_path,
-        word_timestamps=True,
-        vad_filter=True,  # Voice activity detection for better accuracy
-        vad_parameters=dict(min_silence_duration_ms=500),
-    )
+    search = int(SPLIT_SEARCH_SECONDS / SPLIT_WINDOW_SECONDS)
+    points = [0]
+    for i in range(1, num_chunks):
+        ideal = int(num_windows * i / num_chunks)
+        lo, hi = max(points[-1] // window + 1, ideal - search), min(num_windows, ideal + search + 1)
+        if lo >= hi:
+            continue
+        quietest = lo + int(np.argmin(energy[lo:hi]))
+        points.append(quietest * window + window // 2)
+    points.append(len(audio))
+    return points
 
-    # Convert generator to list and extract segments
-    segments = []
-    full_text_parts = []
+
+def iter_chunked_segments(audio_path: str, workers: int, info: dict) -> Iterator[dict]:
+    """
+    Transcribe audio in parallel chunks split at quiet points.
+
+    Segments are yielded in order as soon as their chunk finishes, with
+    segment and word timestamps shifted back to absolute time; a segment
+    or word repeated across a chunk boundary is dropped. info["language"]
+    is updated to the majority language seen so far.
+    """
+    audio = load_audio(audio_path)
+    duration = len(audio) / SAMPLE_RATE
+    num_chunks = max(1, min(workers, int(duration // TRANSCRIBE_CHUNK_SECONDS)))
+    points = find_split_points(audio, num_chunks)
+
+    print(f"[Transcriber] Chunked transcription: {len(points) - 1} chunks on {workers} processes")
+
+    pool = _get_chunk_pool(workers)
+    futures = [
+        (start, pool.submit(_transcribe_chunk, audio_path, start, end))
+        for start, end in zip(points[:-1], points[1:])
+    ]
+
+    prev = None
+    boundary_end = 0.0  # End of the last word emitted by earlier chunks
+    languages = Counter()
+    probabilities = []
+    for start_sample, future in futures:
+        chunk = future.result()
+        offset = start_sample / SAMPLE_RATE
+        languages[chunk["language"]] += len(chunk["segments"]) or 1
+        probabilities.append(chunk["language_probability"])
+        info["language"] = languages.most_common(1)[0][0]
+        info["language_probability"] = float(np.mean(probabilities))
+
+        # Only the chunk's leading words can repeat the previous chunk's tail;
+        # overlapping timestamps further in are normal and kept
+        at_boundary = True
+        chunk_end = boundary_end
+        for seg in chunk["segments"]:
+            seg = {**seg, "start": seg["start"] + offset, "end": seg["end"] + offset}
+            words = []
+            for start, end, word in seg["words"]:
+                start, end = start + offset, end + offset
+                if at_boundary:
+                    if start < boundary_end:
+                        continue  # Boundary word already emitted by the previous chunk
+                    at_boundary = False
+                words.append((start, end, word))
+                chunk_end = max(chunk_end, end)
+            seg["words"] = words
+            if prev is not None:
+                # Same text straddling the boundary: keep the first copy
+                if seg["text"] == prev["text"] and seg["start"] < prev["end"]:
+                    continue
+                seg["start"] = max(seg["start"], prev["end"])
+                if seg["end"] <= seg["start"]:
+                    continue
+            prev = seg
+            yield seg
+        boundary_end = chunk_end
+
+
+def _iter_single_segments(whisper_model, audio: np.ndarray, info: dict, offset: float = 0.0) -> Iterator[dict]:
+    """Transcribe audio from offset seconds on with the in-process model (absolute times, with words)."""
+    start_sample = int(offset * SAMPLE_RATE)
+    segments_gen, whisper_info = whisper_model.transcribe(np.asarray(audio[start_sample:]), **TRANSCRIBE_OPTIONS)
+    if offset == 0.0 or not info.get("language"):
+        info["language"] = whisper_info.language
+        info["language_probability"] = whisper_info.language_probability
 
     for seg in segments_gen:
-        segments.append({
-            "start": seg.start,
-            "end": seg.end,
+        segment = {
+            "start": seg.start + offset,
+            "end": seg.end + offset,
             "text": seg.text.strip(),
+            "words": [(w.start + offset, w.end + offset, w.word) for w in (seg.words or [])],
+        }
+        print(f"[Transcriber] [{segment['start']:.1f}s - {segment['end']:.1f}s] {segment['text'][:50]}...")
+        yield segment
+
+
+def stream_transcript(video_path: str, info: dict = None) -> Iterator[dict]:
+    """
+    Transcribe video, yielding segments as faster-whisper produces them.
+
+    Args:
+        video_path: Path to the media file
+        info: Optional dict filled in with "content_hash", "language",
+              "language_probability" and "audio_duration" (seconds) as soon
+              as they are known, so consumers can report progress as
+              segment end / audio_duration
+
+    Yields:
+        Segment dicts {start, end, text}, in time order
+
+    Word timestamps are collected into a compact WordIndex and stored in
+    info["words"] once the stream is exhausted. A fully consumed stream is
+    stored in the transcript cache; a cache hit replays the stored segments.
+    """
+    info = info if info is not None else {}
+    print(f"[Transcriber] Transcribing: {video_path}")
+
+    content_hash = transcript_cache.hash_file(video_path)
+    info["content_hash"] = content_hash
+    cache_key = transcript_cache.make_key(
+        content_hash, MODEL_SIZE, {**TRANSCRIBE_OPTIONS, "format": TRANSCRIPT_FORMAT}
+    )
+    cached = transcript_cache.get(cache_key)
+    if cached is not None:
+        stats = transcript_cache.stats()
+        print(f"[Transcriber] Cache hit - {len(cached['segments'])} segments "
+              f"(hits={stats['hits']}, misses={stats['misses']})")
+        info.update({
+            "language": cached["language"],
+            "language_probability": cached["language_probability"],
+            "audio_duration": cached["duration"],
+            "words": cached.get("words"),
         })
-        full_text_parts.append(seg.text.strip())
-        print(f"[Transcriber] [{seg.start:.1f}s - {seg.end:.1f}s] {seg.text.strip()[:50]}...")
+        yield from cached["segments"]
+        return
+
+    # Decode just the audio track (once per video) and hand Whisper the samples
+    audio_path = extract_audio(video_path, content_hash)
+    audio = load_audio(audio_path)
+    info["audio_duration"] = len(audio) / SAMPLE_RATE
+
+    whisper_model = get_model()
+    workers = get_transcribe_workers()
+
+    segments = []
+    words = []
+
+    resume_at = 0.0
+    if model_device == "cpu" and workers > 1 and info["audio_duration"] >= 2 * TRANSCRIBE_CHUNK_SECONDS:
+        # Many-core CPU box: split the audio and transcribe chunks in parallel
+        try:
+            for seg in iter_chunked_segments(audio_path, workers, info):
+                words.extend(seg.pop("words"))
+                segments.append(seg)
+                yield seg
+            resume_at = None
+        except BrokenProcessPool as e:
+            # A pool process died; carry on in-process from the last segment
+            resume_at = segments[-1]["end"] if segments else 0.0
+            print(f"[Transcriber] Chunk pool broke ({e}), continuing single-stream from {resume_at:.1f}s")
+            _reset_chunk_pool()
+
+    if resume_at is not None:
+        # Transcribe with word timestamps
+        print(f"[Transcriber] Running transcription...")
+        for seg in _iter_single_segments(whisper_model, audio, info, resume_at):
+            words.extend(seg.pop("words"))
+            segments.append(seg)
+            yield seg
+
+    info["words"] = WordIndex.from_words(words).to_dict()
+    transcript_cache.put(cache_key, _build_transcript(segments, info))
 
+
+def _build_transcript(segments: list, info: dict) -> dict:
     # Get duration from last segment
     duration = segments[-1]["end"] if segments else 0
-
-    output = {
-        "language": info.language,
-        "language_probability": info.language_probability,
+    return {
+        "language": info.get("language"),
+        "language_probability": info.get("language_probability", 0.0),
         "duration": duration,
         "segments": segments,
-        "full_text": " ".join(full_text_parts),
+        "full_text": " ".join(seg["text"] for seg in segments),
+        # Compact word timestamps, see word_index.WordIndex.to_dict
+        "words": info.get("words") or WordIndex.from_words([]).to_dict(),
+        # Locates the extracted audio (audio.audio_path_for) for later analysis
+        "content_hash": info.get("content_hash"),
     }
 
-    print(f"[Transcriber] Done - {len(segments)} segments, {duration:.1f}s")
-    print(f"[Transcriber] Language: {info.language} ({info.language_probability:.1%} confidence)")
+
+def transcribe_video(video_path: str, on_segment: Callable[[dict, dict], None] = None) -> dict:
+    """
+    Transcribe video using faster-whisper (CTranslate2 optimized).
+    Returns transcript with word-level timestamps.
+
+    Results are cached by media content hash + model + options, so a video
+    already transcribed for another job is not transcribed again.
+
+    Args:
+        video_path: Path to the media file
+        on_segment: Optional callback(segment, info) run for each segment as
+                    it is produced (see stream_transcript for info keys)
+    """
+    info = {}
+    segments = []
+    for seg in stream_transcript(video_path, info):
+        segments.append(seg)
+        if on_segment:
+            on_segment(seg, info)
+
+    output = _build_transcript(segments, info)
+
+    print(f"[Transcriber] Done - {len(segments)} segments, {output['duration']:.1f}s")
+    print(f"[Transcriber] Language: {output['language']} ({output['language_probability']:.1%} confidence)")
 
     return output
 
 
+models.register("whisper", get_model, warmup_model)
+
+
 if __name__ == "__main__":
     import sys
     import json
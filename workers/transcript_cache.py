@@ -0,0 +1,51 @@
+"""
+Persistent transcript cache.
+
+Transcripts are stored in SQLite as zlib-compressed JSON, keyed by a hash
+of the media content plus the Whisper model and options, so the same
+video transcribed for another job (or another worker sharing
+DOWNLOAD_DIR) is free. Least recently used rows are evicted once the
+stored size exceeds TRANSCRIPT_CACHE_MAX_BYTES.
+"""
+
+import json
+import zlib
+import hashlib
+from typing import Optional
+
+from config import TRANSCRIPT_CACHE_PATH, TRANSCRIPT_CACHE_MAX_BYTES
+from sqlite_cache import SqliteCache
+
+_cache = SqliteCache(TRANSCRIPT_CACHE_PATH, "transcripts", max_bytes=TRANSCRIPT_CACHE_MAX_BYTES,
+                     label="TranscriptCache")
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's content, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(content_hash: str, model_size: str, options: dict) -> str:
+    """Cache key from content hash + model + transcription options."""
+    options_sig = hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{content_hash}:{model_size}:{options_sig}"
+
+
+def get(key: str) -> Optional[dict]:
+    """Return the cached transcript for key, or None."""
+    data = _cache.get(key)
+    return json.loads(zlib.decompress(data)) if data is not None else None
+
+
+def put(key: str, transcript: dict):
+    """Store a transcript and evict old entries if over the size limit."""
+    _cache.put(key, zlib.compress(json.dumps(transcript).encode("utf-8"), 6))
+
+
+def stats() -> dict:
+    """Hit/miss/write/eviction counters for this process."""
+    return _cache.stats()
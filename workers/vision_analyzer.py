@@ -3,22 +3,44 @@ Vision Analyzer - Uses LLaVA to analyze video frames and understand visual conte
 Extracts key frames, describes what's happening, and identifies viral moments.
 """
 
-import os
 import sys
 import cv2
+import json
+import math
+import time
 import base64
-import requests
-import tempfile
+import subprocess
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
 
+import ollama_client
+import vision_cache
+from config import (
+    VISION_MAX_IN_FLIGHT, VISION_MODE, VISION_BATCH_SIZE,
+    VISION_FRAME_SELECTION, SCENE_SAMPLE_FPS, SCENE_THRESHOLD,
+    VISION_DEDUP_DISTANCE,
+)
+from media import FFMPEG_PATH, probe_keyframes
+
 # Fix Windows console encoding for Unicode
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
     sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 VISION_MODEL = "llava:7b"
 
+# Frames are downscaled to this width before encoding for LLaVA
+FRAME_MAX_WIDTH = 512
+JPEG_QUALITY = 85
+
+# Relative decode cost of a keyframe vs. an average frame (I-frames are bigger)
+KEYFRAME_DECODE_WEIGHT = 3.0
+
+# Scene pre-pass resolution and colour histogram bins per channel
+SCENE_PREPASS_SIZE = (64, 36)
+SCENE_HIST_BINS = 4
+
 
 def safe_print(msg: str):
     """Print with Unicode error handling for Windows."""
@@ -28,18 +50,280 @@ def safe_print(msg: str):
         print(msg.encode('ascii', 'replace').decode('ascii'))
 
 
-def extract_frames(video_path: str, num_frames: int = 10) -> List[Dict]:
+def _resize(frame: np.ndarray) -> np.ndarray:
+    """Resize frame for faster processing (max FRAME_MAX_WIDTH px width)."""
+    height, width = frame.shape[:2]
+    if width > FRAME_MAX_WIDTH:
+        scale = FRAME_MAX_WIDTH / width
+        frame = cv2.resize(frame, (FRAME_MAX_WIDTH, int(height * scale)))
+    return frame
+
+
+def _make_frame(i: int, frame_idx: int, timestamp: float, frame: np.ndarray) -> Dict:
+    """Resize and JPEG-encode a frame in memory (no temp file round trip)."""
+    frame = _resize(frame)
+    ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise Exception(f"Could not encode frame {frame_idx}")
+    return {
+        "index": i,
+        "frame_idx": frame_idx,
+        "timestamp": round(timestamp, 2),
+        "image": frame,  # Downscaled BGR pixels, for cheap local analysis
+        "frame_base64": base64.b64encode(jpeg.tobytes()).decode("utf-8"),
+    }
+
+
+def assign_keyframes(keyframes: List[float], targets: List[float], max_shift: float) -> List[int]:
+    """
+    A distinct keyframe index for each target time (the nearest one not
+    already taken), or None if some target has no free keyframe within
+    max_shift seconds.
+    """
+    kf_times = np.asarray(keyframes)
+    used = set()
+    assigned = []
+    for t in targets:
+        free = [k for k in np.argsort(np.abs(kf_times - t), kind="stable") if int(k) not in used]
+        if not free or abs(kf_times[free[0]] - t) > max_shift:
+            return None
+        used.add(int(free[0]))
+        assigned.append(int(free[0]))
+    return assigned
+
+
+def choose_sampling_strategy(total_frames: int, fps: float, frame_indices: List[int],
+                             keyframes: List[float]) -> str:
+    """
+    Pick the cheapest way to decode the sampled frames.
+
+    Estimated cost is "frames decoded":
+      - seek:       every sample decodes from its preceding keyframe (~GOP/2 avg)
+      - sequential: one forward pass decodes every frame once
+      - keyframes:  only keyframes are decoded; usable when each sample has
+                    its own keyframe within half a sampling step
+    """
+    num_samples = len(frame_indices)
+    if num_samples == 0 or total_frames == 0:
+        return "seek"
+
+    gop = total_frames / max(1, len(keyframes)) if keyframes else 250
+    costs = {
+        "seek": num_samples * (gop / 2 + 1),
+        "sequential": float(total_frames),
+    }
+
+    if keyframes and fps > 0 and len(keyframes) >= num_samples:
+        step = total_frames / num_samples / fps
+        targets = [frame_idx / fps for frame_idx in frame_indices]
+        if assign_keyframes(keyframes, targets, step / 2) is not None:
+            costs["keyframes"] = len(keyframes) * KEYFRAME_DECODE_WEIGHT
+
+    return min(costs, key=costs.get)
+
+
+def _extract_seek(cap, frame_indices: List[int], fps: float) -> List[Dict]:
+    frames = []
+    for i, frame_idx in enumerate(frame_indices):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = cap.read()
+        if ret:
+            frames.append(_make_frame(i, frame_idx, frame_idx / fps if fps > 0 else 0, frame))
+    return frames
+
+
+def _extract_sequential(cap, frame_indices: List[int], fps: float) -> List[Dict]:
+    """One forward pass: grab() every frame, retrieve() only the sampled ones."""
+    wanted = {frame_idx: i for i, frame_idx in enumerate(frame_indices)}
+    last = max(frame_indices)
+    frames = []
+    frame_idx = 0
+    while frame_idx <= last:
+        if not cap.grab():
+            break
+        if frame_idx in wanted:
+            ret, frame = cap.retrieve()
+            if ret:
+                frames.append(_make_frame(wanted[frame_idx], frame_idx, frame_idx / fps if fps > 0 else 0, frame))
+        frame_idx += 1
+    return frames
+
+
+def _extract_keyframes(video_path: str, frame_indices: List[int], fps: float,
+                       keyframes: List[float], width: int, height: int, max_shift: float) -> List[Dict]:
+    """
+    Decode only keyframes with FFmpeg (-skip_frame nokey), one distinct
+    keyframe per sample.
+
+    Raises if samples can't each get their own keyframe within max_shift
+    seconds, or if FFmpeg outputs a different number of frames than
+    ffprobe reported keyframes (the frame <-> timestamp mapping would be
+    off); the caller then seeks instead.
+    """
+    if width > FRAME_MAX_WIDTH:
+        out_w = FRAME_MAX_WIDTH
+        out_h = int(height * FRAME_MAX_WIDTH / width) // 2 * 2
+    else:
+        out_w, out_h = width, height
+
+    assigned = assign_keyframes(keyframes, [frame_idx / fps for frame_idx in frame_indices], max_shift)
+    if assigned is None:
+        raise Exception("samples share keyframes")
+    chosen = {k: i for i, k in enumerate(assigned)}
+
+    cmd = [
+        FFMPEG_PATH,
+        "-v", "error",
+        "-skip_frame", "nokey",  # Decoder drops every non-keyframe
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-fps_mode", "passthrough",  # One output frame per decoded keyframe
+        "-vf", f"scale={out_w}:{out_h}",
+        "-pix_fmt", "bgr24",
+        "-f", "rawvideo",
+        "-"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame_bytes = out_w * out_h * 3
+    frames = []
+    decoded = 0
+    try:
+        while True:
+            buf = proc.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes:
+                break
+            if decoded in chosen:
+                frame = np.frombuffer(buf, dtype=np.uint8).reshape(out_h, out_w, 3)
+                timestamp = keyframes[decoded] if decoded < len(keyframes) else 0.0
+                frames.append(_make_frame(chosen[decoded], int(round(timestamp * fps)), timestamp, frame))
+            decoded += 1
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+    if decoded != len(keyframes):
+        raise Exception(f"decoded {decoded} keyframes, ffprobe listed {len(keyframes)}")
+    return frames
+
+
+def compute_scene_scores(video_path: str, sample_fps: float = SCENE_SAMPLE_FPS) -> Dict[str, np.ndarray]:
+    """
+    Cheap scene-change / motion pre-pass over a low-resolution decode.
+
+    FFmpeg decodes reference frames only (-skip_frame nonref), resamples
+    to sample_fps and scales to a thumbnail; the scoring is vectorized:
+      - score:  colour-histogram distance to the previous sample (0-1, cuts spike)
+      - motion: mean absolute pixel difference to the previous sample (0-1)
+
+    Returns:
+        {"times": seconds, "score": ..., "motion": ...} as equal-length arrays
     """
-    Extract evenly spaced frames from a video.
+    w, h = SCENE_PREPASS_SIZE
+    cmd = [
+        FFMPEG_PATH,
+        "-v", "error",
+        "-skip_frame", "nonref",
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-vf", f"fps={sample_fps},scale={w}:{h}",
+        "-pix_fmt", "bgr24",
+        "-f", "rawvideo",
+        "-"
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg scene pre-pass failed: {result.stderr.decode(errors='replace')}")
+
+    n = len(result.stdout) // (w * h * 3)
+    frames = np.frombuffer(result.stdout[:n * w * h * 3], dtype=np.uint8).reshape(n, h * w, 3)
+    if n == 0:
+        return {"times": np.zeros(0), "score": np.zeros(0), "motion": np.zeros(0)}
+
+    # Per-sample colour histograms via one bincount over all pixels
+    shift = 8 - int(math.log2(SCENE_HIST_BINS))
+    q = (frames >> shift).astype(np.int64)
+    bins = SCENE_HIST_BINS ** 3
+    idx = (q[..., 0] * SCENE_HIST_BINS + q[..., 1]) * SCENE_HIST_BINS + q[..., 2]
+    idx += (np.arange(n) * bins)[:, None]
+    hist = np.bincount(idx.ravel(), minlength=n * bins).reshape(n, bins) / float(h * w)
+
+    score = np.zeros(n)
+    motion = np.zeros(n)
+    if n > 1:
+        score[1:] = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+        gray = frames.mean(axis=2)
+        motion[1:] = np.abs(np.diff(gray, axis=0)).mean(axis=1) / 255.0
+
+    return {"times": np.arange(n) / sample_fps, "score": score, "motion": motion}
+
+
+def scene_threshold(score: np.ndarray) -> float:
+    """Cut threshold: SCENE_THRESHOLD, raised to mean + 2 std on busy videos."""
+    return max(SCENE_THRESHOLD, float(score.mean() + 2 * score.std())) if len(score) else SCENE_THRESHOLD
+
+
+def select_scene_frames(scene_data: Dict[str, np.ndarray], num_frames: int, fps: float, total_frames: int) -> List[int]:
+    """
+    Spend the num_frames budget across detected scenes.
+
+    Cuts are samples whose histogram distance exceeds SCENE_THRESHOLD (or
+    mean + 2 std, whichever is higher). Every scene is weighted by length
+    x relative motion; with more scenes than budget the heaviest scenes get
+    one frame each, otherwise each scene gets one and the rest go to the
+    heaviest scenes, spaced evenly inside them.
+    """
+    score, motion = scene_data["score"], scene_data["motion"]
+    n = len(score)
+    if n == 0 or num_frames <= 0 or fps <= 0:
+        return []
+
+    threshold = scene_threshold(score)
+    cuts = [0] + [int(i) for i in np.nonzero(score > threshold)[0] if i > 0] + [n]
+    scenes = [(a, b) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
+
+    global_motion = float(motion.mean()) + 1e-6
+    weights = np.array([(b - a) * (1.0 + motion[a:b].mean() / global_motion) for a, b in scenes])
+
+    counts = np.zeros(len(scenes), dtype=int)
+    if len(scenes) >= num_frames:
+        counts[np.argsort(-weights)[:num_frames]] = 1
+    else:
+        counts[:] = 1
+        remaining = num_frames - len(scenes)
+        share = weights / weights.sum() * remaining
+        counts += np.floor(share).astype(int)
+        leftover = remaining - int(np.floor(share).sum())
+        counts[np.argsort(-(share - np.floor(share)))[:leftover]] += 1
+
+    sample_fps = 1.0 / (scene_data["times"][1] - scene_data["times"][0]) if n > 1 else fps
+    frame_indices = set()
+    for (a, b), k in zip(scenes, counts):
+        for j in range(k):
+            sample = a + (j + 0.5) * (b - a) / k
+            frame_indices.add(min(total_frames - 1, int(sample / sample_fps * fps)))
+    return sorted(frame_indices)
+
+
+def extract_frames(video_path: str, num_frames: int = 10, frame_indices: List[int] = None) -> List[Dict]:
+    """
+    Extract evenly spaced frames from a video (or the given frame indices).
+
+    The decode strategy (per-frame seeks, one sequential pass, or
+    keyframe-only decoding) is chosen per file by estimated cost, and
+    JPEGs are encoded in memory, so extraction time is roughly
+    independent of num_frames.
 
     Args:
         video_path: Path to the video file
         num_frames: Number of frames to extract
+        frame_indices: Explicit frame numbers to extract (e.g. from
+                       select_scene_frames); overrides uniform spacing
 
     Returns:
-        List of dicts with frame data: {timestamp, frame_path, frame_base64}
+        List of dicts with frame data: {index, frame_idx, timestamp, image, frame_base64}
     """
-    safe_safe_print(f"[Vision] Extracting {num_frames} frames from video...")
+    safe_print(f"[Vision] Extracting {num_frames} frames from video...")
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
@@ -47,50 +331,50 @@ def extract_frames(video_path: str, num_frames: int = 10) -> List[Dict]:
 
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     duration = total_frames / fps if fps > 0 else 0
 
     safe_print(f"[Vision] Video: {total_frames} frames, {fps:.1f} fps, {duration:.1f}s duration")
 
     # Calculate frame indices to extract (evenly spaced)
-    if num_frames >= total_frames:
+    if frame_indices is not None:
+        frame_indices = sorted(i for i in frame_indices if 0 <= i < total_frames)
+    elif num_frames >= total_frames:
         frame_indices = list(range(total_frames))
     else:
         step = total_frames / num_frames
         frame_indices = [int(step * i) for i in range(num_frames)]
 
-    frames = []
-    temp_dir = tempfile.mkdtemp(prefix="clipsmith_frames_")
+    if not frame_indices:
+        cap.release()
+        return []
 
-    for i, frame_idx in enumerate(frame_indices):
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        ret, frame = cap.read()
+    try:
+        keyframes = probe_keyframes(video_path)
+    except Exception as e:
+        safe_print(f"[Vision] Keyframe probe failed ({e})")
+        keyframes = []
 
-        if ret:
-            timestamp = frame_idx / fps if fps > 0 else 0
-
-            # Resize frame for faster processing (max 512px width)
-            height, width = frame.shape[:2]
-            if width > 512:
-                scale = 512 / width
-                frame = cv2.resize(frame, (512, int(height * scale)))
-
-            # Save frame temporarily
-            frame_path = os.path.join(temp_dir, f"frame_{i:04d}.jpg")
-            cv2.imwrite(frame_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-
-            # Convert to base64 for LLaVA
-            with open(frame_path, "rb") as f:
-                frame_base64 = base64.b64encode(f.read()).decode("utf-8")
-
-            frames.append({
-                "index": i,
-                "frame_idx": frame_idx,
-                "timestamp": round(timestamp, 2),
-                "frame_path": frame_path,
-                "frame_base64": frame_base64,
-            })
+    strategy = choose_sampling_strategy(total_frames, fps, frame_indices, keyframes)
+    safe_print(f"[Vision] Sampling strategy: {strategy}")
 
-    cap.release()
+    try:
+        if strategy == "keyframes":
+            try:
+                step = total_frames / len(frame_indices) / fps
+                frames = _extract_keyframes(video_path, frame_indices, fps, keyframes, width, height, step / 2)
+            except Exception as e:
+                safe_print(f"[Vision] Keyframe decode unusable ({e}), seeking instead")
+                frames = _extract_seek(cap, frame_indices, fps)
+        elif strategy == "sequential":
+            frames = _extract_sequential(cap, frame_indices, fps)
+        else:
+            frames = _extract_seek(cap, frame_indices, fps)
+    finally:
+        cap.release()
+
+    frames.sort(key=lambda f: f["index"])
     safe_print(f"[Vision] Extracted {len(frames)} frames")
     return frames
 
@@ -107,7 +391,9 @@ def analyze_frame(frame_base64: str, timestamp: float, context: str = "") -> Dic
     Returns:
         Dict with description and analysis
     """
-    prompt = f"""Analyze this video frame at {timestamp:.1f} seconds.
+    # The prompt leaves out the timestamp so the description can be cached
+    # by frame hash and reused wherever the same picture shows up
+    prompt = f"""Analyze this video frame.
 
 Describe in detail:
 1. What is happening in this scene?
@@ -120,10 +406,10 @@ Describe in detail:
 
 Be specific and detailed. This helps identify the best moments for short clips."""
 
+    started = time.perf_counter()
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
+        response = ollama_client.generate(
+            {
                 "model": VISION_MODEL,
                 "prompt": prompt,
                 "images": [frame_base64],
@@ -137,24 +423,250 @@ Be specific and detailed. This helps identify the best moments for short clips."
         )
 
         if response.status_code != 200:
-            return {"error": f"LLaVA error: {response.text}", "description": ""}
-
-        result = response.json().get("response", "")
+            return {
+                "timestamp": timestamp,
+                "error": f"LLaVA error: {response.text}",
+                "description": "",
+                "seconds": response.elapsed_seconds,
+            }
+
+        body = response.json()
         return {
             "timestamp": timestamp,
-            "description": result,
-            "error": None
+            "description": body.get("response", ""),
+            "error": None,
+            "seconds": response.elapsed_seconds,
+            "prompt_tokens": body.get("prompt_eval_count", 0),
+            "output_tokens": body.get("eval_count", 0),
         }
 
     except Exception as e:
         return {
             "timestamp": timestamp,
             "description": "",
-            "error": str(e)
+            "error": str(e),
+            "seconds": time.perf_counter() - started,
         }
 
 
-def analyze_video_content(video_path: str, num_frames: int = 10, user_prompt: str = "") -> Dict:
+def analyze_frames(frames: List[Dict], user_prompt: str = "", max_in_flight: int = VISION_MAX_IN_FLIGHT) -> List[Dict]:
+    """
+    Analyze frames with LLaVA concurrently, bounded by max_in_flight.
+
+    Returns:
+        One analysis dict per frame {index, timestamp, description, error,
+        seconds}, ordered by timestamp; index is the frame's "index"
+    """
+    if not frames:
+        return []
+
+    workers = max(1, min(max_in_flight, len(frames)))
+    safe_print(f"[Vision] Analyzing {len(frames)} frames ({workers} in flight)...")
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llava") as pool:
+        futures = [
+            pool.submit(analyze_frame, frame["frame_base64"], frame["timestamp"], user_prompt)
+            for frame in frames
+        ]
+
+    frame_analyses = []
+    for i, (frame, future) in enumerate(zip(frames, futures)):
+        analysis = future.result()
+        frame_analyses.append({
+            "index": frame["index"],
+            "timestamp": frame["timestamp"],
+            "description": analysis.get("description", ""),
+            "error": analysis.get("error"),
+            "seconds": round(analysis.get("seconds", 0.0), 2),
+            "prompt_tokens": analysis.get("prompt_tokens", 0),
+            "output_tokens": analysis.get("output_tokens", 0),
+        })
+
+        label = f"[Vision] Frame {i+1}/{len(frames)} (t={frame['timestamp']:.1f}s, {analysis['seconds']:.1f}s)"
+        if analysis.get("description"):
+            # Print short preview
+            preview = analysis["description"][:150].replace("\n", " ")
+            safe_print(f"{label} → {preview}...")
+        else:
+            safe_print(f"{label} failed: {analysis.get('error')}")
+
+    frame_analyses.sort(key=lambda fa: fa["timestamp"])
+    safe_print(f"[Vision] Frame analysis took {time.perf_counter() - started:.1f}s "
+               f"(sum of requests {sum(fa['seconds'] for fa in frame_analyses):.1f}s)")
+    return frame_analyses
+
+
+def build_contact_sheet(frames: List[Dict]) -> str:
+    """
+    Tile frames into one labelled grid image (base64 JPEG).
+
+    Each tile gets its 1-based number and timestamp burned in so the model
+    can refer to frames by id.
+    """
+    cols = math.ceil(math.sqrt(len(frames)))
+    rows = math.ceil(len(frames) / cols)
+    tile_h = max(f["image"].shape[0] for f in frames)
+    tile_w = max(f["image"].shape[1] for f in frames)
+
+    sheet = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+    for n, frame in enumerate(frames):
+        image = frame["image"]
+        y, x = (n // cols) * tile_h, (n % cols) * tile_w
+        sheet[y:y + image.shape[0], x:x + image.shape[1]] = image
+        label = f"#{n + 1}  {frame['timestamp']:.1f}s"
+        cv2.rectangle(sheet, (x, y), (x + 190, y + 34), (0, 0, 0), -1)
+        cv2.putText(sheet, label, (x + 6, y + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+    ok, jpeg = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise Exception("Could not encode contact sheet")
+    return base64.b64encode(jpeg.tobytes()).decode("utf-8")
+
+
+def analyze_frame_batch(frames: List[Dict], context: str = "") -> List[Dict]:
+    """
+    Analyze several frames in ONE LLaVA call via a labelled contact sheet.
+
+    The model answers with compact JSON per frame; each answer is rendered
+    into a short description in the same shape analyze_frame returns, so
+    the rest of the pipeline works unchanged.
+    """
+    prompt = f"""This image is a grid of {len(frames)} video frames, labelled #1 to #{len(frames)} with their timestamps.
+
+For EACH frame return one JSON object with:
+"id" (frame number), "scene" (what is happening, one sentence),
+"subjects" (people/objects/on-screen text), "mood", "hook" (anything attention-grabbing, or ""),
+"interest" (visual interest 1-10).
+
+{f"Additional context: {context}" if context else ""}
+
+RESPOND WITH ONLY THIS JSON FORMAT:
+{{"frames": [{{"id": 1, "scene": "...", "subjects": "...", "mood": "...", "hook": "...", "interest": 5}}]}}"""
+
+    started = time.perf_counter()
+    try:
+        response = ollama_client.generate(
+            {
+                "model": VISION_MODEL,
+                "prompt": prompt,
+                "images": [build_contact_sheet(frames)],
+                "stream": False,
+                "format": "json",
+                "options": {
+                    "temperature": 0.3,
+                    "num_predict": 90 * len(frames),
+                }
+            },
+            timeout=120
+        )
+        if response.status_code != 200:
+            raise Exception(f"LLaVA error: {response.text}")
+
+        body = response.json()
+        answers = json.loads(body.get("response", "") or "{}").get("frames", [])
+        by_id = {}
+        for answer in answers:
+            try:
+                by_id[int(answer.get("id"))] = answer
+            except (TypeError, ValueError):
+                continue
+        error = None
+    except Exception as e:
+        body, by_id, error = {}, {}, str(e)
+
+    seconds = time.perf_counter() - started
+    n = len(frames)
+    results = []
+    for k, frame in enumerate(frames, 1):
+        answer = by_id.get(k)
+        description = ""
+        if answer:
+            description = (
+                f"{answer.get('scene', '')} Visible: {answer.get('subjects', '')}. "
+                f"Mood: {answer.get('mood', '')}. {answer.get('hook', '')} "
+                f"Visual interest: {answer.get('interest', '?')}/10."
+            ).strip()
+        results.append({
+            "index": frame["index"],
+            "timestamp": frame["timestamp"],
+            "description": description,
+            "error": error or (None if answer else "frame missing from batch response"),
+            # Request cost is shared evenly across the frames in the batch
+            "seconds": seconds / n,
+            "prompt_tokens": body.get("prompt_eval_count", 0) / n,
+            "output_tokens": body.get("eval_count", 0) / n,
+        })
+    return results
+
+
+def analyze_frames_batched(frames: List[Dict], user_prompt: str = "", batch_size: int = VISION_BATCH_SIZE,
+                           max_in_flight: int = VISION_MAX_IN_FLIGHT) -> List[Dict]:
+    """Batched counterpart of analyze_frames: one contact sheet per batch_size frames."""
+    if not frames:
+        return []
+
+    batches = [frames[i:i + batch_size] for i in range(0, len(frames), max(1, batch_size))]
+    workers = max(1, min(max_in_flight, len(batches)))
+    safe_print(f"[Vision] Analyzing {len(frames)} frames in {len(batches)} batched calls ({workers} in flight)...")
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llava") as pool:
+        futures = [pool.submit(analyze_frame_batch, batch, user_prompt) for batch in batches]
+
+    frame_analyses = []
+    for future in futures:
+        for analysis in future.result():
+            analysis["seconds"] = round(analysis["seconds"], 2)
+            frame_analyses.append(analysis)
+            preview = (analysis["description"] or f"failed: {analysis['error']}")[:150].replace("\n", " ")
+            safe_print(f"[Vision] t={analysis['timestamp']:.1f}s → {preview}")
+
+    frame_analyses.sort(key=lambda fa: fa["timestamp"])
+    safe_print(f"[Vision] Batched frame analysis took {time.perf_counter() - started:.1f}s")
+    return frame_analyses
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash of a frame.
+
+    Compares adjacent pixels of a 9x8 grayscale thumbnail, so re-encodes,
+    small shifts and compression noise keep (almost) the same bits.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(sum(1 << i for i, bit in enumerate(bits) if bit))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def dedupe_frames(frames: List[Dict], max_distance: int = VISION_DEDUP_DISTANCE) -> Dict[int, int]:
+    """
+    Map each near-duplicate frame to the earlier frame it repeats.
+
+    Frames need a "dhash" key. Returns {frame index: representative frame
+    index} for every frame within max_distance bits of an earlier
+    representative; frames not in the map are analyzed themselves.
+    """
+    duplicates = {}
+    representatives = []
+    if max_distance < 0:
+        return duplicates
+    for frame in frames:
+        match = next((r for r in representatives if hamming(frame["dhash"], r["dhash"]) <= max_distance), None)
+        if match is not None:
+            duplicates[frame["index"]] = match["index"]
+        else:
+            representatives.append(frame)
+    return duplicates
+
+
+def analyze_video_content(video_path: str, num_frames: int = 10, user_prompt: str = "",
+                          mode: str = VISION_MODE) -> Dict:
     """
     Analyze video content by extracting and analyzing multiple frames.
 
@@ -162,58 +674,136 @@ def analyze_video_content(video_path: str, num_frames: int = 10, user_prompt: st
         video_path: Path to the video file
         num_frames: Number of frames to analyze
         user_prompt: User's prompt about what to look for
+        mode: "frame" (one LLaVA call per frame) or "batch" (contact sheets)
 
     Returns:
-        Dict with full video analysis including frame descriptions
+        Dict with full video analysis including frame descriptions, plus
+        call/token totals so the two modes can be compared and the number
+        of LLaVA calls saved by dedup and the description cache
     """
     safe_print(f"[Vision] Starting video content analysis...")
     safe_print(f"[Vision] User prompt: {user_prompt or 'None'}")
 
+    # Choose frames: per scene from a cheap pre-pass, or evenly spaced
+    scene_data = None
+    frame_indices = None
+    if VISION_FRAME_SELECTION == "scene":
+        try:
+            started = time.perf_counter()
+            scene_data = compute_scene_scores(video_path)
+            cap = cv2.VideoCapture(video_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            frame_indices = select_scene_frames(scene_data, num_frames, fps, total_frames) or None
+            safe_print(f"[Vision] Scene pre-pass: {len(scene_data['score'])} samples "
+                       f"in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            safe_print(f"[Vision] Scene pre-pass failed ({e}), sampling uniformly")
+            scene_data = None
+
     # Extract frames
-    frames = extract_frames(video_path, num_frames)
+    frames = extract_frames(video_path, num_frames, frame_indices)
 
-    # Analyze each frame
+    # Skip LLaVA for near-duplicate frames and frames described before
+    for frame in frames:
+        frame["dhash"] = dhash(frame["image"])
+    duplicates = dedupe_frames(frames)
+    unique = [f for f in frames if f["index"] not in duplicates]
+    try:
+        cached = vision_cache.get_many(VISION_MODEL, mode, user_prompt, [f["dhash"] for f in unique])
+    except Exception as e:
+        safe_print(f"[Vision] Description cache unavailable ({e})")
+        cached = {}
+    pending = [f for f in unique if f["dhash"] not in cached]
+
+    # Analyze frames concurrently, at most VISION_MAX_IN_FLIGHT requests at once
+    if mode == "batch":
+        new_analyses = analyze_frames_batched(pending, user_prompt)
+        llm_calls = math.ceil(len(pending) / max(1, VISION_BATCH_SIZE))
+    else:
+        new_analyses = analyze_frames(pending, user_prompt)
+        llm_calls = len(pending)
+
+    # Joined on the frame index: timestamps can collide after rounding
+    by_analysis = {fa["index"]: fa for fa in new_analyses}
+    by_index = {}
+    for frame in pending:
+        analysis = by_analysis.get(frame["index"]) or {
+            "timestamp": frame["timestamp"], "description": "", "error": "no analysis returned", "seconds": 0.0,
+        }
+        analysis["source"] = "llava"
+        by_index[frame["index"]] = analysis
+    for frame in unique:
+        if frame["index"] not in by_index:
+            by_index[frame["index"]] = {
+                "timestamp": frame["timestamp"], "description": cached[frame["dhash"]],
+                "error": None, "seconds": 0.0, "source": "cache",
+            }
     frame_analyses = []
-    for i, frame in enumerate(frames):
-        safe_print(f"[Vision] Analyzing frame {i+1}/{len(frames)} (t={frame['timestamp']:.1f}s)...")
-
-        analysis = analyze_frame(
-            frame["frame_base64"],
-            frame["timestamp"],
-            user_prompt
-        )
+    for frame in frames:
+        if frame["index"] in duplicates:
+            source = by_index[duplicates[frame["index"]]]
+            analysis = {
+                "timestamp": frame["timestamp"], "description": source["description"],
+                "error": source["error"], "seconds": 0.0, "source": "duplicate",
+            }
+        else:
+            analysis = by_index[frame["index"]]
+        frame_analyses.append(analysis)
 
-        frame_analyses.append({
-            "timestamp": frame["timestamp"],
-            "description": analysis.get("description", ""),
-            "error": analysis.get("error"),
+    try:
+        vision_cache.put_many(VISION_MODEL, mode, user_prompt, {
+            f["dhash"]: by_index[f["index"]]["description"]
+            for f in pending if by_index[f["index"]]["description"] and not by_index[f["index"]]["error"]
         })
+    except Exception as e:
+        safe_print(f"[Vision] Could not update description cache ({e})")
 
-        if analysis.get("description"):
-            # Print short preview
-            preview = analysis["description"][:150].replace("\n", " ")
-            safe_print(f"[Vision]   → {preview}...")
+    calls_saved = {"duplicates": len(duplicates), "cache_hits": len(unique) - len(pending)}
+    safe_print(f"[Vision] {len(frames)} frames: {len(pending)} sent to LLaVA, "
+               f"{calls_saved['duplicates']} near-duplicates, {calls_saved['cache_hits']} from cache")
 
-    # Generate overall video summary
+    # Generate overall video summary (shorter in batch mode, the inputs are compact)
     safe_print(f"[Vision] Generating video summary...")
-    summary = generate_video_summary(frame_analyses, user_prompt)
-
-    # Clean up temp frames
-    for frame in frames:
-        try:
-            os.remove(frame["frame_path"])
-        except:
-            pass
+    summary = generate_video_summary(frame_analyses, user_prompt, num_predict=400 if mode == "batch" else 1000)
+
+    prompt_tokens = int(sum(fa.get("prompt_tokens", 0) for fa in frame_analyses))
+    output_tokens = int(sum(fa.get("output_tokens", 0) for fa in frame_analyses))
+    safe_print(f"[Vision] Mode {mode}: {llm_calls} frame calls, "
+               f"{prompt_tokens} prompt / {output_tokens} generated tokens")
+
+    # Per-sample scene/motion scores for the analyzer, and each frame's local scores
+    scene_scores = []
+    scene_cuts = []
+    if scene_data is not None:
+        threshold = scene_threshold(scene_data["score"])
+        for t, sc, mo in zip(scene_data["times"], scene_data["score"], scene_data["motion"]):
+            scene_scores.append({"timestamp": round(float(t), 2), "score": round(float(sc), 4), "motion": round(float(mo), 4)})
+            if sc > threshold:
+                scene_cuts.append(round(float(t), 2))
+        for fa in frame_analyses:
+            i = min(len(scene_scores) - 1, int(round(fa["timestamp"] * SCENE_SAMPLE_FPS)))
+            if i >= 0:
+                fa["scene_score"] = scene_scores[i]["score"]
+                fa["motion"] = scene_scores[i]["motion"]
 
     return {
+        "mode": mode,
+        "scene_scores": scene_scores,
+        "scene_cuts": scene_cuts,
         "num_frames_analyzed": len(frame_analyses),
         "frame_analyses": frame_analyses,
         "summary": summary,
         "viral_moments": identify_viral_moments(frame_analyses),
+        "llm_calls": llm_calls + 1,  # + summary
+        "llm_calls_saved": calls_saved,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
     }
 
 
-def generate_video_summary(frame_analyses: List[Dict], user_prompt: str = "") -> str:
+def generate_video_summary(frame_analyses: List[Dict], user_prompt: str = "", num_predict: int = 1000) -> str:
     """
     Generate an overall summary of the video based on frame analyses.
     """
@@ -241,15 +831,14 @@ Please provide:
 Be specific about timestamps when suggesting clips."""
 
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
+        response = ollama_client.generate(
+            {
                 "model": VISION_MODEL,
                 "prompt": prompt,
                 "stream": False,
                 "options": {
                     "temperature": 0.3,
-                    "num_predict": 1000,
+                    "num_predict": num_predict,
                 }
             },
             timeout=180
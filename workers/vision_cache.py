@@ -0,0 +1,40 @@
+"""
+Persistent frame description cache.
+
+Maps a frame's perceptual hash (dHash) to the description LLaVA produced
+for it, keyed by vision model, analysis mode and the user context sent
+with the frame, so reused intros, static slides and repeat uploads with
+the same request don't need another LLaVA call. Descriptions don't
+mention the frame's time, so they are valid at any timestamp. Least
+recently used rows are evicted past VISION_CACHE_MAX_ROWS.
+"""
+
+import hashlib
+from typing import Dict, List
+
+from config import VISION_CACHE_PATH, VISION_CACHE_MAX_ROWS
+from sqlite_cache import SqliteCache
+
+_cache = SqliteCache(VISION_CACHE_PATH, "vision_descriptions", max_rows=VISION_CACHE_MAX_ROWS, label="VisionCache")
+
+
+def _key(model: str, mode: str, context: str, frame_hash: int) -> str:
+    context_sig = hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+    return f"{model}|{mode}|{context_sig}|{frame_hash:016x}"
+
+
+def get_many(model: str, mode: str, context: str, hashes: List[int]) -> Dict[int, str]:
+    """Return {hash: description} for every hash already in the cache for this context."""
+    keys = {_key(model, mode, context, h): h for h in hashes}
+    found = _cache.get_many(keys)
+    return {keys[key]: data.decode("utf-8") for key, data in found.items()}
+
+
+def put_many(model: str, mode: str, context: str, descriptions: Dict[int, str]):
+    """Store {hash: description} for this context and evict old rows if over the limit."""
+    _cache.put_many({_key(model, mode, context, h): d.encode("utf-8") for h, d in descriptions.items()})
+
+
+def stats() -> dict:
+    """Hit/miss/write counters for this process."""
+    return _cache.stats()
@@ -0,0 +1,134 @@
+"""
+Word Index - compact, array-backed word timestamps for a transcript.
+
+Words are stored as parallel arrays (start, end, offset into one text
+buffer) instead of a dict per word, and looked up with binary search so
+clip boundaries can be snapped to word / sentence edges in O(log n).
+"""
+
+import bisect
+from array import array
+from typing import Iterable, Tuple
+
+SENTENCE_END_CHARS = (".", "!", "?", "…")
+
+
+class WordIndex:
+    """Sorted word timestamps with word- and sentence-boundary lookup."""
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: str):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets  # len(words) + 1 offsets into text
+        self.text = text
+
+        # Word indices that start a sentence / end a sentence
+        self.sentence_starts = array("l", [0] if len(starts) else [])
+        self.sentence_ends = array("l")
+        for i in range(len(starts)):
+            if self.word(i).rstrip().endswith(SENTENCE_END_CHARS):
+                self.sentence_ends.append(i)
+                if i + 1 < len(starts):
+                    self.sentence_starts.append(i + 1)
+        if len(starts) and (not self.sentence_ends or self.sentence_ends[-1] != len(starts) - 1):
+            self.sentence_ends.append(len(starts) - 1)
+
+        self._sentence_start_times = array("d", (starts[i] for i in self.sentence_starts))
+        self._sentence_end_times = array("d", (ends[i] for i in self.sentence_ends))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_words(cls, words: Iterable[Tuple[float, float, str]]) -> "WordIndex":
+        """Build from (start, end, text) tuples in time order."""
+        starts, ends, offsets = array("d"), array("d"), array("l", [0])
+        parts = []
+        length = 0
+        for start, end, text in words:
+            starts.append(start)
+            ends.append(end)
+            parts.append(text)
+            length += len(text)
+            offsets.append(length)
+        return cls(starts, ends, offsets, "".join(parts))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "WordIndex":
+        """Rebuild from to_dict() output (as stored in transcript["words"])."""
+        return cls(
+            array("d", data.get("start", [])),
+            array("d", data.get("end", [])),
+            array("l", data.get("offsets", [0])),
+            data.get("text", ""),
+        )
+
+    def to_dict(self) -> dict:
+        """JSON-friendly compact form."""
+        return {
+            "start": [round(t, 3) for t in self.starts],
+            "end": [round(t, 3) for t in self.ends],
+            "offsets": list(self.offsets),
+            "text": self.text,
+        }
+
+    def word(self, i: int) -> str:
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def word_at(self, t: float) -> int:
+        """Index of the word spoken at time t, or -1 if t falls between words."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t <= self.ends[i]:
+            return i
+        return -1
+
+    def snap_start(self, t: float, max_shift: float) -> float:
+        """
+        Move a clip start to a clean boundary within max_shift seconds.
+
+        Prefers the nearest sentence start, then the start of the word
+        being spoken at t (or the next word), else leaves t unchanged.
+        """
+        if not len(self):
+            return t
+
+        nearest = _nearest(self._sentence_start_times, t)
+        if nearest is not None and abs(nearest - t) <= max_shift:
+            return nearest
+
+        i = self.word_at(t)
+        if i == -1:
+            i = bisect.bisect_left(self.starts, t)
+        if i < len(self) and abs(self.starts[i] - t) <= max_shift:
+            return self.starts[i]
+        return t
+
+    def snap_end(self, t: float, max_shift: float) -> float:
+        """
+        Move a clip end to a clean boundary within max_shift seconds.
+
+        Prefers the nearest sentence end, then the end of the word being
+        spoken at t (or the previous word), else leaves t unchanged.
+        """
+        if not len(self):
+            return t
+
+        nearest = _nearest(self._sentence_end_times, t)
+        if nearest is not None and abs(nearest - t) <= max_shift:
+            return nearest
+
+        i = self.word_at(t)
+        if i == -1:
+            i = bisect.bisect_right(self.ends, t) - 1
+        if i >= 0 and abs(self.ends[i] - t) <= max_shift:
+            return self.ends[i]
+        return t
+
+
+def _nearest(times: array, t: float) -> float:
+    """Value in sorted times closest to t, or None."""
+    if not len(times):
+        return None
+    i = bisect.bisect_left(times, t)
+    candidates = [times[j] for j in (i - 1, i) if 0 <= j < len(times)]
+    return min(candidates, key=lambda x: abs(x - t))
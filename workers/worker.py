@@ -3,6 +3,9 @@ import redis
 import ssl
 import os
 import sys
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Fix Windows console encoding for Unicode
 if sys.platform == "win32":
@@ -15,13 +18,22 @@ FFMPEG_PATH = r"C:\Users\Subash\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFm
 AudioSegment.converter = FFMPEG_PATH
 AudioSegment.ffprobe = FFMPEG_PATH.replace("ffmpeg.exe", "ffprobe.exe")
 
-from config import REDIS_URL, CLIP_QUEUE
-from downloader import download_video
+from config import (
+    REDIS_URL, CLIP_QUEUE, WORKER_CONCURRENCY, OCCUPANCY_REPORT_SECONDS,
+    PRELOAD_MODELS, MODEL_READY_TIMEOUT,
+)
+from downloader import download_video, release_job_video
 from transcriber import transcribe_video
-from analyzer import analyze_transcript, analyze_with_vision
+from analyzer import analyze_transcript, analyze_with_vision, format_segment
+from vision_analyzer import analyze_video_content
+from pipeline import run_stages
+from slots import slot, occupancy, format_occupancy
+import models
+import ollama_client
 from clipper import create_clips
 from generator import generate_video
-from database import update_job_status, save_clips, update_job_progress
+from database import save_clips
+from progress import ProgressReporter
 
 
 def get_redis_client():
@@ -33,65 +45,101 @@ def get_redis_client():
     )
 
 
-def process_clip_job(job_id: str, youtube_url: str, prompt: str):
-    """Process a CLIP job - extract clips from long video using audio + vision analysis."""
+def process_clip_job(job_id: str, youtube_url: str, prompt: str, reporter: ProgressReporter):
+    """
+    Process a CLIP job - extract clips from long video using audio + vision analysis.
+
+    Stages run as a DAG: once the download finishes, transcription and
+    vision frame analysis run concurrently, and the combined LLM analysis
+    waits only for both.
+    """
     try:
-        # Step 1: Download video (0-20%)
-        update_job_status(job_id, "DOWNLOADING")
-        update_job_progress(job_id, 0)
-        print("[Step 1/4] Downloading video...")
-        download_result = download_video(youtube_url, job_id)
-        print(f"[Step 1/4] Downloaded: {download_result['title']}")
-        print(f"[Step 1/4] Duration: {download_result['duration']}s")
-        update_job_progress(job_id, 20)
-
-        # Step 2: Transcribe video (20-40%)
-        update_job_status(job_id, "TRANSCRIBING")
-        update_job_progress(job_id, 25)
-        print("\n[Step 2/4] Transcribing audio...")
-        transcript_result = transcribe_video(download_result["file_path"])
-        print(f"[Step 2/4] Language: {transcript_result['language']}")
-        print(f"[Step 2/4] Segments: {len(transcript_result['segments'])}")
-        update_job_progress(job_id, 40)
-
-        # Step 3: Analyze with Vision + LLM (40-75%)
-        update_job_status(job_id, "ANALYZING")
-        update_job_progress(job_id, 45)
-        print("\n[Step 3/4] Analyzing video (audio + vision)...")
-        print("[Step 3/4] This uses LLaVA to 'see' the video frames...")
-
-        # Use vision-enabled analysis (extracts frames and analyzes with LLaVA)
-        clip_suggestions = analyze_with_vision(
-            video_path=download_result["file_path"],
-            transcript=transcript_result,
-            prompt=prompt,
-            num_frames=8  # Analyze 8 frames spread across video
-        )
+        def download_stage():
+            # Step 1: Download video (0-20%)
+            reporter.update(status="DOWNLOADING", progress=0)
+            print("[Step 1/4] Downloading video...")
+            with slot("download"):
+                download_result = download_video(youtube_url, job_id, reporter)
+            print(f"[Step 1/4] Downloaded: {download_result['title']}")
+            print(f"[Step 1/4] Duration: {download_result['duration']}s")
+            reporter.update(progress=20)
+
+            # Transcription and vision start together from here
+            reporter.update(status="TRANSCRIBING", progress=25)
+            return download_result
+
+        def transcript_stage(download):
+            # Step 2: Transcribe video (20-40%)
+            print("\n[Step 2/4] Transcribing audio...")
+            prompt_lines = []
+
+            def on_segment(seg, info):
+                # Build the LLM transcript text and drive progress (25-45%)
+                # while segments stream in
+                prompt_lines.append(format_segment(seg))
+                if info.get("audio_duration"):
+                    fraction = min(1.0, seg["end"] / info["audio_duration"])
+                    reporter.update(progress=25 + int(20 * fraction))
+
+            with slot("cpu"):
+                transcript_result = transcribe_video(download["file_path"], on_segment=on_segment)
+            transcript_result["timestamped_text"] = "\n".join(prompt_lines)
+            print(f"[Step 2/4] Language: {transcript_result['language']}")
+            print(f"[Step 2/4] Segments: {len(transcript_result['segments'])}")
+            reporter.update(status="ANALYZING", progress=45)
+            return transcript_result
+
+        def vision_stage(download):
+            # Step 3a: Extract frames and run LLaVA on them (only needs the video)
+            print("\n[Step 3/4] Analyzing video frames...")
+            print("[Step 3/4] This uses LLaVA to 'see' the video frames...")
+            with slot("ollama"):
+                return analyze_video_content(download["file_path"], 8, prompt)  # 8 frames spread across video
+
+        def analysis_stage(download, transcript, vision):
+            # Step 3b: Combined audio + vision LLM analysis (45-75%)
+            print("\n[Step 3/4] Analyzing video (audio + vision)...")
+            with slot("ollama"):
+                return analyze_with_vision(
+                    video_path=download["file_path"],
+                    transcript=transcript,
+                    prompt=prompt,
+                    vision_result=vision
+                )
+
+        results = run_stages({
+            "download": (download_stage, []),
+            "transcript": (transcript_stage, ["download"]),
+            "vision": (vision_stage, ["download"]),
+            "analysis": (analysis_stage, ["download", "transcript", "vision"]),
+        })
+        download_result = results["download"]
+        transcript_result = results["transcript"]
+        clip_suggestions = results["analysis"]
 
         print(f"[Step 3/4] Found {len(clip_suggestions)} clips:")
         for i, clip in enumerate(clip_suggestions, 1):
             print(f"  {i}. {clip['title']} ({clip['start']:.1f}s - {clip['end']:.1f}s)")
-        update_job_progress(job_id, 75)
+        reporter.update(progress=75)
 
         # Step 4: Create clips with FFmpeg (75-100%)
-        update_job_status(job_id, "CLIPPING")
-        update_job_progress(job_id, 80)
+        reporter.update(status="CLIPPING", progress=80)
         print("\n[Step 4/4] Creating clips with FFmpeg...")
-        created_clips = create_clips(
-            video_path=download_result["file_path"],
-            job_id=job_id,
-            clips_data=clip_suggestions
-        )
+        with slot("cpu"):
+            created_clips = create_clips(
+                video_path=download_result["file_path"],
+                job_id=job_id,
+                clips_data=clip_suggestions
+            )
         print(f"[Step 4/4] Created {len(created_clips)} clips!")
-        update_job_progress(job_id, 95)
+        reporter.update(progress=95)
 
         # Save clips to database
         print("\n[DB] Saving clips to database...")
         saved_clips = save_clips(job_id, created_clips)
 
         # Mark job as completed
-        update_job_status(job_id, "COMPLETED")
-        update_job_progress(job_id, 100)
+        reporter.complete()
 
         print(f"\n{'='*50}")
         print(f"[Worker] Job {job_id} COMPLETED!")
@@ -112,37 +160,37 @@ def process_clip_job(job_id: str, youtube_url: str, prompt: str):
         print(f"\n[Worker] Error: {str(e)}")
         import traceback
         traceback.print_exc()
-        update_job_status(job_id, "FAILED", str(e))
+        reporter.fail(str(e))
         return {"status": "failed", "error": str(e)}
 
 
-def process_generate_job(job_id: str, youtube_url: str, prompt: str):
+def process_generate_job(job_id: str, youtube_url: str, prompt: str, reporter: ProgressReporter):
     """Process a GENERATE job - AI generate new video from reference."""
     try:
         # Step 1: Download reference video (0-30%)
-        update_job_status(job_id, "DOWNLOADING")
-        update_job_progress(job_id, 0)
+        reporter.update(status="DOWNLOADING", progress=0)
         print("[Step 1/2] Downloading reference video...")
-        download_result = download_video(youtube_url, job_id)
+        with slot("download"):
+            download_result = download_video(youtube_url, job_id, reporter)
         print(f"[Step 1/2] Downloaded: {download_result['title']}")
         print(f"[Step 1/2] Duration: {download_result['duration']}s")
-        update_job_progress(job_id, 30)
+        reporter.update(progress=30)
 
         # Step 2: Generate new video with SVD (30-95%)
-        update_job_status(job_id, "GENERATING")
-        update_job_progress(job_id, 35)
+        reporter.update(status="GENERATING", progress=35)
         print("\n[Step 2/2] Generating new video with AI...")
         print(f"[Step 2/2] Prompt: {prompt}")
 
-        generated_result = generate_video(
-            reference_video_path=download_result["file_path"],
-            job_id=job_id,
-            prompt=prompt,
-            num_frames=14,  # ~2 seconds at 7fps
-            fps=7.0,
-        )
+        with slot("gpu"):
+            generated_result = generate_video(
+                reference_video_path=download_result["file_path"],
+                job_id=job_id,
+                prompt=prompt,
+                num_frames=14,  # ~2 seconds at 7fps
+                fps=7.0,
+            )
         print(f"[Step 2/2] Generated: {generated_result['filename']}")
-        update_job_progress(job_id, 95)
+        reporter.update(progress=95)
 
         # Save generated clip to database
         print("\n[DB] Saving generated video to database...")
@@ -155,8 +203,7 @@ def process_generate_job(job_id: str, youtube_url: str, prompt: str):
         }])
 
         # Mark job as completed
-        update_job_status(job_id, "COMPLETED")
-        update_job_progress(job_id, 100)
+        reporter.complete()
 
         print(f"\n{'='*50}")
         print(f"[Worker] Job {job_id} COMPLETED!")
@@ -173,12 +220,18 @@ def process_generate_job(job_id: str, youtube_url: str, prompt: str):
         print(f"\n[Worker] Error: {str(e)}")
         import traceback
         traceback.print_exc()
-        update_job_status(job_id, "FAILED", str(e))
+        reporter.fail(str(e))
         return {"status": "failed", "error": str(e)}
 
 
-def process_job(job_data: dict):
-    """Process a job - routes to CLIP or GENERATE pipeline."""
+def process_job(job_data: dict, publisher=None):
+    """
+    Process a job - routes to CLIP or GENERATE pipeline.
+
+    Args:
+        job_data: BullMQ job payload
+        publisher: Optional Redis client used to publish live progress
+    """
     job_id = job_data.get("id")
     youtube_url = job_data.get("youtubeUrl")
     prompt = job_data.get("prompt", "find the most interesting moments")
@@ -191,20 +244,99 @@ def process_job(job_data: dict):
     print(f"[Worker] Prompt: {prompt}")
     print(f"{'='*50}\n")
 
-    if job_type == "GENERATE":
-        return process_generate_job(job_id, youtube_url, prompt)
-    else:
-        return process_clip_job(job_id, youtube_url, prompt)
+    reporter = ProgressReporter(job_id, publisher=publisher)
+
+    try:
+        if job_type == "GENERATE":
+            return process_generate_job(job_id, youtube_url, prompt, reporter)
+        else:
+            return process_clip_job(job_id, youtube_url, prompt, reporter)
+    finally:
+        release_job_video(job_id)
+
+
+def reap_finished(active: set) -> set:
+    """
+    Drop finished job futures, logging any that raised.
+
+    Returns:
+        The futures still running
+    """
+    running = set()
+    for future in active:
+        if not future.done():
+            running.add(future)
+            continue
+        error = future.exception()
+        if error is not None:
+            print(f"[Worker] Job crashed: {error}")
+            import traceback
+            traceback.print_exception(type(error), error, error.__traceback__)
+    return running
+
+
+def report_occupancy(client, worker_id: str, active_jobs: int):
+    """Log slot occupancy and publish it to Redis for monitoring."""
+    print(f"[Worker] Jobs {active_jobs}/{WORKER_CONCURRENCY} | {format_occupancy()}")
+    try:
+        client.set(
+            f"clipsmith:worker:{worker_id}:occupancy",
+            json.dumps({
+                "jobs": active_jobs,
+                "concurrency": WORKER_CONCURRENCY,
+                "slots": occupancy(),
+                "models": models.status(),
+                "ollama": ollama_client.status(),
+                "updated_at": time.time(),
+            }),
+            ex=OCCUPANCY_REPORT_SECONDS * 3,
+        )
+    except Exception as e:
+        print(f"[Worker] Could not publish occupancy: {e}")
 
 
 def run_worker():
-    """Main worker loop - listens for jobs from Redis queue."""
+    """
+    Main worker loop - listens for jobs from Redis queue.
+
+    Up to WORKER_CONCURRENCY jobs run at once; their stages share the
+    resource slots from slots.py. A new job is only popped when a job
+    slot is free, so queued work stays visible to other workers.
+    Jobs are only taken once the PRELOAD_MODELS are loaded and warm.
+    """
+    # Load + warm up models in the background while we connect to Redis
+    models.preload(PRELOAD_MODELS)
+
     client = get_redis_client()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
     print(f"[Worker] Connected to Redis")
+
+    # Only start taking jobs once models are warm
+    print(f"[Worker] Waiting for models: {', '.join(PRELOAD_MODELS) or 'none'}")
+    if not models.wait_ready(PRELOAD_MODELS, timeout=MODEL_READY_TIMEOUT):
+        print(f"[Worker] Models not ready after {MODEL_READY_TIMEOUT:.0f}s, starting anyway")
+    print(f"[Worker] Models: {models.status()}")
+
     print(f"[Worker] Listening on queue: bull:{CLIP_QUEUE}:wait")
+    print(f"[Worker] Concurrency: {WORKER_CONCURRENCY} jobs | {format_occupancy()}")
+
+    pool = ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY, thread_name_prefix="job")
+    active = set()
+    last_report = 0.0
 
     while True:
         try:
+            active = reap_finished(active)
+
+            if time.monotonic() - last_report >= OCCUPANCY_REPORT_SECONDS:
+                report_occupancy(client, worker_id, len(active))
+                last_report = time.monotonic()
+
+            # All job slots busy - wait for one to finish before popping more
+            if len(active) >= WORKER_CONCURRENCY:
+                wait(active, timeout=5, return_when=FIRST_COMPLETED)
+                continue
+
             # BullMQ uses specific key patterns
             # Pop job from wait list
             result = client.brpop(f"bull:{CLIP_QUEUE}:wait", timeout=5)
@@ -217,10 +349,13 @@ def run_worker():
 
                 if job_raw:
                     job_data = json.loads(job_raw)
-                    process_job(job_data)
+                    active.add(pool.submit(process_job, job_data, client))
+                    report_occupancy(client, worker_id, len(active))
+                    last_report = time.monotonic()
 
         except KeyboardInterrupt:
-            print("\n[Worker] Shutting down...")
+            print("\n[Worker] Shutting down, waiting for running jobs...")
+            pool.shutdown(wait=True)
             break
         except Exception as e:
             print(f"[Worker] Error: {e}")